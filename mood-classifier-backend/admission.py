@@ -0,0 +1,277 @@
+import contextlib
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# Reasons a request is shed (label values of the shed counter)
+SHED_REASONS = ("queue_full", "deadline", "expired")
+
+class Overloaded(Exception):
+    """A request was shed instead of run; answered with a 503 and Retry-After"""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("event", "granted", "deadline")
+
+    def __init__(self, deadline):
+        self.event = threading.Event()
+        self.granted = False
+        self.deadline = deadline
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO queue and per-request deadlines.
+
+    At most max_concurrency requests run inference at once. Up to max_queue
+    more wait in arrival order; anything beyond that is shed straight away.
+    A queued request whose deadline passes is dropped before it reaches
+    inference, because its client has stopped waiting. A request only waits
+    in the queue up to its deadline, so the latency of accepted requests
+    stays bounded by it.
+    """
+
+    def __init__(self, max_concurrency=4, max_queue=8, default_timeout=5.0, clock=time.monotonic):
+        """
+        Args:
+            max_concurrency (int): Requests allowed to run at once (0 = no limit)
+            max_queue (int): Requests allowed to wait for a slot
+            default_timeout (float): Deadline in seconds for requests that do not bring one
+            clock (callable): Monotonic time source in seconds
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._running = 0
+        self.admitted = 0
+        self.shed = dict.fromkeys(SHED_REASONS, 0)
+        self.queue_wait_total = 0.0
+        self.queued = 0
+        # Moving average of how long an admitted request holds its slot (for Retry-After)
+        self.service_seconds = 0.01
+
+    @classmethod
+    def from_env(cls):
+        """Builds a controller configured by MOOD_MAX_CONCURRENCY, MOOD_MAX_QUEUE and MOOD_REQUEST_TIMEOUT_MS"""
+        concurrency = int(os.environ.get('MOOD_MAX_CONCURRENCY', str(os.cpu_count() or 1)))
+        return cls(
+            max_concurrency=concurrency,
+            max_queue=int(os.environ.get('MOOD_MAX_QUEUE', str(2 * concurrency))),
+            default_timeout=float(os.environ.get('MOOD_REQUEST_TIMEOUT_MS', '5000')) / 1000.0
+        )
+
+    @property
+    def enabled(self):
+        return self.max_concurrency > 0
+
+    def deadline(self, timeout=None):
+        """Deadline `timeout` seconds from now (default_timeout when None), on the controller's clock"""
+        return self.clock() + (self.default_timeout if timeout is None else timeout)
+
+    def acquire(self, deadline):
+        """
+        Takes a slot, waiting in the queue until one frees up or the deadline passes.
+
+        Returns:
+            float: Seconds spent queued
+
+        Raises:
+            Overloaded: When the queue is full, the deadline has already passed,
+                or it passes while the request is queued
+        """
+        now = self.clock()
+        with self._lock:
+            if now >= deadline:
+                self.shed["expired"] += 1
+                raise Overloaded("Request deadline already passed", "expired", self._retry_after())
+            if not self.enabled or (self._running < self.max_concurrency and not self._waiters):
+                self._running += 1
+                self.admitted += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                self.shed["queue_full"] += 1
+                raise Overloaded("Server is overloaded", "queue_full", self._retry_after())
+            waiter = _Waiter(deadline)
+            self._waiters.append(waiter)
+            self.queued += 1
+
+        waiter.event.wait(max(0.0, deadline - now))
+        waited = self.clock() - now
+        with self._lock:
+            self.queue_wait_total += waited
+            if not waiter.granted:
+                # release() may already have dropped it as expired, and counted the shed
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self.shed["deadline"] += 1
+                raise Overloaded("Request deadline passed while queued", "deadline", self._retry_after())
+            self.admitted += 1
+        return waited
+
+    def release(self, held_seconds=None):
+        """
+        Frees a slot, handing it to the oldest queued request whose deadline has not passed.
+
+        Args:
+            held_seconds (float): How long the slot was held (feeds the Retry-After estimate)
+        """
+        now = self.clock()
+        with self._lock:
+            if held_seconds is not None:
+                self.service_seconds += 0.1 * (held_seconds - self.service_seconds)
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.deadline <= now:
+                    # Its client has given up: drop it without running it
+                    self.shed["deadline"] += 1
+                    waiter.event.set()
+                    continue
+                waiter.granted = True
+                waiter.event.set()
+                return
+            self._running -= 1
+
+    def check(self, deadline):
+        """
+        Sheds a request that would be shed by acquire() right now, without taking a slot.
+
+        For work that takes its slots later, piece by piece (the streaming
+        endpoint), but should still be turned away at the door.
+
+        Raises:
+            Overloaded: When the deadline has passed or the queue is full
+        """
+        with self._lock:
+            if self.clock() >= deadline:
+                self.shed["expired"] += 1
+                raise Overloaded("Request deadline already passed", "expired", self._retry_after())
+            if self.enabled and len(self._waiters) >= self.max_queue and self._running >= self.max_concurrency:
+                self.shed["queue_full"] += 1
+                raise Overloaded("Server is overloaded", "queue_full", self._retry_after())
+
+    @contextlib.contextmanager
+    def admit(self, deadline):
+        """Runs the block holding a slot (see acquire())"""
+        self.acquire(deadline)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.release(self.clock() - started)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "maxConcurrency": self.max_concurrency,
+                "maxQueue": self.max_queue,
+                "defaultTimeoutMs": self.default_timeout * 1000,
+                "running": self._running,
+                "queueDepth": len(self._waiters),
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "averageQueueWaitMs": self.queue_wait_total / self.queued * 1000 if self.queued else 0.0,
+                "averageServiceMs": self.service_seconds * 1000
+            }
+
+    def retry_after(self):
+        """Seconds a shed client should wait before retrying (the Retry-After value)"""
+        with self._lock:
+            return self._retry_after()
+
+    def _retry_after(self):
+        # Seconds until the current backlog should have drained (caller holds self._lock)
+        slots = max(1, self.max_concurrency)
+        backlog = (len(self._waiters) + self._running) * self.service_seconds / slots
+        return max(1, min(30, math.ceil(backlog)))
+
+# Shared by every request thread of the process
+admission = AdmissionController.from_env()
+
+if __name__ == "__main__":
+    import random
+
+    print("=" * 60)
+    print("ADMISSION CONTROL")
+    print("=" * 60)
+
+    # Offered load of about 2x capacity: 4 slots, 10 ms of work per request, 800 req/s
+    controller = AdmissionController(max_concurrency=4, max_queue=8, default_timeout=0.05)
+    rng = random.Random(0)
+    latencies = []
+    outcomes = {"ok": 0}
+    lock = threading.Lock()
+
+    def request():
+        started = time.monotonic()
+        try:
+            with controller.admit(controller.deadline()):
+                time.sleep(0.010)
+        except Overloaded as e:
+            outcome = e.reason
+        else:
+            outcome = "ok"
+            with lock:
+                latencies.append(time.monotonic() - started)
+        with lock:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    threads = []
+    for _ in range(800):
+        time.sleep(rng.expovariate(800))
+        thread = threading.Thread(target=request)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000
+    print(f"Outcomes: {outcomes}")
+    print(f"Accepted p99 latency: {p99:.1f} ms (deadline {controller.default_timeout * 1000:.0f} ms)")
+    print(f"Stats: {controller.stats()}")
+
+    # Waiters expiring just as slots are released: release() and the waiter's own
+    # timeout race to drop it, and exactly one of them must count the shed
+    racing = AdmissionController(max_concurrency=1, max_queue=64, default_timeout=0.002)
+    race_outcomes = {}
+
+    def racing_request():
+        try:
+            with racing.admit(racing.deadline(rng.uniform(0.0005, 0.003))):
+                time.sleep(0.001)
+        except Overloaded as e:
+            outcome = e.reason
+        except Exception as e:
+            outcome = type(e).__name__
+        else:
+            outcome = "ok"
+        with lock:
+            race_outcomes[outcome] = race_outcomes.get(outcome, 0) + 1
+
+    for _ in range(20):
+        threads = [threading.Thread(target=racing_request) for _ in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    race_stats = racing.stats()
+    print(f"Racing expiry and release: {race_outcomes}, shed {race_stats['shed']}")
+    race_ok = set(race_outcomes) <= {"ok", *SHED_REASONS} and race_stats["running"] == 0 \
+        and race_stats["queueDepth"] == 0 \
+        and all(race_stats["shed"][reason] == race_outcomes.get(reason, 0) for reason in SHED_REASONS)
+
+    print("=" * 60)
+    if not race_ok:
+        raise SystemExit("Expired waiters were not shed exactly once")
+    if p99 > controller.default_timeout * 1000 + 20 or controller.stats()["running"] != 0:
+        raise SystemExit("Accepted latency was not bounded by the deadline")
+    print("Accepted requests stayed within their deadline")
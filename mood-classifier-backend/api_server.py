@@ -1,70 +1,1012 @@
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from flower_integration_bridge import get_flower_art_parameters
+from admission import Overloaded, admission
+from community_mood import community_moods
+from flower_schema import MSGPACK_CONTENT_TYPE, SCHEMA_VERSION, compact_params, get_schema, packb, parse_fields, project
+from metrics import Registry, StageTimer, TEXT_LENGTH_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from micro_batcher import MicroBatcher
+from model_registry import registry
+from profiler import ProfilerBusy, collapsed, profiler, slow_requests
+from startup import ModelStartup, StartupPending
+from streak_store import streak_store
+from typing_session import typing_sessions
+import functools
+import hashlib
+import hmac
 import json
+import math
+import os
+
+# Load the model on a background thread instead of at import (fast cold start)
+LAZY_START = os.environ.get('MOOD_LAZY_START', '0').lower() in ('1', 'true', 'yes', 'on')
+
+# Longest a request waits for a model that is still loading before getting a 503
+READY_TIMEOUT = float(os.environ.get('MOOD_READY_TIMEOUT', '30'))
+
+# Upper bound on the number of items accepted by the batch endpoint
+BATCH_MAX_ITEMS = int(os.environ.get('MOOD_BATCH_MAX_ITEMS', '1000'))
+
+# Records scored per model call by the streaming endpoint, and the longest accepted NDJSON line
+STREAM_CHUNK_SIZE = int(os.environ.get('MOOD_STREAM_CHUNK_SIZE', '256'))
+STREAM_MAX_LINE_BYTES = int(os.environ.get('MOOD_STREAM_MAX_LINE_BYTES', str(64 * 1024)))
+
+# Seconds browsers and proxies may reuse a GET analysis or example response before revalidating
+HTTP_CACHE_MAX_AGE = int(os.environ.get('MOOD_HTTP_CACHE_MAX_AGE', '300'))
+
+# Optional scheduler that merges concurrent single-text requests into one model call
+MICROBATCH_ENABLED = os.environ.get('MOOD_MICROBATCH', '0').lower() in ('1', 'true', 'yes', 'on')
+
+# Seconds between checks of the model files for a new version to hot-reload (0 = off)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MOOD_MODEL_WATCH_INTERVAL', '10'))
+
+# Token for the /api/admin endpoints (unset = admin endpoints disabled)
+ADMIN_TOKEN = os.environ.get('MOOD_ADMIN_TOKEN', '')
+
+# Admin reloads only load models from this directory
+MODELS_DIR = 'models'
+
+# WSGI environ key marking the server's own warmup requests (never shed by admission control)
+WARMUP_ENVIRON_KEY = 'mood.warmup'
+
+def _predict_probabilities(requests):
+    """
+    Scores the (model, text) requests merged by the micro-batcher, with one
+    model call per model version, so each request is scored by the model it pinned
+    """
+    bridge = startup.require(READY_TIMEOUT)
+    by_model = {}
+    for index, (model, _) in enumerate(requests):
+        by_model.setdefault(model, []).append(index)
+    
+    rows = [None] * len(requests)
+    for model, indices in by_model.items():
+        with registry.pinned(model):
+            probabilities = bridge.predict_probabilities([requests[i][1] for i in indices])
+        for index, row in zip(indices, probabilities):
+            rows[index] = row
+    return rows
+
+micro_batcher = MicroBatcher.from_env(_predict_probabilities, admission) if MICROBATCH_ENABLED else None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-@app.route('/api/mood-analysis', methods=['POST'])
+def _warmup(texts):
+    """Sends the warmup set through the real routes so first-call costs are paid before ready"""
+    client = app.test_client()
+    client.environ_base[WARMUP_ENVIRON_KEY] = True
+    # A fresh app context gives the warmup requests their own `g` when a hot
+    # reload runs them from inside the admin request
+    with app.app_context():
+        responses = [client.post('/api/mood-analysis', json={'text': text}) for text in texts]
+        responses.append(client.post('/api/mood-analysis/batch', json={'items': [{'text': text} for text in texts]}))
+        responses.append(client.get('/api/mood-analysis', query_string={'text': texts[0]}))
+        responses.append(client.get('/api/example'))
+        # Not the typing session routes: their sessions are rows in the database shared by every worker
+    
+    failed = [response.status_code for response in responses if response.status_code not in (200, 201)]
+    if failed:
+        raise RuntimeError(f"Warmup requests failed with status {failed}")
+
+startup = ModelStartup(warmup_fn=_warmup)
+
+def _warm_model(model):
+    """Warms up a model that is about to be swapped in, through the real routes"""
+    with registry.pinned(model):
+        _warmup(startup.warmup_texts)
+
+def start_model_watcher():
+    """Starts hot-reloading the model files (again after a fork: threads do not survive it)"""
+    registry.watch(MODEL_WATCH_INTERVAL, warmup_fn=_warm_model)
+
+# Prometheus metrics served at /api/metrics
+metrics_registry = Registry()
+REQUESTS = metrics_registry.counter('mood_api_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'status'))
+REQUEST_LATENCY = metrics_registry.histogram('mood_api_request_duration_seconds', 'Request latency', ('endpoint',))
+STAGE_LATENCY = metrics_registry.histogram(
+    'mood_api_stage_duration_seconds', 'Time spent per request stage (parse, inference, params, serialize)',
+    ('endpoint', 'stage')
+)
+IN_FLIGHT = metrics_registry.gauge('mood_api_in_flight_requests', 'Requests currently being processed')
+TEXT_LENGTH = metrics_registry.histogram(
+    'mood_api_input_text_length_chars', 'Length of analyzed input texts', buckets=TEXT_LENGTH_BUCKETS
+)
+EMOTIONS = metrics_registry.counter('mood_api_predicted_emotions_total', 'Predicted emotions', ('emotion',))
+
+def _runtime_metrics():
+    """Model, cache and scheduler values owned by other modules, read at scrape time"""
+    families = [
+        ('mood_model_info', 'gauge', 'Model version served to new requests', [({'version': startup.model_version or ''}, 1)]),
+        ('mood_model_ready', 'gauge', 'Whether the model is loaded and warmed up', [({}, startup.ready)]),
+        ('mood_model_load_seconds', 'gauge', 'Time taken to load the model', [({}, startup.timings.get('loadSeconds', 0.0))]),
+        ('mood_model_warmup_seconds', 'gauge', 'Time taken by the warmup set', [({}, startup.timings.get('warmupSeconds', 0.0))])
+    ]
+    
+    model = registry.status()
+    families += [
+        ('mood_model_versions_loaded', 'gauge', 'Model versions held in memory', [({}, len(model['loaded']))]),
+        ('mood_model_swaps_total', 'counter', 'Hot reloads that swapped in a new model', [({}, model['swaps'])]),
+        ('mood_model_reload_failures_total', 'counter', 'Hot reloads that failed (the old model kept serving)', [({}, model['failedReloads'])])
+    ]
+    
+    if startup.loaded:
+        from result_cache import probability_cache
+        cache = probability_cache.stats()
+        families += [
+            ('mood_cache_hits_total', 'counter', 'Probability cache hits', [({}, cache['hits'])]),
+            ('mood_cache_misses_total', 'counter', 'Probability cache misses', [({}, cache['misses'])]),
+            ('mood_cache_evictions_total', 'counter', 'Probability cache evictions', [({'reason': 'size'}, cache['evictions']), ({'reason': 'ttl'}, cache['expirations'])]),
+            ('mood_cache_entries', 'gauge', 'Cached texts', [({}, cache['size'])])
+        ]
+    
+    if micro_batcher is not None:
+        scheduler = micro_batcher.stats()
+        families += [
+            ('mood_microbatch_batches_total', 'counter', 'Batches run by the scheduler', [({}, scheduler['batches'])]),
+            ('mood_microbatch_items_total', 'counter', 'Requests served by the scheduler', [({}, scheduler['items'])]),
+            ('mood_microbatch_queue_depth', 'gauge', 'Requests waiting for a batch', [({}, scheduler['queueDepth'])]),
+            ('mood_microbatch_shed_total', 'counter', 'Requests shed by the scheduler (queue full or deadline passed while queued)', [({}, scheduler['shed'])]),
+            ('mood_microbatch_queue_wait_avg_seconds', 'gauge', 'Average queue wait', [({}, scheduler['averageQueueWaitMs'] / 1000.0)])
+        ]
+    community = community_moods.stats()
+    families += [
+        ('mood_community_tracked', 'gauge', 'Communities with stored mood aggregates', [({}, community['communities'])]),
+        ('mood_community_evictions_total', 'counter', 'Communities dropped to stay under MOOD_COMMUNITY_MAX', [({}, community['evictions'])]),
+        ('mood_community_pending', 'gauge', 'Community submissions queued in this worker for the next flush', [({}, community['pendingSubmissions'])]),
+        ('mood_community_flushes_total', 'counter', 'Batched community aggregate writes', [({}, community['flushes'])])
+    ]
+    
+    shedding = admission.stats()
+    families += [
+        ('mood_admission_running', 'gauge', 'Requests holding an inference slot', [({}, shedding['running'])]),
+        ('mood_admission_queue_depth', 'gauge', 'Requests waiting for an inference slot', [({}, shedding['queueDepth'])]),
+        ('mood_admission_admitted_total', 'counter', 'Requests admitted to inference', [({}, shedding['admitted'])]),
+        ('mood_admission_shed_total', 'counter', 'Requests shed with a 503 instead of run (queue_full, deadline passed while queued, expired on arrival)',
+         [({'reason': reason}, count) for reason, count in shedding['shed'].items()]),
+        ('mood_admission_queue_wait_avg_seconds', 'gauge', 'Average wait for an inference slot', [({}, shedding['averageQueueWaitMs'] / 1000.0)])
+    ]
+    
+    families.append(('mood_slow_requests_total', 'counter', 'Requests over MOOD_SLOW_REQUEST_MS kept in the slow request log',
+                     [({}, slow_requests.captured)]))
+    
+    typing = typing_sessions.stats()
+    families += [
+        ('mood_typing_sessions', 'gauge', 'Live typing sessions', [({}, typing['sessions'])]),
+        ('mood_typing_sessions_created_total', 'counter', 'Typing sessions started', [({}, typing['created'])]),
+        ('mood_typing_edits_total', 'counter', 'Text edits applied to typing sessions', [({}, typing['edits'])])
+    ]
+    
+    streaks = streak_store.stats()
+    families += [
+        ('mood_streak_pending_users', 'gauge', 'Users with streak updates waiting to be written', [({}, streaks['pendingUsers'])]),
+        ('mood_streak_flushes_total', 'counter', 'Streak store write transactions', [({}, streaks['flushes'])]),
+        ('mood_streak_rows_written_total', 'counter', 'Streak updates written', [({}, streaks['rowsWritten'])])
+    ]
+    return families
+
+metrics_registry.add_callback(_runtime_metrics)
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _metered():
+    """Whether the request counts in the metrics (the server's own warmup requests do not)"""
+    return not g.get('warmup')
+
+@app.before_request
+def _start_request():
+    # Warmup requests get a timer too, as the routes mark their stages on it
+    g.timer = StageTimer()
+    g.warmup = bool(request.environ.get(WARMUP_ENVIRON_KEY))
+    if _metered():
+        IN_FLIGHT.inc()
+        profiler.request_started()
+    # The whole request uses one model, even when a hot reload swaps models meanwhile
+    if registry.active is not None:
+        g.model_pin = registry.pinned()
+        g.model = g.model_pin.__enter__()
+
+@app.after_request
+def _record_request(response):
+    timer = g.get('timer') if _metered() else None
+    if timer is not None:
+        endpoint = _endpoint_label()
+        for stage, seconds in timer.stages.items():
+            STAGE_LATENCY.observe(seconds, endpoint=endpoint, stage=stage)
+        REQUEST_LATENCY.observe(timer.elapsed(), endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    model = g.get('model')
+    if model is not None:
+        response.headers['X-Model-Version'] = model.version
+    if timer is not None and slow_requests.enabled:
+        slow_requests.observe(
+            timer,
+            endpoint=_endpoint_label(),
+            method=request.method,
+            status=response.status_code,
+            requestBytes=request.content_length,
+            inputChars=g.get('input_chars'),
+            items=g.get('input_items'),
+            modelVersion=model.version if model is not None else None
+        )
+    return response
+
+@app.teardown_request
+def _finish_request(exc):
+    pin = g.pop('model_pin', None)
+    if pin is not None:
+        pin.__exit__(None, None, None)
+    if g.pop('timer', None) is not None and _metered():
+        IN_FLIGHT.dec()
+        profiler.request_finished()
+
+class InvalidQuery(Exception):
+    """Invalid query options; answered with a 400"""
+
+@app.errorhandler(InvalidQuery)
+def _bad_request(e):
+    return jsonify({'error': str(e)}), 400
+
+class AdminDenied(Exception):
+    """Admin endpoint called without the admin token; answered with a 403 (404 while admin is disabled)"""
+
+@app.errorhandler(AdminDenied)
+def _admin_denied(e):
+    return jsonify({'error': str(e)}), 403 if ADMIN_TOKEN else 404
+
+def _require_admin():
+    """Checks the X-Admin-Token header against MOOD_ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        raise AdminDenied('Admin endpoints are disabled (set MOOD_ADMIN_TOKEN)')
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        raise AdminDenied('Invalid admin token')
+
+def _response_shape(bridge):
+    """
+    Reads ?view=full|compact and ?fields=a,b.c for the analysis endpoints.
+    
+    Returns:
+        function: Maps one flower parameter dict to the requested shape
+    """
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'compact'):
+        raise InvalidQuery("view must be 'full' or 'compact'")
+    try:
+        fields = parse_fields(request.args.get('fields'), get_schema(bridge)['paths'])
+    except ValueError as e:
+        raise InvalidQuery(str(e))
+    
+    if view == 'compact':
+        return lambda params: project(compact_params(params), fields)
+    return lambda params: project(params, fields)
+
+def _wants_msgpack():
+    if request.args.get('format') == 'msgpack':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', MSGPACK_CONTENT_TYPE]) == MSGPACK_CONTENT_TYPE
+
+def _respond(payload, status=200):
+    """JSON response, or MessagePack when the client asks for it (?format=msgpack or Accept)"""
+    if _wants_msgpack():
+        try:
+            return Response(packb(payload), status=status, content_type=MSGPACK_CONTENT_TYPE)
+        except RuntimeError as e:
+            payload, status = {'error': str(e)}, 406
+    
+    response = jsonify(payload)
+    response.status_code = status
+    return response
+
+def _content_etag(body, model_version):
+    """Strong ETag from the response bytes and the model version"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(body)
+    return digest.hexdigest()
+
+def _cacheable(response, model_version, etag=None):
+    """
+    Marks a deterministic GET response as cacheable.
+    
+    Adds a content-hash ETag (unless given), Cache-Control and the model version,
+    and turns the response into a 304 when it matches If-None-Match.
+    """
+    if response.status_code != 200:
+        return response
+    response.set_etag(etag or _content_etag(response.get_data(), model_version))
+    response.cache_control.public = True
+    response.cache_control.max_age = HTTP_CACHE_MAX_AGE
+    response.headers['X-Model-Version'] = model_version
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+def _query_number(name):
+    value = request.args[name]
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidQuery(f'{name} must be a number')
+
+def _query_input():
+    """Reads the GET form of an analysis request from the query string"""
+    if 'communityId' in request.args or 'userId' in request.args:
+        raise InvalidQuery('communityId and userId update server-side state; send them with POST')
+    data = {'text': request.args.get('text', '')}
+    for name in ('streakDays', 'communityMood', 'tradingActivity'):
+        if name in request.args:
+            data[name] = _query_number(name)
+    return data
+
+@app.errorhandler(StartupPending)
+def model_loading(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@app.errorhandler(Overloaded)
+def _shed(e):
+    response = jsonify({'error': str(e), 'reason': e.reason})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def _request_deadline():
+    """
+    Deadline of the current request on the admission clock: the X-Request-Timeout-Ms
+    budget or the X-Request-Deadline Unix time in milliseconds, else MOOD_REQUEST_TIMEOUT_MS.
+    
+    Budgets count from the request's arrival, so the time spent parsing headers counts too.
+    """
+    timeout = request.headers.get('X-Request-Timeout-Ms')
+    deadline = request.headers.get('X-Request-Deadline')
+    try:
+        if timeout is not None:
+            seconds = float(timeout) / 1000.0 - g.timer.elapsed()
+        elif deadline is not None:
+            seconds = float(deadline) / 1000.0 - time.time()
+        else:
+            seconds = admission.default_timeout - g.timer.elapsed()
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds):
+        raise InvalidQuery('X-Request-Timeout-Ms and X-Request-Deadline must be numbers of milliseconds')
+    return admission.deadline(seconds)
+
+def _admitted(view):
+    """
+    Runs an inference route under admission control: it waits for an
+    inference slot up to its deadline, or gets a 503 with Retry-After when
+    the queue is full or the deadline passes first (see admission.py).
+    """
+    @functools.wraps(view)
+    def admitted_view(*args, **kwargs):
+        if request.environ.get(WARMUP_ENVIRON_KEY):
+            return view(*args, **kwargs)
+        with admission.admit(_request_deadline()):
+            g.timer.mark('queue')
+            return view(*args, **kwargs)
+    return admitted_view
+
+def _admitted_unless_batched(view):
+    """
+    _admitted, except while the micro-batcher is on: then the request is only
+    checked at the door and keeps its deadline for the batcher, which takes
+    one inference slot per formed batch. Holding a slot through the batching
+    window would cap every batch at MOOD_MAX_CONCURRENCY requests.
+    """
+    admitted_view = _admitted(view)
+    
+    @functools.wraps(view)
+    def batched_view(*args, **kwargs):
+        if micro_batcher is None or request.environ.get(WARMUP_ENVIRON_KEY):
+            return admitted_view(*args, **kwargs)
+        g.deadline = _request_deadline()
+        admission.check(g.deadline)
+        return view(*args, **kwargs)
+    return batched_view
+
+@app.route('/api/mood-analysis', methods=['GET', 'POST'])
+@_admitted_unless_batched
 def analyze_mood():
     """
     API endpoint for mood analysis and flower art parameter generation
+    
+    GET takes the same inputs in the query string (?text=...&streakDays=5) and
+    returns a cacheable response: the output only depends on the inputs and
+    the model version, so it carries an ETag and Cache-Control.
+    """
+    bridge = startup.require(READY_TIMEOUT)
+    shape = _response_shape(bridge)
+    timer = g.timer
+    query = _query_input() if request.method == 'GET' else None
+    
+    try:
+        data = request.get_json(silent=True) if query is None else query
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Body must be a JSON object'}), 400
+        
+        # Checked before batching: a bad request must not reach the batched model call
+        try:
+            inputs = bridge.submission_inputs(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        text = inputs.pop('text')
+        timer.mark('parse')
+        
+        if _metered():
+            TEXT_LENGTH.observe(len(text))
+        g.input_chars = len(text)
+        
+        # Classify (batched with concurrent requests when the scheduler is on)
+        if micro_batcher is not None:
+            probabilities = micro_batcher.predict((registry.current(), text), deadline=g.get('deadline'))
+        else:
+            probabilities = bridge.predict_probabilities([text])[0]
+        timer.mark('inference')
+        
+        # Fold the submission into its community's mood and its user's streak, then map it
+        params = bridge.submission_params(probabilities, mark=timer.mark, **inputs)
+        timer.mark('params')
+        if _metered():
+            EMOTIONS.inc(emotion=params['currentEmotion'])
+        
+        payload = {
+            'success': True,
+            'modelVersion': bridge.engine.version,
+            'data': shape(params)
+        }
+        if request.args.get('view') == 'compact':
+            payload['schemaVersion'] = SCHEMA_VERSION
+        response = _respond(payload)
+        if query is not None:
+            response = _cacheable(response, bridge.engine.version)
+        timer.mark('serialize')
+        return response
+        
+    except Overloaded:
+        # Shed by the micro-batcher: answered with a 503 by _shed
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mood-analysis/batch', methods=['POST'])
+@_admitted
+def analyze_mood_batch():
+    """
+    Batch endpoint: scores many texts with a single model pass.
+    
+    Body: {"items": [{"text": ..., "streakDays": ..., "communityMood": ..., "tradingActivity": ...,
+                      "communityId": ..., "userId": ...}, ...]}
+    Each result carries its own success flag, so one bad item does not fail the batch.
     """
+    bridge = startup.require(READY_TIMEOUT)
+    shape = _response_shape(bridge)
+    
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
         
-        # Extract parameters
-        text = data.get('text', '')
-        streak_days = data.get('streakDays', 0)
-        community_mood = data.get('communityMood', 0.5)
-        trading_activity = data.get('tradingActivity', 0.5)
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({'error': f'Too many items (max {BATCH_MAX_ITEMS})'}), 413
         
-        if not text:
-            return jsonify({'error': 'Text is required'}), 400
+        items = [item if isinstance(item, dict) else {} for item in items]
+        texts = [item.get('text', '') for item in items]
+        for text in texts:
+            if isinstance(text, str) and text and _metered():
+                TEXT_LENGTH.observe(len(text))
+        g.input_chars = sum(len(text) for text in texts if isinstance(text, str))
+        g.input_items = len(items)
+        g.timer.mark('parse')
         
-        # Get flower art parameters
-        params = get_flower_art_parameters(
-            text=text,
-            streak_days=streak_days,
-            community_mood=community_mood,
-            trading_activity=trading_activity
+        results = bridge.get_flower_art_parameters_batch(
+            texts=texts,
+            streak_days=[item.get('streakDays', 0) for item in items],
+            community_mood=[item.get('communityMood', 0.5) for item in items],
+            trading_activity=[item.get('tradingActivity', 0.5) for item in items],
+            community_ids=[item.get('communityId') for item in items],
+            user_ids=[item.get('userId') for item in items]
         )
+        g.timer.mark('inference')
+        
+        for result in results:
+            if result['success']:
+                if _metered():
+                    EMOTIONS.inc(emotion=result['data']['currentEmotion'])
+                result['data'] = shape(result['data'])
         
-        return jsonify({
+        payload = {
             'success': True,
-            'data': params
-        })
+            'modelVersion': bridge.engine.version,
+            'count': len(results),
+            'errors': sum(1 for result in results if not result['success']),
+            'results': results
+        }
+        if request.args.get('view') == 'compact':
+            payload['schemaVersion'] = SCHEMA_VERSION
+        response = _respond(payload)
+        g.timer.mark('serialize')
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/mood-analysis/stream', methods=['POST'])
+def analyze_mood_stream():
+    """
+    Streaming bulk endpoint for newline-delimited JSON.
+    
+    Body: one {"text": ..., "streakDays": ..., "communityMood": ..., "tradingActivity": ..., "communityId": ...,
+    "userId": ...} object per line. Records are scored STREAM_CHUNK_SIZE at a time and each chunk's
+    results are written back (one per line, same shape as the batch results) before
+    the next chunk is read, so memory use does not grow with the input size.
+    
+    An overloaded server turns the stream away with a 503. Once streaming, each
+    chunk waits for an inference slot like any other request; a chunk that is
+    shed gets an error result per record instead of failing the stream.
+    """
+    if not request.environ.get(WARMUP_ENVIRON_KEY):
+        admission.check(_request_deadline())
+    bridge = startup.require(READY_TIMEOUT)
+    shape = _response_shape(bridge)
+    
+    def score(records):
+        if not records:
+            return []
+        try:
+            with admission.admit(admission.deadline()):
+                return bridge.get_flower_art_parameters_batch(
+                    texts=[record['item'].get('text', '') for record in records],
+                    streak_days=[record['item'].get('streakDays', 0) for record in records],
+                    community_mood=[record['item'].get('communityMood', 0.5) for record in records],
+                    trading_activity=[record['item'].get('tradingActivity', 0.5) for record in records],
+                    community_ids=[record['item'].get('communityId') for record in records],
+                    user_ids=[record['item'].get('userId') for record in records]
+                )
+        except Overloaded as e:
+            return [{'success': False, 'error': str(e)} for _ in records]
+    
+    def generate():
+        for chunk in _read_ndjson_chunks(request.stream, STREAM_CHUNK_SIZE):
+            results = score([record for record in chunk if 'error' not in record])
+            
+            scored = iter(results)
+            lines = []
+            for record in chunk:
+                if 'error' in record:
+                    result = {'index': record['index'], 'success': False, 'error': record['error']}
+                else:
+                    result = next(scored)
+                    result['index'] = record['index']
+                    if result['success']:
+                        if _metered():
+                            TEXT_LENGTH.observe(len(record['item']['text']))
+                            EMOTIONS.inc(emotion=result['data']['currentEmotion'])
+                        result['data'] = shape(result['data'])
+                lines.append(json.dumps(result, sort_keys=True, separators=(',', ':')))
+            yield '\n'.join(lines) + '\n'
+    
+    return Response(stream_with_context(generate()), content_type='application/x-ndjson')
+
+def _typing_inputs(data, inputs):
+    """Flower inputs of a typing session: the request's streakDays/communityMood/tradingActivity over `inputs`"""
+    inputs = dict(inputs)
+    for name, key in (('streakDays', 'streak_days'), ('communityMood', 'community_mood'), ('tradingActivity', 'trading_activity')):
+        if name in data:
+            value = data[name]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise InvalidQuery(f'{name} must be a number')
+            inputs[key] = value
+    return inputs
+
+def _typing_edits(data):
+    """Reads [{"start": n, "end": m, "text": "..."}, ...] into (start, end, text) tuples"""
+    edits = data.get('edits', [])
+    if not isinstance(edits, list):
+        raise InvalidQuery('edits must be a list')
+    parsed = []
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise InvalidQuery('Each edit must be an object')
+        start, end, text = edit.get('start'), edit.get('end', edit.get('start')), edit.get('text', '')
+        if type(start) is not int or type(end) is not int or not isinstance(text, str):
+            raise InvalidQuery('Each edit needs integer start/end offsets and a text string')
+        parsed.append((start, end, text))
+    return parsed
+
+def _typing_response(bridge, shape, session_id, session, status=200):
+    # `session` is a snapshot: scored without holding the session store's lock
+    probabilities = session.probabilities()
+    g.timer.mark('inference')
+    params = bridge.flower_params_from_probabilities(probabilities, **session.inputs)
+    g.timer.mark('params')
+    payload = {
+        'success': True,
+        'sessionId': session_id,
+        'revision': session.revision,
+        'length': len(session.text),
+        'modelVersion': session.model.version,
+        'data': shape(params)
+    }
+    if request.args.get('view') == 'compact':
+        payload['schemaVersion'] = SCHEMA_VERSION
+    response = _respond(payload, status)
+    g.timer.mark('serialize')
+    return response
+
+@app.route('/api/typing-sessions', methods=['POST'])
+@_admitted
+def start_typing_session():
+    """
+    Starts a live typing session, for a flower that reacts while the user types.
+    
+    Body: {"text": ..., "streakDays": ..., "communityMood": ..., "tradingActivity": ...} (all optional).
+    Returns the session id and the flower parameters of the text. Submit the
+    finished text to /api/mood-analysis to record community moods and streaks.
+    """
+    bridge = startup.require(READY_TIMEOUT)
+    shape = _response_shape(bridge)
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    text = data.get('text', '')
+    if not isinstance(text, str):
+        return jsonify({'error': 'text must be a string'}), 400
+    if len(text) > typing_sessions.max_chars:
+        return jsonify({'error': f'Text too long (max {typing_sessions.max_chars} characters)'}), 413
+    inputs = _typing_inputs(data, {})
+    g.timer.mark('parse')
+    
+    g.input_chars = len(text)
+    session_id, session = typing_sessions.create(registry.current(), text, inputs)
+    return _typing_response(bridge, shape, session_id, session, 201)
+
+@app.route('/api/typing-sessions/<session_id>/edits', methods=['POST'])
+@_admitted
+def edit_typing_session(session_id):
+    """
+    Applies text edits to a typing session and returns the refreshed flower parameters.
+    
+    Body: {"baseRevision": n, "edits": [{"start": s, "end": e, "text": "..."}, ...]}, plus
+    optional streakDays/communityMood/tradingActivity updates. Each edit replaces
+    text[start:end] (Unicode code point offsets) of the text left by the previous
+    edit: append with start = end = length, delete with an empty text. Only the
+    words an edit touches are re-scored; the result equals scoring the whole text.
+    A baseRevision other than the session's revision gets a 409 with the current
+    revision and length, so the client can resend its full text as one edit.
+    """
+    bridge = startup.require(READY_TIMEOUT)
+    shape = _response_shape(bridge)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    edits = _typing_edits(data)
+    base_revision = data.get('baseRevision')
+    g.timer.mark('parse')
+    
+    # Any worker can take the edit: the session is synced with the shared store first.
+    # Only the checks and the edits run inside the store's transaction.
+    with typing_sessions.editing(session_id, registry.current()) as session:
+        if session is None:
+            return jsonify({'error': 'Unknown or expired typing session; start a new one with the full text'}), 404
+        if base_revision is not None and base_revision != session.revision:
+            return jsonify({
+                'error': 'Session has moved on from baseRevision',
+                'revision': session.revision,
+                'length': len(session.text)
+            }), 409
+        inputs = _typing_inputs(data, session.inputs)
+        try:
+            session.apply_edits(edits, typing_sessions.max_chars)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'revision': session.revision, 'length': len(session.text)}), 400
+        session.inputs = inputs
+        snapshot = session.snapshot()
+    g.input_chars = sum(len(text) for _, _, text in edits)
+    g.input_items = len(edits)
+    return _typing_response(bridge, shape, session_id, snapshot)
+
+@app.route('/api/typing-sessions/<session_id>', methods=['DELETE'])
+def end_typing_session(session_id):
+    """Ends a typing session"""
+    if not typing_sessions.delete(session_id):
+        return jsonify({'error': 'Unknown or expired typing session'}), 404
+    return jsonify({'success': True})
+
+def _read_ndjson_chunks(stream, chunk_size):
+    """
+    Reads NDJSON records from a file-like byte stream, chunk_size records at a time.
+    
+    Blank lines are skipped. Lines that are not JSON objects (or are longer than
+    STREAM_MAX_LINE_BYTES) become {"index", "error"} records instead of failing the stream.
+    
+    Yields:
+        list[dict]: {"index": n, "item": {...}} or {"index": n, "error": "..."} records
+    """
+    chunk = []
+    index = 0
+    while True:
+        line = stream.readline(STREAM_MAX_LINE_BYTES + 1)
+        if not line:
+            break
+        
+        if len(line) > STREAM_MAX_LINE_BYTES and not line.endswith(b'\n'):
+            # Drop the rest of the oversized line without buffering it
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(STREAM_MAX_LINE_BYTES)
+            chunk.append({'index': index, 'error': f'Line too long (max {STREAM_MAX_LINE_BYTES} bytes)'})
+        elif line.strip():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            if isinstance(item, dict):
+                chunk.append({'index': index, 'item': item})
+            else:
+                chunk.append({'index': index, 'error': 'Line must be a JSON object'})
+        else:
+            continue
+        
+        index += 1
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    
+    if chunk:
+        yield chunk
+
+@app.route('/api/flower-schema', methods=['GET'])
+def flower_schema():
+    """
+    Constant sections of the flower parameters, for clients using ?view=compact.
+    
+    Cacheable: the ETag changes only with the schema version or the model.
+    """
+    schema = get_schema(startup.require(READY_TIMEOUT))
+    response = _respond(schema['schema'])
+    if response.status_code != 200:
+        return response
+    response.set_etag(schema['etag'])
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+@app.route('/api/community/<community_id>/mood', methods=['GET'])
+def community_mood(community_id):
+    """
+    Current mood of a community, aggregated from the submissions that named it
+    (sliding-window mean and time-decayed moving average, read in constant time)
+    """
+    snapshot = community_moods.get(community_id)
+    if snapshot is None:
+        return jsonify({'error': 'No submissions recorded for this community'}), 404
+    return jsonify(snapshot)
+
+@app.route('/api/users/<user_id>/streak', methods=['GET'])
+def user_streak(user_id):
+    """
+    Stored good-mood streak of a user (one primary key lookup)
+    """
+    snapshot = streak_store.get(user_id)
+    if snapshot is None:
+        return jsonify({'error': 'No good-mood submissions recorded for this user'}), 404
+    return jsonify(snapshot)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """
-    Health check endpoint
+    Health check endpoint (liveness only; does not wait for the model)
     """
     return jsonify({'status': 'healthy', 'service': 'mood-classifier-api'})
 
-@app.route('/api/example', methods=['GET'])
-def example_usage():
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
     """
-    Example usage endpoint
+    Readiness endpoint: 200 once the model is loaded and warmed up, 503 before that
     """
-    example_data = {
-        'text': 'I\'m feeling really happy today!',
-        'streakDays': 5,
-        'communityMood': 0.8,
-        'tradingActivity': 0.7
-    }
-    
-    params = get_flower_art_parameters(**example_data)
+    status = startup.status()
+    status['timings']['serverImportSeconds'] = SERVER_IMPORT_SECONDS
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """
+    Runtime statistics (loaded models, admission control, classifier result cache and micro-batching scheduler)
+    """
+    if startup.loaded:
+        from result_cache import probability_cache
+        cache_stats = probability_cache.stats()
+    else:
+        cache_stats = {'loaded': False}
     
     return jsonify({
-        'example_request': example_data,
-        'example_response': params
+        'model': registry.status(),
+        'admission': admission.stats(),
+        'cache': cache_stats,
+        'scheduler': micro_batcher.stats() if micro_batcher is not None else {'enabled': False},
+        'community': community_moods.stats(),
+        'streaks': streak_store.stats(),
+        'typing': typing_sessions.stats()
     })
 
+@app.route('/api/admin/model/reload', methods=['POST'])
+def reload_model():
+    """
+    Hot-reloads the model of every worker process (needs the X-Admin-Token header).
+    
+    Body (optional): {"artifact": "models/<name>.moodmodel"} loads that artifact,
+    {"version": "..."} switches back to a version still held in memory. Without
+    either, the configured model (MOOD_MODEL_ARTIFACT) is reloaded if its files
+    changed. The new model is warmed up before the swap; requests that are
+    already running finish on the old one. This worker swaps before it
+    answers; the others follow the published choice within
+    MOOD_MODEL_WATCH_INTERVAL seconds (see ModelRegistry.publish).
+    """
+    _require_admin()
+    startup.require(READY_TIMEOUT)
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    
+    source = data.get('artifact')
+    if source is not None and not (isinstance(source, str) and _in_models_dir(source)):
+        return jsonify({'error': f'artifact must be a path inside {MODELS_DIR}/'}), 400
+    
+    try:
+        if data.get('version') is not None:
+            result = registry.rollback(str(data['version']), warmup_fn=_warm_model)
+        else:
+            result = registry.activate(source, warmup_fn=_warm_model)
+        # The other workers switch on their next model check
+        registry.publish(registry.active)
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except Exception as e:
+        return jsonify({'error': f'Reload failed, still serving {registry.active.version}: {e}'}), 500
+    
+    result['success'] = True
+    return jsonify(result)
+
+@app.errorhandler(ProfilerBusy)
+def _profiler_busy(e):
+    return jsonify({'error': str(e)}), 409
+
+def _profile_response(result):
+    """A profile as collapsed stacks (text/plain, for flamegraph tools) or as JSON with ?format=json"""
+    if request.args.get('format') == 'json':
+        return jsonify(dict(result, stacks=dict(result['stacks'].most_common())))
+    response = Response(collapsed(result), content_type='text/plain; charset=utf-8')
+    response.headers['X-Profile-Samples'] = str(result['samples'])
+    return response
+
+@app.route('/api/admin/profile', methods=['POST'])
+def start_profile():
+    """
+    Samples this worker's stacks for a while (needs the X-Admin-Token header).
+    
+    Query: seconds (default 5, at most MOOD_PROFILE_MAX_SECONDS), intervalMs (default 10),
+    threads=requests|all (default: only threads serving a request) and wait=1.
+    With wait=1 the response is the profile itself; otherwise profiling runs
+    in the background (202) and GET /api/admin/profile returns it afterwards.
+    """
+    _require_admin()
+    # The admin request itself is not part of the profile
+    profiler.request_finished()
+    try:
+        seconds = float(request.args.get('seconds', '5'))
+        interval = float(request.args.get('intervalMs', '10')) / 1000.0
+    except ValueError:
+        raise InvalidQuery('seconds and intervalMs must be numbers')
+    threads = request.args.get('threads', 'requests')
+    if threads not in ('requests', 'all'):
+        raise InvalidQuery("threads must be 'requests' or 'all'")
+    
+    try:
+        sampler = profiler.start(seconds, interval, requests_only=threads == 'requests')
+    except ValueError as e:
+        raise InvalidQuery(str(e))
+    if request.args.get('wait') in ('1', 'true'):
+        sampler.join()
+        return _profile_response(profiler.last_result)
+    return jsonify({'success': True, 'seconds': seconds, 'intervalMs': interval * 1000, 'threads': threads}), 202
+
+@app.route('/api/admin/profile', methods=['GET'])
+def last_profile():
+    """
+    The last profile of this worker (needs the X-Admin-Token header): collapsed
+    stacks, or ?format=json. 202 while one is still running.
+    """
+    _require_admin()
+    if profiler.running:
+        return jsonify({'status': 'running'}), 202
+    if profiler.last_result is None:
+        return jsonify({'error': 'No profile taken yet (POST /api/admin/profile)'}), 404
+    return _profile_response(profiler.last_result)
+
+@app.route('/api/admin/slow-requests', methods=['GET'])
+def slow_request_log():
+    """
+    Requests of this worker that took at least MOOD_SLOW_REQUEST_MS, newest first,
+    with their stage timings and input size (needs the X-Admin-Token header)
+    """
+    _require_admin()
+    return jsonify(dict(slow_requests.stats(), requests=slow_requests.entries()))
+
+def _in_models_dir(path):
+    root = os.path.realpath(MODELS_DIR)
+    target = os.path.realpath(path)
+    return target != root and os.path.commonpath([root, target]) == root
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Metrics in Prometheus text format
+    """
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+EXAMPLE_REQUEST = {
+    'text': 'I\'m feeling really happy today!',
+    'streakDays': 5,
+    'communityMood': 0.8,
+    'tradingActivity': 0.7
+}
+
+# Serialized /api/example responses by model version, built on first use (the warmup)
+_example_responses = {}
+
+def _example_response(bridge):
+    """Body and ETag of the example response for the bridge's current model"""
+    version = bridge.engine.version
+    cached = _example_responses.get(version)
+    if cached is None:
+        params = bridge.get_flower_art_parameters(
+            text=EXAMPLE_REQUEST['text'],
+            streak_days=EXAMPLE_REQUEST['streakDays'],
+            community_mood=EXAMPLE_REQUEST['communityMood'],
+            trading_activity=EXAMPLE_REQUEST['tradingActivity']
+        )
+        body = jsonify({
+            'example_request': EXAMPLE_REQUEST,
+            'example_response': params
+        }).get_data()
+        cached = _example_responses[version] = (body, _content_etag(body, version))
+    return cached
+
+@app.route('/api/example', methods=['GET'])
+def example_usage():
+    """
+    Example usage endpoint (precomputed once per model version)
+    """
+    bridge = startup.require(READY_TIMEOUT)
+    body, etag = _example_response(bridge)
+    return _cacheable(Response(body, content_type='application/json'), bridge.engine.version, etag)
+
+SERVER_IMPORT_SECONDS = time.perf_counter() - _import_started
+
+if LAZY_START:
+    startup.start()
+else:
+    startup.run()
+    if startup.error is not None:
+        raise RuntimeError(f"Model startup failed: {startup.error}")
+start_model_watcher()
+
 if __name__ == '__main__':
     print("=" * 60)
     print("MOOD CLASSIFIER API SERVER")
@@ -72,8 +1014,18 @@ if __name__ == '__main__':
     print("Server starting on http://localhost:5000")
     print("Available endpoints:")
     print("  POST /api/mood-analysis - Analyze text and get flower parameters")
+    print("  GET  /api/mood-analysis?text=... - Same, as a cacheable GET")
+    print("  POST /api/mood-analysis/batch - Analyze many texts in one model pass")
+    print("  POST /api/mood-analysis/stream - Analyze NDJSON records, streamed back as NDJSON")
+    print("  GET  /api/flower-schema - Constant flower parameters (for ?view=compact)")
+    print("  GET  /api/community/<id>/mood - Server-side community mood")
+    print("  GET  /api/users/<id>/streak - Stored good-mood streak")
     print("  GET  /api/health        - Health check")
+    print("  GET  /api/ready         - Readiness (model loaded and warmed up)")
     print("  GET  /api/example       - Example usage")
+    print("  GET  /api/stats         - Model, cache and scheduler statistics")
+    print("  POST /api/admin/model/reload - Hot-reload the model (X-Admin-Token)")
+    print("  GET  /api/metrics       - Prometheus metrics")
     print("=" * 60)
     
     app.run(debug=True, host='0.0.0.0', port=5001)
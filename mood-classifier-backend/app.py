@@ -1,59 +1,191 @@
+import time
+
 import streamlit as st
 import numpy as np
 import pandas as pd
-import joblib
 import altair as alt
+from model_registry import registry
 
-pipe_lr=joblib.load(open('models/emotion_classifier_pipe_lr_03_jan_2022.pkl', 'rb'))
+# Rows scored per model call on the Bulk page
+BULK_CHUNK_ROWS = 5000
 
-#function to read the emotion
-def predict_emotions(docx):
-    results=pipe_lr.predict([docx] )
-    return results
+# Confidence histogram bins on the Bulk page
+CONFIDENCE_BINS = 20
 
-def get_prediction_proba(docx):
-    results=pipe_lr.predict_proba([docx] )
-    return results
+@st.cache_resource(show_spinner="Loading the model...")
+def load_registry():
+    """
+    Loads the model once per server process. Streamlit re-runs this script on
+    every interaction; the cached registry is shared by every rerun and
+    session, and follows hot reloads of the model files.
+    """
+    registry.current()
+    return registry
 
 emotions_emoji_dict = {"anger":"😠","disgust":"🤮", "fear":"😨😱", "happy":"🤗", "joy":"😂", "neutral":"😐", "sad":"😔", "sadness":"😔", "shame":"😳", "surprise":"😮"}
 
+def score_csv(engine, file, text_column, chunk_rows=BULK_CHUNK_ROWS, progress=None):
+    """
+    Scores the text column of a CSV file, chunk_rows rows per model call.
+
+    Only the prediction and its confidence are kept per row (plus running
+    per-class probability sums), so memory stays small for large files.
+
+    Args:
+        engine (SparseEmotionEngine): Model to score with
+        file: Binary file object of the CSV (an uploaded file)
+        text_column (str): Column holding the texts
+        chunk_rows (int): Rows per model call
+        progress (callable): Called with the fraction of the file read after each chunk
+
+    Returns:
+        dict: Per-row predicted class index (-1 for empty texts) and confidence,
+        per-class probability sums and timing
+    """
+    file.seek(0, 2)
+    size = file.tell() or 1
+    file.seek(0)
+
+    started = time.perf_counter()
+    labels = []
+    confidences = []
+    probability_sum = np.zeros(len(engine.class_list))
+    for chunk in pd.read_csv(file, usecols=[text_column], dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        texts = chunk[text_column].tolist()
+        chunk_labels = np.full(len(texts), -1, dtype=np.int16)
+        chunk_confidences = np.zeros(len(texts), dtype=np.float32)
+
+        present = [i for i, text in enumerate(texts) if text.strip()]
+        if present:
+            probabilities = engine.predict_proba([texts[i] for i in present])
+            chunk_labels[present] = probabilities.argmax(axis=1)
+            chunk_confidences[present] = probabilities.max(axis=1)
+            probability_sum += probabilities.sum(axis=0)
+
+        labels.append(chunk_labels)
+        confidences.append(chunk_confidences)
+        if progress is not None:
+            progress(min(1.0, file.tell() / size))
+
+    labels = np.concatenate(labels) if labels else np.zeros(0, dtype=np.int16)
+    return {
+        "labels": labels,
+        "confidence": np.concatenate(confidences) if confidences else np.zeros(0, dtype=np.float32),
+        "probabilitySum": probability_sum,
+        "scored": int((labels >= 0).sum()),
+        "seconds": time.perf_counter() - started,
+        "modelVersion": engine.version
+    }
+
+def emotion_distribution(result, classes, min_confidence=0.0):
+    """Predicted emotion counts and shares among rows at or above min_confidence"""
+    labels = result["labels"]
+    keep = (labels >= 0) & (result["confidence"] >= min_confidence)
+    counts = np.bincount(labels[keep], minlength=len(classes))
+    total = counts.sum()
+    return pd.DataFrame({
+        "emotions": classes,
+        "rows": counts,
+        "share": counts / total if total else np.zeros(len(classes))
+    })
+
+def home_page(engine):
+    st.subheader("Home-Emotion in text")
+
+    with st.form(key='emotion_clf_form'):
+        raw_text = st.text_area("Please enter your text")
+        submit_text = st.form_submit_button(label="Submit")
+
+    if submit_text:
+        col1,col2 = st.columns(2)
+        # One model pass gives the prediction, its confidence and every class probability
+        score = engine.score([raw_text])[0]
+        proba_df = pd.DataFrame({"emotions": engine.class_list, "probability": score.row})
+        with col1:
+            st.success('Original text')
+            st.write(raw_text)
+
+            st.success("Prediction")
+            emoji_icon= emotions_emoji_dict.get(score.label, "")
+            st.write("{}:{}".format(score.label,emoji_icon))
+            st.write("Confidence: {}".format(score.confidence))
+
+        with col2:
+            st.success('Prediction Probability')
+            st.dataframe(proba_df, hide_index=True)
+
+        fig=alt.Chart(proba_df).mark_bar().encode(x='emotions', y='probability',color='emotions')
+        st.altair_chart(fig,use_container_width=True)
+
+def bulk_page(engine):
+    st.subheader("Bulk-Score a CSV file")
+
+    uploaded = st.file_uploader("CSV file with one text per row", type=["csv"])
+    if uploaded is None:
+        return
+
+    columns = list(pd.read_csv(uploaded, nrows=0).columns)
+    uploaded.seek(0)
+    if not columns:
+        st.error("The file has no header row")
+        return
+    text_column = st.selectbox("Text column", columns, index=columns.index("text") if "text" in columns else 0)
+
+    # Scored once per file, column and model; later widget changes only re-aggregate
+    key = (getattr(uploaded, "file_id", None) or (uploaded.name, uploaded.size), text_column, engine.version)
+    cached = st.session_state.get("bulk")
+    if cached is None or cached["key"] != key:
+        if not st.button("Score file"):
+            return
+        bar = st.progress(0.0, text="Scoring...")
+        result = score_csv(engine, uploaded, text_column,
+                           progress=lambda done: bar.progress(done, text=f"Scoring... {done:.0%}"))
+        bar.empty()
+        cached = st.session_state["bulk"] = {"key": key, "result": result}
+    result = cached["result"]
+
+    rows = len(result["labels"])
+    st.success(f"Scored {result['scored']:,} of {rows:,} rows in {result['seconds']:.1f}s "
+               f"({result['scored'] / max(result['seconds'], 1e-9):,.0f} rows/s, model {result['modelVersion']})")
+    if not result["scored"]:
+        return
+
+    classes = engine.class_list
+    min_confidence = st.slider("Minimum confidence", 0.0, 1.0, 0.0, 0.05)
+    distribution = emotion_distribution(result, classes, min_confidence)
+    col1,col2 = st.columns(2)
+    with col1:
+        st.success("Predicted emotions")
+        st.dataframe(distribution.style.format({"share": "{:.1%}"}), hide_index=True)
+    with col2:
+        st.success("Mean probability")
+        mean_df = pd.DataFrame({"emotions": classes, "probability": result["probabilitySum"] / result["scored"]})
+        st.dataframe(mean_df, hide_index=True)
+
+    fig=alt.Chart(distribution).mark_bar().encode(x='emotions', y='rows', color='emotions')
+    st.altair_chart(fig,use_container_width=True)
+
+    counts, edges = np.histogram(result["confidence"][result["labels"] >= 0], bins=CONFIDENCE_BINS, range=(0.0, 1.0))
+    histogram = pd.DataFrame({"confidence": edges[:-1] + 0.5 / CONFIDENCE_BINS, "rows": counts})
+    st.altair_chart(alt.Chart(histogram).mark_bar().encode(x='confidence', y='rows'), use_container_width=True)
+
+    scored = pd.DataFrame({
+        "row": np.arange(rows),
+        "emotion": np.where(result["labels"] >= 0, np.asarray(classes, dtype=object)[result["labels"]], ""),
+        "confidence": result["confidence"]
+    })
+    st.download_button("Download scored rows", scored.to_csv(index=False), file_name="scored.csv", mime="text/csv")
+
 def main():
     st.title('Emotion Classifier App')
-    menu=["Home", "Monitor", "About"]
+    menu=["Home", "Bulk", "Monitor", "About"]
     choice=st.sidebar.selectbox("Menu",menu)
+    engine=load_registry().current().engine
 
     if choice == "Home":
-        st.subheader("Home-Emotion in text")
-
-        with st.form(key='emotion_clf_form'):
-            raw_text = st.text_area("Please enter your text")
-            submit_text = st.form_submit_button(label="Submit")
-
-        if submit_text:
-            col1,col2 = st.columns(2)
-            prediction=predict_emotions(raw_text)
-            probability=get_prediction_proba(raw_text)
-            with col1:
-                st.success('Original text')
-                st.write(raw_text)
-
-                st.success("Prediction")
-                emoji_icon= emotions_emoji_dict[prediction[0]]
-                st.write("{}:{}".format(prediction[0],emoji_icon))
-                st.write("COnfidence: {}".format(np.max(probability)))
-
-            with col2:
-                st.success('Prediction Probability')
-                st.write(probability)
-                proba_df=pd.DataFrame(probability,columns=pipe_lr.classes_)
-                st.write(proba_df.transpose())
-                proba_df_clean=proba_df.transpose().reset_index()
-                proba_df_clean.columns=["emotions","probability"]
-
-            fig=alt.Chart(proba_df_clean).mark_bar().encode(x='emotions', y='probability',color='emotions')
-            st.altair_chart(fig,use_container_width=True)
-                
-
+        home_page(engine)
+    elif choice == "Bulk":
+        bulk_page(engine)
     elif choice == "Monitor":
         st.subheader("Monitor App")
     else:
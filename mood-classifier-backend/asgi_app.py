@@ -0,0 +1,354 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from startup import ModelStartup, StartupPending
+
+# Seconds a request may take (queueing + inference) before it gets a 504
+REQUEST_TIMEOUT = float(os.environ.get('MOOD_ASGI_TIMEOUT', '10'))
+
+# Inference pool: "thread" (shares the loaded model) or "process" (one model per process)
+EXECUTOR_KIND = os.environ.get('MOOD_ASGI_EXECUTOR', 'thread')
+EXECUTOR_WORKERS = int(os.environ.get('MOOD_ASGI_WORKERS', str(multiprocessing.cpu_count())))
+
+# Jobs allowed in the pool (running + queued); beyond this requests get a fast 503
+MAX_PENDING = int(os.environ.get('MOOD_ASGI_MAX_PENDING', str(EXECUTOR_WORKERS * 8)))
+
+MAX_BODY_BYTES = int(os.environ.get('MOOD_ASGI_MAX_BODY_BYTES', str(1024 * 1024)))
+BATCH_MAX_ITEMS = int(os.environ.get('MOOD_BATCH_MAX_ITEMS', '1000'))
+READY_TIMEOUT = float(os.environ.get('MOOD_READY_TIMEOUT', '30'))
+LAZY_START = os.environ.get('MOOD_LAZY_START', '0').lower() in ('1', 'true', 'yes', 'on')
+
+# Seconds between checks of the model files for a new version to hot-reload (0 = off)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MOOD_MODEL_WATCH_INTERVAL', '10'))
+
+EXAMPLE_REQUEST = {
+    'text': 'I\'m feeling really happy today!',
+    'streakDays': 5,
+    'communityMood': 0.8,
+    'tradingActivity': 0.7
+}
+
+class HTTPError(Exception):
+    """Ends a request with a JSON error body"""
+
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = list(headers)
+
+class ClientDisconnected(Exception):
+    """The client went away before its response was ready"""
+
+# ----------------------------------------------------------------------
+# Work run on the inference pool (module-level so process pools can pickle it)
+# ----------------------------------------------------------------------
+
+def _load_model():
+    # Pool process initializer: loads the model and watches its files in this process
+    from model_registry import registry
+    from startup import DEFAULT_WARMUP_TEXTS
+    registry.current()
+    registry.watch(MODEL_WATCH_INTERVAL, warmup_fn=lambda model: _warm_model(model, DEFAULT_WARMUP_TEXTS))
+
+def _warm_model(model, texts):
+    from model_registry import registry
+    with registry.pinned(model):
+        for text in texts:
+            _analyze(text, 0, 0.5, 0.5)
+
+def _analyze(text, streak_days, community_mood, trading_activity, community_id=None, user_id=None):
+    """Returns (model version, flower parameters); records the community mood and streak like api_server"""
+    import flower_integration_bridge
+    from model_registry import registry
+    with registry.pinned() as model:
+        return model.version, flower_integration_bridge.get_flower_art_parameters(
+            text=text,
+            streak_days=streak_days,
+            community_mood=community_mood,
+            trading_activity=trading_activity,
+            community_id=community_id,
+            user_id=user_id
+        )
+
+def _analyze_batch(texts, streak_days, community_mood, trading_activity, community_ids, user_ids):
+    """Returns (model version, batch results)"""
+    import flower_integration_bridge
+    from model_registry import registry
+    with registry.pinned() as model:
+        return model.version, flower_integration_bridge.get_flower_art_parameters_batch(
+            texts=texts,
+            streak_days=streak_days,
+            community_mood=community_mood,
+            trading_activity=trading_activity,
+            community_ids=community_ids,
+            user_ids=user_ids
+        )
+
+class MoodASGIApp:
+    """
+    ASGI version of api_server.py with the same routes and JSON contract.
+
+    The event loop only parses and serializes. Inference runs on a bounded
+    thread or process pool, each request has a deadline, and a request whose
+    client disconnects is cancelled (if its job has not started yet, it
+    never runs).
+    """
+
+    def __init__(self):
+        self.startup = ModelStartup(warmup_fn=self._warmup)
+        self.executor = None
+        self.in_flight = 0
+        self.routes = {
+            ('POST', '/api/mood-analysis'): self.analyze_mood,
+            ('POST', '/api/mood-analysis/batch'): self.analyze_mood_batch,
+            ('GET', '/api/health'): self.health_check,
+            ('GET', '/api/ready'): self.readiness_check,
+            ('GET', '/api/example'): self.example_usage
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._handle(scope, receive, send)
+
+    # ------------------------------------------------------------------
+    # Routes
+    # ------------------------------------------------------------------
+
+    async def analyze_mood(self, body, receive):
+        data = _parse_json(body)
+
+        # Same checks and messages as api_server (flower_integration_bridge.submission_inputs)
+        try:
+            inputs = _submission_inputs(data)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        model_version, params = await self._offload(
+            receive, _analyze,
+            inputs['text'],
+            inputs['streak_days'],
+            inputs['community_mood'],
+            inputs['trading_activity'],
+            inputs['community_id'],
+            inputs['user_id']
+        )
+        return 200, {'success': True, 'modelVersion': model_version, 'data': params}
+
+    async def analyze_mood_batch(self, body, receive):
+        data = _parse_json(body)
+        items = data.get('items')
+
+        if not isinstance(items, list) or not items:
+            raise HTTPError(400, 'items must be a non-empty list')
+        if len(items) > BATCH_MAX_ITEMS:
+            raise HTTPError(413, f'Too many items (max {BATCH_MAX_ITEMS})')
+
+        items = [item if isinstance(item, dict) else {} for item in items]
+        model_version, results = await self._offload(
+            receive, _analyze_batch,
+            [item.get('text', '') for item in items],
+            [item.get('streakDays', 0) for item in items],
+            [item.get('communityMood', 0.5) for item in items],
+            [item.get('tradingActivity', 0.5) for item in items],
+            [item.get('communityId') for item in items],
+            [item.get('userId') for item in items]
+        )
+        return 200, {
+            'success': True,
+            'modelVersion': model_version,
+            'count': len(results),
+            'errors': sum(1 for result in results if not result['success']),
+            'results': results
+        }
+
+    async def health_check(self, body, receive):
+        return 200, {'status': 'healthy', 'service': 'mood-classifier-api'}
+
+    async def readiness_check(self, body, receive):
+        status = self.startup.status()
+        return (200 if status['ready'] else 503), status
+
+    async def example_usage(self, body, receive):
+        _, params = await self._offload(
+            receive, _analyze,
+            EXAMPLE_REQUEST['text'],
+            EXAMPLE_REQUEST['streakDays'],
+            EXAMPLE_REQUEST['communityMood'],
+            EXAMPLE_REQUEST['tradingActivity']
+        )
+        return 200, {'example_request': EXAMPLE_REQUEST, 'example_response': params}
+
+    # ------------------------------------------------------------------
+    # Inference offloading
+    # ------------------------------------------------------------------
+
+    async def _offload(self, receive, fn, *args):
+        """
+        Runs `fn(*args)` on the inference pool.
+
+        Raises:
+            HTTPError: 503 when the pool is full or the model is loading, 504 on timeout
+            ClientDisconnected: When the client disconnects first
+        """
+        loop = asyncio.get_running_loop()
+
+        if not self.startup.loaded:
+            try:
+                await loop.run_in_executor(None, self.startup.require, READY_TIMEOUT)
+            except StartupPending as e:
+                raise HTTPError(503, str(e), [(b'retry-after', b'1')])
+            except RuntimeError as e:
+                raise HTTPError(500, str(e))
+
+        if self.in_flight >= MAX_PENDING:
+            raise HTTPError(503, 'Server is overloaded', [(b'retry-after', b'1')])
+
+        self.in_flight += 1
+        job = self.executor.submit(fn, *args)
+        # The slot is freed when the job really ends (or is cancelled before starting)
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_slot))
+
+        result = asyncio.wrap_future(job)
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            done, _ = await asyncio.wait({result, disconnect}, timeout=REQUEST_TIMEOUT,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnect.cancel()
+
+        if result in done:
+            return result.result()
+
+        job.cancel()
+        if disconnect in done:
+            raise ClientDisconnected()
+        raise HTTPError(504, f'Request timed out after {REQUEST_TIMEOUT:g}s')
+
+    def _release_slot(self):
+        self.in_flight -= 1
+
+    def _warmup(self, texts):
+        # Runs on the startup thread: pushes the warmup set through the pool
+        list(self.executor.map(_analyze, texts, [0] * len(texts), [0.5] * len(texts), [0.5] * len(texts)))
+
+    # ------------------------------------------------------------------
+    # ASGI plumbing
+    # ------------------------------------------------------------------
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if EXECUTOR_KIND == 'process':
+                    self.executor = ProcessPoolExecutor(max_workers=EXECUTOR_WORKERS, initializer=_load_model)
+                else:
+                    self.executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='inference')
+                    # Pool threads share this process's model; pool processes watch their own (see _load_model)
+                    from model_registry import registry
+                    registry.watch(MODEL_WATCH_INTERVAL, warmup_fn=lambda model: _warm_model(model, self.startup.warmup_texts))
+
+                if LAZY_START:
+                    self.startup.start()
+                else:
+                    await asyncio.get_running_loop().run_in_executor(None, self.startup.run)
+                    if self.startup.error is not None:
+                        await send({'type': 'lifespan.startup.failed', 'message': self.startup.error})
+                        return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle(self, scope, receive, send):
+        method, path = scope['method'], scope['path']
+
+        if method == 'OPTIONS':
+            await _send_json(send, 200, {}, [
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'content-type')
+            ])
+            return
+
+        handler = self.routes.get((method, path))
+        try:
+            if handler is None:
+                allowed = any(route_path == path for _, route_path in self.routes)
+                raise HTTPError(405 if allowed else 404, 'Method not allowed' if allowed else 'Not found')
+
+            body = await _read_body(receive)
+            status, payload = await handler(body, receive)
+            await _send_json(send, status, payload)
+        except ClientDisconnected:
+            return
+        except HTTPError as e:
+            await _send_json(send, e.status, {'error': str(e)}, e.headers)
+        except Exception as e:
+            await _send_json(send, 500, {'error': str(e)})
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ClientDisconnected()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f'Request body too large (max {MAX_BODY_BYTES} bytes)')
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+def _submission_inputs(data):
+    # Imported on first use: the bridge loads numpy, which a lazy start keeps off the import path
+    from flower_integration_bridge import submission_inputs
+    return submission_inputs(data)
+
+def _parse_json(body):
+    try:
+        data = json.loads(body or b'null')
+    except ValueError:
+        raise HTTPError(400, 'Request body must be valid JSON')
+    if not isinstance(data, dict):
+        raise HTTPError(400, 'Request body must be a JSON object')
+    return data
+
+async def _send_json(send, status, payload, headers=()):
+    # Same compact, key-sorted encoding as Flask's jsonify
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+app = MoodASGIApp()
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("=" * 60)
+    print("MOOD CLASSIFIER ASGI SERVER")
+    print("=" * 60)
+    print(f"Inference pool: {EXECUTOR_WORKERS} {EXECUTOR_KIND}s, max {MAX_PENDING} pending jobs")
+    print(f"Request timeout: {REQUEST_TIMEOUT:g}s")
+    print("=" * 60)
+
+    uvicorn.run('asgi_app:app', host='0.0.0.0', port=int(os.environ.get('MOOD_ASGI_PORT', '5002')))
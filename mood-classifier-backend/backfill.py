@@ -0,0 +1,358 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Input column names (same field names as the API)
+DEFAULT_COLUMNS = {
+    "text": "text",
+    "streak_days": "streakDays",
+    "community_mood": "communityMood",
+    "trading_activity": "tradingActivity"
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# ----------------------------------------------------------------------
+# Input readers: each yields lists of row dicts, skipping the first `skip` rows
+# ----------------------------------------------------------------------
+
+def read_csv_chunks(path, chunk_size, skip=0):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from _chunked(csv.DictReader(f), chunk_size, skip)
+
+def read_jsonl_chunks(path, chunk_size, skip=0):
+    def rows():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                # Malformed lines still occupy a row, so output indices stay aligned with the input
+                yield row if isinstance(row, dict) else {}
+    yield from _chunked(rows(), chunk_size, skip)
+
+def read_parquet_chunks(path, chunk_size, skip=0):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet input needs pyarrow (pip install pyarrow)")
+
+    def rows():
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield from batch.to_pylist()
+    yield from _chunked(rows(), chunk_size, skip)
+
+READERS = {
+    "csv": read_csv_chunks,
+    "jsonl": read_jsonl_chunks,
+    "parquet": read_parquet_chunks
+}
+
+def _chunked(rows, chunk_size, skip):
+    chunk = []
+    for position, row in enumerate(rows):
+        if position < skip:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension in ("ndjson", "json"):
+        return "jsonl"
+    if extension in ("pq", "parq"):
+        return "parquet"
+    return extension
+
+# ----------------------------------------------------------------------
+# Worker side (module-level so the process pool can pickle it)
+# ----------------------------------------------------------------------
+
+def _init_worker():
+    # Loads (memory-maps) the model once per worker process
+    import flower_integration_bridge
+    # Every backfill text is new: caching would only cost memory
+    flower_integration_bridge.probability_cache.enabled = False
+
+def _number(value, kind, default):
+    if value is None or value == "":
+        return default
+    try:
+        return kind(float(value)) if kind is int else kind(value)
+    except (TypeError, ValueError):
+        # Left as-is: the bridge reports it as this row's error
+        return value
+
+def score_chunk(start, rows, columns, id_column, output_format):
+    """
+    Scores one chunk of input rows in a worker process.
+
+    Args:
+        start (int): Input row number of rows[0]
+        rows (list[dict]): Input rows
+        columns (dict): Input column names (see DEFAULT_COLUMNS)
+        id_column (str): Optional column copied to the output as "id"
+        output_format (str): "jsonl" or "parquet"
+
+    Returns:
+        tuple: (serialized JSONL lines or a dict of output columns, number of failed rows)
+    """
+    import flower_integration_bridge
+
+    results = flower_integration_bridge.get_flower_art_parameters_batch(
+        texts=[row.get(columns["text"]) for row in rows],
+        streak_days=[_number(row.get(columns["streak_days"]), int, 0) for row in rows],
+        community_mood=[_number(row.get(columns["community_mood"]), float, 0.5) for row in rows],
+        trading_activity=[_number(row.get(columns["trading_activity"]), float, 0.5) for row in rows]
+    )
+
+    for result, row in zip(results, rows):
+        result["index"] += start
+        if id_column:
+            result["id"] = row.get(id_column)
+
+    errors = sum(1 for result in results if not result["success"])
+
+    if output_format == "parquet":
+        return {
+            "index": [result["index"] for result in results],
+            "id": [None if result.get("id") is None else str(result["id"]) for result in results],
+            "success": [result["success"] for result in results],
+            "error": [result.get("error") for result in results],
+            "emotion": [result["data"]["currentEmotion"] if result["success"] else None for result in results],
+            "confidence": [result["data"]["confidence"] if result["success"] else None for result in results],
+            "params": [json.dumps(result["data"], sort_keys=True) if result["success"] else None for result in results]
+        }, errors
+
+    return "".join(json.dumps(result, sort_keys=True, separators=(",", ":")) + "\n" for result in results), errors
+
+# ----------------------------------------------------------------------
+# Output writers: both can reopen at a checkpoint
+# ----------------------------------------------------------------------
+
+class JSONLWriter:
+    """One result per line; resuming truncates anything written after the checkpoint"""
+
+    def __init__(self, path, resume_bytes=None):
+        if resume_bytes is None:
+            self.f = open(path, "wb")
+        else:
+            self.f = open(path, "r+b")
+            self.f.truncate(resume_bytes)
+            self.f.seek(resume_bytes)
+
+    def write(self, lines):
+        self.f.write(lines.encode("utf-8"))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def position(self):
+        return {"outputBytes": self.f.tell()}
+
+    def close(self):
+        self.f.close()
+
+class ParquetPartWriter:
+    """A directory of numbered Parquet files, one per chunk"""
+
+    def __init__(self, path, resume_part=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.path = path
+        self.part = resume_part or 0
+        os.makedirs(path, exist_ok=True)
+        if resume_part is None:
+            for name in os.listdir(path):
+                if name.startswith("part-") and name.endswith(".parquet"):
+                    os.remove(os.path.join(path, name))
+
+    def write(self, columns):
+        part_path = os.path.join(self.path, f"part-{self.part:06d}.parquet")
+        self.pq.write_table(self.pa.table(columns), part_path + ".tmp")
+        os.replace(part_path + ".tmp", part_path)
+        self.part += 1
+
+    def position(self):
+        return {"nextPart": self.part}
+
+    def close(self):
+        pass
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(path, state):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def backfill(input_path, output_path, input_format=None, output_format="jsonl", workers=None,
+             chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None, resume=False, columns=None, id_column=None,
+             log=print):
+    """
+    Scores every row of a CSV/JSONL/Parquet file with a process pool.
+
+    Chunks are scored in parallel but written strictly in input order. After
+    each written chunk a checkpoint records the rows done and the output
+    position, so an interrupted run continues where it stopped with resume=True.
+
+    Args:
+        input_path (str): Input file
+        output_path (str): JSONL file, or directory of Parquet parts
+        input_format (str): "csv", "jsonl" or "parquet" (default: from the extension)
+        output_format (str): "jsonl" or "parquet"
+        workers (int): Worker processes (default: all cores)
+        chunk_size (int): Rows per task
+        checkpoint_path (str): Checkpoint file (default: output_path + ".checkpoint.json")
+        resume (bool): Continue from the checkpoint instead of starting over
+        columns (dict): Input column names (see DEFAULT_COLUMNS)
+        id_column (str): Optional input column copied to the output as "id"
+
+    Returns:
+        dict: Rows scored in this run, total rows, errors and rows per second
+    """
+    input_format = input_format or detect_format(input_path)
+    if input_format not in READERS:
+        raise SystemExit(f"Unknown input format {input_format!r} (use --input-format)")
+    workers = workers or multiprocessing.cpu_count()
+    columns = dict(DEFAULT_COLUMNS, **(columns or {}))
+    checkpoint_path = checkpoint_path or output_path.rstrip("/") + ".checkpoint.json"
+
+    settings = {
+        "input": os.path.abspath(input_path),
+        "output": os.path.abspath(output_path),
+        "outputFormat": output_format,
+        "columns": columns,
+        "idColumn": id_column
+    }
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state is not None:
+        if state["settings"] != settings:
+            raise SystemExit(f"{checkpoint_path} was written for different settings: {state['settings']}")
+        if state.get("complete"):
+            log(f"Checkpoint says the backfill is already complete ({state['rowsDone']} rows)")
+            return {"rows": 0, "totalRows": state["rowsDone"], "errors": state["errors"],
+                    "seconds": 0.0, "rowsPerSecond": 0.0}
+        log(f"Resuming after {state['rowsDone']} rows")
+    else:
+        state = {"settings": settings, "rowsDone": 0, "errors": 0, "complete": False}
+
+    if output_format == "parquet":
+        writer = ParquetPartWriter(output_path, state.get("nextPart") if state["rowsDone"] else None)
+    else:
+        writer = JSONLWriter(output_path, state.get("outputBytes") if state["rowsDone"] else None)
+
+    skip = state["rowsDone"]
+    rows_this_run = 0
+    started = time.perf_counter()
+    last_report = started
+    pending = deque()
+
+    def write_next():
+        nonlocal rows_this_run, last_report
+        count, future = pending.popleft()
+        output, errors = future.result()
+        writer.write(output)
+
+        rows_this_run += count
+        state["errors"] += errors
+        state["rowsDone"] += count
+        state.update(writer.position())
+        save_checkpoint(checkpoint_path, state)
+
+        now = time.perf_counter()
+        if now - last_report >= 5:
+            log(f"{state['rowsDone']} rows ({rows_this_run / (now - started):.0f} rows/s)")
+            last_report = now
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            start = skip
+            for rows in READERS[input_format](input_path, chunk_size, skip):
+                # Bounded look-ahead: at most two chunks per worker are read but not yet written
+                if len(pending) >= workers * 2:
+                    write_next()
+                pending.append((len(rows), pool.submit(score_chunk, start, rows, columns, id_column, output_format)))
+                start += len(rows)
+            while pending:
+                write_next()
+    finally:
+        writer.close()
+
+    state["complete"] = True
+    save_checkpoint(checkpoint_path, state)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows_this_run,
+        "totalRows": state["rowsDone"],
+        "errors": state["errors"],
+        "seconds": elapsed,
+        "rowsPerSecond": rows_this_run / elapsed if elapsed > 0 else 0.0
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate flower parameters for a whole corpus offline")
+    parser.add_argument("input", help="CSV, JSONL or Parquet file")
+    parser.add_argument("--out", required=True, help="Output JSONL file (or directory, with --output-format parquet)")
+    parser.add_argument("--input-format", choices=sorted(READERS), help="Default: from the file extension")
+    parser.add_argument("--output-format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per task")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <out>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its checkpoint")
+    parser.add_argument("--text-column", default=DEFAULT_COLUMNS["text"])
+    parser.add_argument("--streak-column", default=DEFAULT_COLUMNS["streak_days"])
+    parser.add_argument("--community-column", default=DEFAULT_COLUMNS["community_mood"])
+    parser.add_argument("--trading-column", default=DEFAULT_COLUMNS["trading_activity"])
+    parser.add_argument("--id-column", help="Input column copied to each result as \"id\"")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"BACKFILL {args.input} -> {args.out} ({args.workers} workers)")
+    print("=" * 60)
+
+    summary = backfill(
+        args.input, args.out,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint,
+        resume=args.resume,
+        columns={
+            "text": args.text_column,
+            "streak_days": args.streak_column,
+            "community_mood": args.community_column,
+            "trading_activity": args.trading_column
+        },
+        id_column=args.id_column
+    )
+
+    print("=" * 60)
+    print(f"Scored {summary['rows']} rows ({summary['totalRows']} total, {summary['errors']} errors) "
+          f"at {summary['rowsPerSecond']:.0f} rows/s")
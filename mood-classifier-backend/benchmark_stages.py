@@ -0,0 +1,222 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import flower_integration_bridge as bridge
+from model_artifact import MODEL_PATH, load_default_engine
+
+# Text lengths (words) and batch sizes every stage is measured at
+TEXT_LENGTHS = (5, 20, 100, 500)
+BATCH_SIZES = (1, 8, 64, 512)
+
+# A stage counts as regressed when it is this much slower than the baseline
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+
+def make_texts(engine, words, count, seed=0):
+    """Deterministic texts of `words` words drawn from the model vocabulary plus unknown words"""
+    rng = random.Random(seed)
+    vocabulary = [term.decode("utf-8") for term in engine.terms[::7].tolist()]
+    filler = ["xqzv", "lorem", "ipsum", "!!", ":)"]
+    return [
+        " ".join(rng.choice(vocabulary) if rng.random() < 0.8 else rng.choice(filler) for _ in range(words))
+        for _ in range(count)
+    ]
+
+def measure(fn, min_time=0.2, repeats=5):
+    """
+    Times `fn()` and returns per-call statistics in microseconds.
+
+    The loop count is calibrated so each repeat runs for about
+    min_time / repeats seconds; the median repeat is reported.
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeats or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int((min_time / repeats) / elapsed) + 1)
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - started) / loops * 1e6)
+    samples.sort()
+    return {"medianUs": samples[len(samples) // 2], "minUs": samples[0], "loops": loops}
+
+def load_pipeline():
+    """The original sklearn pipeline, or None when it cannot be unpickled here"""
+    try:
+        import joblib
+        return joblib.load(open(MODEL_PATH, 'rb'))
+    except Exception as e:
+        print(f"Skipping sklearn pipeline stages: {e}")
+        return None
+
+def stage_functions(engine, pipeline, texts):
+    """Returns {stage name: zero-argument callable} for one batch of texts"""
+    probabilities = engine.predict_proba(texts)
+    scores = engine.describe(probabilities)
+    params = [bridge.flower_params_from_score(score, 5, 0.8, 0.7) for score in scores]
+    # The mapper helpers take the flower art emotion names
+    labels = ["sad" if score.label == "sadness" else score.label for score in scores]
+    confidences = [score.confidence for score in scores]
+    streak = [5] * len(texts)
+    community = [0.8] * len(texts)
+    trading = [0.7] * len(texts)
+
+    stages = {
+        "engine.transform": lambda: engine.transform(texts),
+        "engine.predict_proba": lambda: engine.predict_proba(texts),
+        "engine.describe": lambda: engine.describe(probabilities),
+        "bridge.flower_params_from_score": lambda: [
+            bridge.flower_params_from_score(score, 5, 0.8, 0.7) for score in scores
+        ],
+        "bridge.flower_params_batch": lambda: bridge.flower_params_batch(probabilities, streak, community, trading),
+        "param_mapper.derive": lambda: bridge.mapper.derive(probabilities, streak, community, trading),
+        "bridge.get_flower_art_parameters_batch": lambda: _uncached(bridge.get_flower_art_parameters_batch, texts),
+        "json.dumps(flower_params)": lambda: [json.dumps(p) for p in params],
+        "mapper.get_heartbeat_bpm": lambda: [bridge.get_heartbeat_bpm(l, c) for l, c in zip(labels, confidences)],
+        "mapper.get_heartbeat_intensity": lambda: [bridge.get_heartbeat_intensity(l, c) for l, c in zip(labels, confidences)],
+        "mapper.get_rotation_intensity": lambda: [bridge.get_rotation_intensity(l, c) for l, c in zip(labels, confidences)],
+        "mapper.get_rotation_direction": lambda: [bridge.get_rotation_direction(l) for l in labels],
+        "mapper.get_bee_wing_speed": lambda: [bridge.get_bee_wing_speed(l, c) for l, c in zip(labels, confidences)],
+        "mapper.calculate_stalk_length": lambda: [bridge.calculate_stalk_length(c, 0.8, 5) for c in confidences],
+        "mapper.get_trading_color": lambda: [bridge.get_trading_color(c) for c in confidences],
+        "mapper.get_bee_range": lambda: [bridge.get_bee_range(int(c * 30)) for c in confidences]
+    }
+
+    if pipeline is not None:
+        vectorizer = pipeline.steps[0][1]
+        stages.update({
+            "sklearn.vectorize": lambda: vectorizer.transform(texts),
+            "sklearn.predict": lambda: pipeline.predict(texts),
+            "sklearn.predict_proba": lambda: pipeline.predict_proba(texts)
+        })
+        try:
+            import pandas as pd
+            stages["pandas.proba_dict"] = lambda: [
+                pd.DataFrame(probabilities[i:i + 1], columns=engine.class_list).iloc[0].to_dict()
+                for i in range(len(texts))
+            ]
+        except ImportError:
+            pass
+
+    return stages
+
+def _uncached(fn, texts):
+    # Measure the model path, not the probability cache
+    cache = bridge.probability_cache
+    enabled, cache.enabled = cache.enabled, False
+    try:
+        return fn(texts)
+    finally:
+        cache.enabled = enabled
+
+def run_benchmarks(text_lengths=TEXT_LENGTHS, batch_sizes=BATCH_SIZES, min_time=0.2, stage_filter=None):
+    """
+    Measures every stage at every (text length, batch size) combination.
+
+    Returns:
+        dict: {"meta": {...}, "results": {"stage|words=W|batch=B": stats}}
+    """
+    engine = load_default_engine()
+    pipeline = load_pipeline()
+    results = {}
+
+    for words in text_lengths:
+        for batch in batch_sizes:
+            texts = make_texts(engine, words, batch)
+            for stage, fn in stage_functions(engine, pipeline, texts).items():
+                if stage_filter and stage_filter not in stage:
+                    continue
+                stats = measure(fn, min_time=min_time)
+                stats["perItemUs"] = stats["medianUs"] / batch
+                results[f"{stage}|words={words}|batch={batch}"] = stats
+                print(f"{stage:<42} {words:>5} {batch:>6} {stats['medianUs']:>12.1f} {stats['perItemUs']:>10.2f}")
+
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "modelVersion": engine.version
+    }
+    return {"meta": meta, "results": results}
+
+def compare(current, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Compares two benchmark runs stage by stage.
+
+    Returns:
+        list[dict]: Per-stage ratio (current / baseline median), regressions flagged
+    """
+    rows = []
+    for key, stats in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None or reference["medianUs"] <= 0:
+            continue
+        ratio = stats["medianUs"] / reference["medianUs"]
+        rows.append({"key": key, "baselineUs": reference["medianUs"], "currentUs": stats["medianUs"],
+                     "ratio": ratio, "regressed": ratio > threshold})
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage-level benchmarks of the classification and parameter pipeline")
+    parser.add_argument("--lengths", default=",".join(map(str, TEXT_LENGTHS)), help="Text lengths in words")
+    parser.add_argument("--batches", default=",".join(map(str, BATCH_SIZES)), help="Batch sizes")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each measurement")
+    parser.add_argument("--stage", help="Only run stages whose name contains this string")
+    parser.add_argument("--out", default="benchmark_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", help="Also write this run as a baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("STAGE BENCHMARKS")
+    print("=" * 80)
+    print(f"{'stage':<42} {'words':>5} {'batch':>6} {'median us':>12} {'us/item':>10}")
+
+    run = run_benchmarks(
+        text_lengths=[int(v) for v in args.lengths.split(",")],
+        batch_sizes=[int(v) for v in args.batches.split(",")],
+        min_time=args.min_time,
+        stage_filter=args.stage
+    )
+
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        rows = compare(run, baseline, args.threshold)
+        regressions = [row for row in rows if row["regressed"]]
+
+        print("=" * 80)
+        print(f"COMPARISON WITH {args.baseline} ({len(rows)} stages, threshold {args.threshold:.2f}x)")
+        print("=" * 80)
+        for row in sorted(rows, key=lambda r: r["ratio"], reverse=True)[:20]:
+            flag = "REGRESSED" if row["regressed"] else ""
+            print(f"{row['key']:<60} {row['baselineUs']:>10.1f} -> {row['currentUs']:>10.1f}  {row['ratio']:>5.2f}x {flag}")
+
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed")
+            sys.exit(1)
+        print("No regressions")
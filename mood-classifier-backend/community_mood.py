@@ -0,0 +1,638 @@
+import atexit
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+# How positive each model class is (0 = worst mood, 1 = best). A submission's
+# mood is its probability-weighted valence, so it is always in 0-1 like the
+# communityMood the clients used to send.
+MOOD_VALENCE = {
+    "joy": 1.0,
+    "surprise": 0.7,
+    "neutral": 0.5,
+    "shame": 0.25,
+    "disgust": 0.2,
+    "fear": 0.15,
+    "anger": 0.15,
+    "sadness": 0.1
+}
+
+# Community mood before any submission has been recorded
+DEFAULT_COMMUNITY_MOOD = 0.5
+
+# Longest accepted community id
+MAX_COMMUNITY_ID_LENGTH = 128
+
+# Ids per SELECT ... IN (...) (below SQLite's default bound parameter limit)
+_MAX_QUERY_IDS = 500
+
+# One row per community: the ring slots are packed float64 sums and int64 counts
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS communities (
+        community_id TEXT PRIMARY KEY,
+        sums BLOB NOT NULL,
+        counts BLOB NOT NULL,
+        bucket INTEGER,
+        window_sum REAL NOT NULL,
+        window_count INTEGER NOT NULL,
+        decayed_sum REAL NOT NULL,
+        decayed_weight REAL NOT NULL,
+        updated REAL,
+        total INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS communities_updated ON communities (updated)",
+    # Number of community rows, kept up to date by the flushes (so eviction needs no COUNT)
+    "CREATE TABLE IF NOT EXISTS community_count (id INTEGER PRIMARY KEY CHECK (id = 0), communities INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO community_count (id, communities) VALUES (0, (SELECT COUNT(*) FROM communities))"
+)
+
+_COLUMNS = "community_id, sums, counts, bucket, window_sum, window_count, decayed_sum, decayed_weight, updated, total"
+
+def valence_vector(classes):
+    """
+    Per-class valence, ordered like the model's probability columns.
+
+    Args:
+        classes (list[str]): Model classes (engine.class_list)
+
+    Returns:
+        numpy.ndarray: One valence per class (unknown classes count as neutral)
+    """
+    # Only needed once a model is loaded; a lazy start keeps numpy off the import path
+    import numpy as np
+
+    return np.array([MOOD_VALENCE.get(label, 0.5) for label in classes])
+
+class CommunityMood:
+    """
+    Running mood of one community.
+
+    The sliding window is a ring of fixed-width time buckets holding a sum
+    and a count each, plus running totals over the whole ring. Buckets that
+    fall out of the window are subtracted from the totals as time moves on,
+    so recording and reading never touch more than `buckets` slots.
+
+    The moving average decays with elapsed time (not with the number of
+    submissions), so a burst of submissions does not wash out the history
+    faster than a quiet period would.
+    """
+    __slots__ = ("sums", "counts", "bucket", "window_sum", "window_count",
+                 "decayed_sum", "decayed_weight", "updated", "total")
+
+    def __init__(self, buckets):
+        self.sums = array("d", bytes(8 * buckets))
+        self.counts = array("q", bytes(8 * buckets))
+        self.bucket = None
+        self.window_sum = 0.0
+        self.window_count = 0
+        self.decayed_sum = 0.0
+        self.decayed_weight = 0.0
+        self.updated = None
+        self.total = 0
+
+    @classmethod
+    def from_row(cls, row, buckets):
+        """Rebuilds a community from its stored row (as selected by _COLUMNS, without the id)"""
+        sums, counts, *scalars = row
+        community = cls(buckets)
+        (community.bucket, community.window_sum, community.window_count, community.decayed_sum,
+         community.decayed_weight, community.updated, community.total) = scalars
+        if len(sums) == 8 * buckets:
+            community.sums = array("d", sums)
+            community.counts = array("q", counts)
+        else:
+            # Stored with another MOOD_COMMUNITY_BUCKETS: the window starts over
+            community.window_sum = 0.0
+            community.window_count = 0
+        return community
+
+    def copy(self):
+        community = CommunityMood.__new__(CommunityMood)
+        for name in self.__slots__:
+            setattr(community, name, getattr(self, name))
+        community.sums = array("d", self.sums)
+        community.counts = array("q", self.counts)
+        return community
+
+    def to_row(self, community_id):
+        return (community_id, self.sums.tobytes(), self.counts.tobytes(), self.bucket, self.window_sum,
+                self.window_count, self.decayed_sum, self.decayed_weight, self.updated, self.total)
+
+    def advance(self, bucket):
+        """Moves the ring forward to time bucket `bucket`, dropping expired buckets"""
+        if self.bucket is None:
+            self.bucket = bucket
+            return
+
+        size = len(self.sums)
+        for step in range(self.bucket + 1, min(bucket, self.bucket + size) + 1):
+            slot = step % size
+            self.window_sum -= self.sums[slot]
+            self.window_count -= self.counts[slot]
+            self.sums[slot] = 0.0
+            self.counts[slot] = 0
+        if bucket > self.bucket:
+            self.bucket = bucket
+        if self.window_count == 0:
+            # Drop the floating point residue of the subtractions
+            self.window_sum = 0.0
+
+    def add(self, mood, now, bucket, decay_rate):
+        self.advance(bucket)
+        slot = self.bucket % len(self.sums)
+        self.sums[slot] += mood
+        self.counts[slot] += 1
+        self.window_sum += mood
+        self.window_count += 1
+
+        if self.updated is not None and now > self.updated:
+            decay = math.exp(-decay_rate * (now - self.updated))
+            self.decayed_sum *= decay
+            self.decayed_weight *= decay
+        self.decayed_sum += mood
+        self.decayed_weight += 1.0
+        self.updated = now if self.updated is None else max(self.updated, now)
+        self.total += 1
+
+    def value(self):
+        """Exponentially weighted mood, or DEFAULT_COMMUNITY_MOOD before the first submission"""
+        if self.decayed_weight <= 0.0:
+            return DEFAULT_COMMUNITY_MOOD
+        return min(1.0, max(0.0, self.decayed_sum / self.decayed_weight))
+
+class CommunityMoodAggregator:
+    """
+    Per-community mood aggregates, updated incrementally with each scored submission.
+
+    Each community keeps a sliding-window mean (window_seconds wide, kept in
+    `buckets` ring slots) and an exponentially time-decayed mean with the
+    given half-life. The decayed mean is the community mood fed into the
+    flower parameters. The least recently updated communities are dropped
+    beyond max_communities.
+
+    The aggregates are rows of an SQLite database in WAL mode, shared by
+    every server worker process. Submissions are not written one by one:
+    each worker queues them in memory, and a background thread folds them
+    into the stored rows in one IMMEDIATE transaction every flush_interval
+    seconds (or sooner once flush_rows are queued). Reads replay the
+    worker's queued submissions on top of the stored rows, so a submission
+    sees its own effect straight away and other workers' within a flush
+    interval. The clock is wall time, because aggregates outlive the process.
+    """
+
+    def __init__(self, path, window_seconds=3600, buckets=60, half_life=900, max_communities=10000,
+                 flush_interval=0.2, flush_rows=500, clock=time.time):
+        """
+        Args:
+            path (str): SQLite database file (created if missing)
+            window_seconds (float): Width of the sliding window
+            buckets (int): Ring slots the window is split into (its time resolution)
+            half_life (float): Seconds after which a submission counts half in the moving average
+            max_communities (int): Communities kept before the least recently updated are dropped
+            flush_interval (float): Longest a queued submission waits before it is written
+            flush_rows (int): Queued submissions that trigger an early flush
+            clock (callable): Time source in seconds since the epoch (shared by all processes)
+        """
+        if window_seconds <= 0 or buckets <= 0 or half_life <= 0:
+            raise ValueError("window_seconds, buckets and half_life must be positive")
+        self.path = path
+        self.window_seconds = float(window_seconds)
+        self.buckets = int(buckets)
+        self.bucket_seconds = self.window_seconds / self.buckets
+        self.half_life = float(half_life)
+        self.decay_rate = math.log(2) / self.half_life
+        self.max_communities = max_communities
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.clock = clock
+        self._open_lock = threading.Lock()
+        self._pid = None
+        self._reset()
+        self.communities = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_seconds = 0.0
+
+    def _reset(self):
+        # Per-process state: a forked worker starts over with its own (see _check_fork)
+        self._pending = {}
+        self._flushing = {}
+        self._queued = 0
+        self._sequence = 0
+        # Communities with queued submissions, as stored plus those submissions, so
+        # recording does not replay the queue; dropped by every flush (see _replay)
+        self._tips = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = None
+        self._reader = None
+        self._flusher = None
+        self._wake = threading.Event()
+        self._closed = False
+        self._pid = os.getpid()
+
+    @classmethod
+    def from_env(cls):
+        """Builds an aggregator configured by MOOD_COMMUNITY_DB and the other MOOD_COMMUNITY_* environment variables"""
+        return cls(
+            path=os.environ.get('MOOD_COMMUNITY_DB', 'data/communities.sqlite3'),
+            window_seconds=float(os.environ.get('MOOD_COMMUNITY_WINDOW', '3600')),
+            buckets=int(os.environ.get('MOOD_COMMUNITY_BUCKETS', '60')),
+            half_life=float(os.environ.get('MOOD_COMMUNITY_HALF_LIFE', '900')),
+            max_communities=int(os.environ.get('MOOD_COMMUNITY_MAX', '10000')),
+            flush_interval=float(os.environ.get('MOOD_COMMUNITY_FLUSH_MS', '200')) / 1000.0,
+            flush_rows=int(os.environ.get('MOOD_COMMUNITY_FLUSH_ROWS', '500'))
+        )
+
+    def record(self, community_id, mood):
+        """
+        Folds one submission's mood into its community.
+
+        Returns:
+            float: The community mood after this submission
+        """
+        return self.record_many([community_id], [mood])[0]
+
+    def record_many(self, community_ids, moods):
+        """
+        Folds a batch of submissions into their communities, in order.
+
+        Args:
+            community_ids (list[str]): Community of each submission
+            moods (list[float]): Mood of each submission (0-1)
+
+        Returns:
+            list[float]: Each submission's community mood right after it was recorded
+        """
+        self._check_fork()
+        now = self.clock()
+        _, values = self._replay(set(community_ids), list(zip(community_ids, moods)), now)
+        self._start_flusher()
+        if self._queued >= self.flush_rows:
+            self._wake.set()
+        return values
+
+    def current(self, community_id, default=DEFAULT_COMMUNITY_MOOD):
+        """Current community mood, or `default` for a community with no submissions"""
+        community = self._replay({community_id})[0].get(community_id)
+        return default if community is None else community.value()
+
+    def get(self, community_id):
+        """
+        Snapshot of one community's aggregates.
+
+        Returns:
+            dict | None: None when the community has no recorded submissions
+        """
+        community = self._replay({community_id})[0].get(community_id)
+        if community is None:
+            return None
+        now = self.clock()
+        # Expires old buckets in this copy only; the next flush does it in the database
+        community.advance(int(now // self.bucket_seconds))
+        decay = math.exp(-self.decay_rate * max(0.0, now - community.updated))
+        return {
+            "communityId": community_id,
+            "averageMood": community.value(),
+            "windowMean": community.window_sum / community.window_count if community.window_count else None,
+            "windowCount": community.window_count,
+            "effectiveSamples": community.decayed_weight * decay,
+            "totalSubmissions": community.total,
+            "secondsSinceUpdate": max(0.0, now - community.updated),
+            "windowSeconds": self.window_seconds,
+            "halfLifeSeconds": self.half_life
+        }
+
+    def flush(self):
+        """Folds every queued submission into the stored rows in one transaction"""
+        self._check_fork()
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                self._queued = 0
+                batch = self._flushing
+
+            started = time.perf_counter()
+            connection = self._writer_connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                communities = self._load(connection, list(batch))
+                created = 0
+                for community_id, entries in batch.items():
+                    community = communities.get(community_id)
+                    if community is None:
+                        community = communities[community_id] = CommunityMood(self.buckets)
+                        created += 1
+                    for _, mood, at in entries:
+                        community.add(mood, at, int(at // self.bucket_seconds), self.decay_rate)
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO communities ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [community.to_row(community_id) for community_id, community in communities.items()]
+                )
+                count = connection.execute("SELECT communities FROM community_count").fetchone()[0] + created
+                evicted = max(0, count - self.max_communities)
+                if evicted:
+                    connection.execute(
+                        "DELETE FROM communities WHERE community_id IN "
+                        "(SELECT community_id FROM communities ORDER BY updated LIMIT ?)", (evicted,)
+                    )
+                connection.execute("UPDATE community_count SET communities = ?", (count - evicted,))
+                # Commit and forget the batch in one step for readers (see _replay)
+                with self._lock:
+                    connection.execute("COMMIT")
+                    self._flushing = {}
+                    self._tips = {}
+                    self._generation += 1
+                    self.communities = count - evicted
+                    self.evictions += evicted
+                    self.flushes += 1
+                    self.rows_written += len(communities)
+                    self.last_flush_seconds = time.perf_counter() - started
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            return len(communities)
+
+    def close(self):
+        """Flushes queued submissions and stops the background writer"""
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def stats(self):
+        """Configuration and counters; the community count is the one this worker last wrote (no database access)"""
+        with self._lock:
+            return {
+                "path": self.path,
+                "communities": self.communities,
+                "maxCommunities": self.max_communities,
+                "evictions": self.evictions,
+                "pendingSubmissions": self._queued,
+                "flushes": self.flushes,
+                "rowsWritten": self.rows_written,
+                "lastFlushMs": self.last_flush_seconds * 1000,
+                "windowSeconds": self.window_seconds,
+                "buckets": self.buckets,
+                "halfLifeSeconds": self.half_life
+            }
+
+    def _replay(self, community_ids, submissions=(), now=None):
+        """
+        Stored aggregates of `community_ids` with this worker's queued submissions applied on top.
+
+        Args:
+            community_ids (set[str]): Communities to read
+            submissions (list[tuple[str, float]]): (community_id, mood) pairs to queue first, at time `now`
+
+        Returns:
+            tuple: ({community_id: CommunityMood}, [community mood right after each of `submissions`])
+        """
+        with self._lock:
+            if all(community_id in self._tips for community_id in community_ids):
+                communities, values, _ = self._queue(community_ids, submissions, now)
+                return communities, list(values.values())
+
+        with self._read_lock:
+            connection = self._reader_connection()
+            connection.execute("BEGIN")
+            try:
+                with self._lock:
+                    communities, values, sequences = self._queue(community_ids, submissions, now)
+                    # Flushes commit while holding self._lock, so the snapshot this read
+                    # pins holds exactly the submissions that are no longer queued
+                    connection.execute("SELECT communities FROM community_count").fetchone()
+                    generation = self._generation
+                    queued = {
+                        community_id: (*self._flushing.get(community_id, ()), *self._pending.get(community_id, ()))
+                        for community_id in community_ids if community_id not in self._tips
+                    }
+                communities.update(self._load(connection, queued))
+            finally:
+                connection.execute("COMMIT")
+
+        for community_id, entries in queued.items():
+            community = communities.get(community_id)
+            for sequence, mood, at in entries:
+                if community is None:
+                    community = communities[community_id] = CommunityMood(self.buckets)
+                community.add(mood, at, int(at // self.bucket_seconds), self.decay_rate)
+                if sequence in sequences:
+                    values[sequence] = community.value()
+
+        with self._lock:
+            for community_id, entries in queued.items():
+                # Only while no flush or newer submission has moved the community on
+                if entries and generation == self._generation and community_id not in self._tips \
+                        and self._pending.get(community_id, self._flushing.get(community_id))[-1] is entries[-1]:
+                    self._tips[community_id] = communities[community_id].copy()
+        return communities, [values[sequence] for sequence in sorted(values)]
+
+    def _queue(self, community_ids, submissions, now):
+        # Caller holds self._lock; applies the submissions to the communities that have a
+        # tip, and copies those tips for a read (recording needs only the values)
+        sequences = set()
+        values = {}
+        for community_id, mood in submissions:
+            self._sequence += 1
+            sequences.add(self._sequence)
+            self._pending.setdefault(community_id, []).append((self._sequence, float(mood), now))
+            tip = self._tips.get(community_id)
+            if tip is not None:
+                tip.add(float(mood), now, int(now // self.bucket_seconds), self.decay_rate)
+                values[self._sequence] = tip.value()
+        self._queued += len(sequences)
+        communities = {} if submissions else {
+            community_id: self._tips[community_id].copy() for community_id in community_ids if community_id in self._tips
+        }
+        return communities, values, sequences
+
+    def _load(self, connection, community_ids):
+        """{community_id: CommunityMood} for the ids that have a stored row"""
+        community_ids = list(dict.fromkeys(community_ids))
+        communities = {}
+        for start in range(0, len(community_ids), _MAX_QUERY_IDS):
+            chunk = community_ids[start:start + _MAX_QUERY_IDS]
+            rows = connection.execute(
+                f"SELECT {_COLUMNS} FROM communities WHERE community_id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            communities.update((row[0], CommunityMood.from_row(row[1:], self.buckets)) for row in rows)
+        return communities
+
+    def _reader_connection(self):
+        # Caller holds self._read_lock; the writer creates the schema first
+        if self._reader is None:
+            self._writer_connection()
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA query_only=ON")
+            self._reader = connection
+        return self._reader
+
+    def _writer_connection(self):
+        # Opened once per process, and creates the schema; autocommit mode, as
+        # flush() manages its own IMMEDIATE transaction
+        if self._writer is None:
+            with self._open_lock:
+                if self._writer is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("PRAGMA synchronous=NORMAL")
+                    for statement in _SCHEMA:
+                        connection.execute(statement)
+                    self.communities = connection.execute("SELECT communities FROM community_count").fetchone()[0]
+                    self._writer = connection
+        return self._writer
+
+    def _check_fork(self):
+        # A worker forked after the aggregator was used (gunicorn preload_app) opens
+        # its own connections and flusher; the parent flushes what it had queued
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._open_lock:
+            if self._pid != pid:
+                self._reset()
+
+    def _start_flusher(self):
+        if self._flusher is not None or self._closed:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="community-flusher", daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+
+    def _run_flusher(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # Keep the queued submissions, ahead of newer ones, for the next flush
+                print(f"Community mood flush failed: {e}")
+                with self._lock:
+                    for community_id, entries in self._flushing.items():
+                        self._pending[community_id] = entries + self._pending.get(community_id, [])
+                        self._queued += len(entries)
+                    self._flushing = {}
+
+# Shared by every module in the process; the database is opened on first use
+community_moods = CommunityMoodAggregator.from_env()
+
+def _record_in_worker(path, community_ids, moods):
+    # Runs in a separate process of the __main__ check below
+    aggregator = CommunityMoodAggregator(path)
+    for community_id, mood in zip(community_ids, moods):
+        aggregator.record(community_id, mood)
+    # multiprocessing children skip atexit
+    aggregator.close()
+
+if __name__ == "__main__":
+    import multiprocessing
+    import random
+    import tempfile
+    import timeit
+
+    print("=" * 60)
+    print("COMMUNITY MOOD AGGREGATOR")
+    print("=" * 60)
+
+    class FakeClock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    directory = tempfile.TemporaryDirectory()
+    clock = FakeClock()
+    aggregator = CommunityMoodAggregator(os.path.join(directory.name, "check.sqlite3"), window_seconds=600,
+                                         buckets=10, half_life=300, clock=clock)
+    rng = random.Random(0)
+
+    # Compare against a brute-force recomputation over the full history
+    history = []
+    failures = 0
+    for step in range(5000):
+        clock.now += rng.expovariate(1 / 5.0)
+        community_id = f"c{rng.randrange(5)}"
+        mood = rng.random()
+        history.append((clock.now, community_id, mood))
+        value = aggregator.record(community_id, mood)
+        if step % 7 == 0:
+            # Half the checks read stored rows, the other half queued submissions on top
+            aggregator.flush()
+
+        own = [(t, m) for t, c, m in history if c == community_id]
+        weights = [math.exp(-aggregator.decay_rate * (clock.now - t)) for t, _ in own]
+        expected = sum(w * m for w, (_, m) in zip(weights, own)) / sum(weights)
+        bucket = int(clock.now // aggregator.bucket_seconds)
+        in_window = [m for t, m in own if int(t // aggregator.bucket_seconds) > bucket - aggregator.buckets]
+        snapshot = aggregator.get(community_id)
+        if abs(value - expected) > 1e-9 or snapshot["windowCount"] != len(in_window) \
+                or abs(snapshot["windowMean"] - sum(in_window) / len(in_window)) > 1e-9:
+            failures += 1
+
+    print(f"Checked 5000 submissions against a full recomputation: {failures} mismatch(es)")
+
+    clock.now += 10 * aggregator.window_seconds
+    print(f"After a quiet period: {aggregator.get('c0')}")
+
+    # Worker processes sharing the file see and extend the same aggregates
+    shared = os.path.join(directory.name, "shared.sqlite3")
+    workers = [multiprocessing.Process(target=_record_in_worker, args=(shared, ["garden"] * 200, [0.25 * w] * 200))
+               for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    reader = CommunityMoodAggregator(shared)
+    snapshot = reader.get("garden")
+    if snapshot["totalSubmissions"] != 800 or abs(snapshot["windowMean"] - 0.375) > 1e-9:
+        failures += 1
+    print(f"4 processes x 200 submissions: {snapshot['totalSubmissions']} recorded, window mean {snapshot['windowMean']:.3f} (expected 0.375)")
+
+    # Eviction keeps the most recently updated communities, tracked without a COUNT
+    capped = CommunityMoodAggregator(os.path.join(directory.name, "capped.sqlite3"), max_communities=50, clock=clock)
+    for i in range(120):
+        clock.now += 1
+        capped.record(f"c{i}", 0.5)
+        if i % 25 == 0:
+            capped.flush()
+    capped.flush()
+    kept = [capped.get(f"c{i}") is not None for i in range(120)]
+    if capped.stats()["communities"] != 50 or kept != [False] * 70 + [True] * 50:
+        failures += 1
+    print(f"120 communities capped at 50: {capped.stats()['communities']} kept, {capped.evictions} evicted, newest kept: {all(kept[70:])}")
+
+    for communities in (10, 10000):
+        aggregator = CommunityMoodAggregator(os.path.join(directory.name, f"bench-{communities}.sqlite3"),
+                                             max_communities=communities)
+        ids = [f"c{i % communities}" for i in range(1000)]
+        moods = [rng.random() for _ in ids]
+        per_call = timeit.timeit(lambda: aggregator.record_many(ids, moods), number=20) / 20 / len(ids) * 1e6
+        single = timeit.timeit(lambda: aggregator.record(ids[0], moods[0]), number=500) / 500 * 1e6
+        aggregator.close()
+        print(f"{communities:>6} communities: {per_call:.2f} us per submission in batches of 1000, {single:.1f} us for one "
+              f"({aggregator.flushes} flushes)")
+    directory.cleanup()
+
+    print("=" * 60)
+    if failures:
+        raise SystemExit("Aggregates diverged from the full recomputation")
+    print("Incremental aggregates match the full recomputation")
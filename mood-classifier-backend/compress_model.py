@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import zlib
+
+import numpy as np
+
+from model_artifact import ARTIFACT_PATH, export_engine, load_artifact, load_pickled_engine
+from sparse_engine import SparseEmotionEngine
+
+WEIGHT_DTYPES = ("float64", "float32", "float16")
+
+# Sentences scored by the latency measurement when no held-out file is given
+LATENCY_TEXTS = [
+    "I'm feeling really happy today!",
+    "This makes me so angry and frustrated",
+    "I'm scared and worried about the future",
+    "I feel sad and lonely"
+]
+
+def compress_engine(engine, dtype="float32", prune_threshold=0.0, hash_vocabulary=False):
+    """
+    Builds a smaller engine from a full one.
+
+    Pruning drops terms whose weights barely differ between classes: a term
+    adds its weight row to the logits, and softmax ignores anything added to
+    every class alike, so only the spread (max - min over classes) matters.
+
+    Args:
+        engine (SparseEmotionEngine): Full engine (term vocabulary)
+        dtype (str): Weight storage type ("float64", "float32" or "float16")
+        prune_threshold (float): Terms with a weight spread at or below this are dropped
+        hash_vocabulary (bool): Store CRC-32 hashes of the terms instead of the terms.
+            When two kept terms share a hash, the one with the larger spread is kept.
+
+    Returns:
+        tuple: (SparseEmotionEngine, dict of what was kept and dropped)
+    """
+    if engine.vocabulary != "terms":
+        raise ValueError("Compress a model with a term vocabulary")
+    if dtype not in WEIGHT_DTYPES:
+        raise ValueError(f"dtype must be one of {WEIGHT_DTYPES}")
+
+    weights = np.asarray(engine.weights)
+    spread = weights.max(axis=1) - weights.min(axis=1)
+    keep = spread > prune_threshold
+    terms = np.asarray(engine.terms)[keep]
+    weights = weights[keep]
+    spread = spread[keep]
+
+    collisions = 0
+    if hash_vocabulary:
+        hashes = np.fromiter((zlib.crc32(term) for term in terms.tolist()), dtype=np.uint32, count=len(terms))
+        # Sort by hash, larger spread first within a hash, and keep the first of each hash
+        order = np.lexsort((-spread, hashes))
+        hashes = hashes[order]
+        first = np.ones(len(hashes), dtype=bool)
+        first[1:] = hashes[1:] != hashes[:-1]
+        collisions = int(len(hashes) - first.sum())
+        terms = hashes[first]
+        weights = weights[order][first]
+
+    suffix = [dtype.replace("float", "f")]
+    if prune_threshold > 0:
+        suffix.append(f"p{prune_threshold:g}")
+    if hash_vocabulary:
+        suffix.append("crc32")
+
+    compressed = SparseEmotionEngine(
+        terms=terms,
+        weights=np.ascontiguousarray(weights, dtype=dtype),
+        intercept=np.asarray(engine.intercept, dtype=np.float64),
+        classes=engine.class_list,
+        lowercase=engine.lowercase,
+        token_pattern=engine.token_pattern,
+        # A distinct version keeps caches and ETags of the two variants apart
+        version=f"{engine.version}-{'-'.join(suffix)}",
+        vocabulary="crc32" if hash_vocabulary else "terms"
+    )
+    info = {
+        "sourceVersion": engine.version,
+        "weightDtype": dtype,
+        "pruneThreshold": prune_threshold,
+        "vocabulary": compressed.vocabulary,
+        "sourceTerms": int(len(engine.terms)),
+        "keptTerms": int(len(compressed.terms)),
+        "prunedTerms": int((~keep).sum()),
+        "hashCollisionsDropped": collisions
+    }
+    return compressed, info
+
+def parity_report(reference, candidate, texts, batch_size=1000):
+    """
+    Compares a compressed engine with the engine it came from.
+
+    Args:
+        reference (SparseEmotionEngine): Original engine
+        candidate (SparseEmotionEngine): Compressed engine
+        texts (list[str]): Held-out texts
+
+    Returns:
+        dict: Argmax agreement and absolute probability error statistics
+    """
+    agree = 0
+    errors = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        expected = reference.predict_proba(batch)
+        actual = candidate.predict_proba(batch)
+        agree += int(np.sum(expected.argmax(axis=1) == actual.argmax(axis=1)))
+        errors.append(np.abs(expected - actual).max(axis=1))
+
+    errors = np.concatenate(errors) if errors else np.zeros(0)
+    return {
+        "texts": len(texts),
+        "argmaxAgreement": agree / len(texts) if texts else 1.0,
+        "disagreements": len(texts) - agree,
+        "maxProbabilityError": float(errors.max()) if len(errors) else 0.0,
+        "meanProbabilityError": float(errors.mean()) if len(errors) else 0.0,
+        "p99ProbabilityError": float(np.percentile(errors, 99)) if len(errors) else 0.0
+    }
+
+def measure_artifact(artifact_dir, texts, repeats=5):
+    """
+    Size, load time and scoring latency of an artifact.
+
+    arrayBytes is what each worker holds for the model when it loads the
+    arrays into memory (with the default memory map, workers share one copy
+    of these pages instead).
+    """
+    files = [os.path.join(artifact_dir, name) for name in os.listdir(artifact_dir)]
+    load_seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        engine = load_artifact(artifact_dir, verify=True, mmap=False)
+        load_seconds.append(time.perf_counter() - started)
+
+    single = LATENCY_TEXTS * 50
+    single_us = min(_timed(lambda: [engine.predict_proba([text]) for text in single], repeats)) / len(single) * 1e6
+    batch = texts[:1000] or LATENCY_TEXTS
+    batch_us = min(_timed(lambda: engine.predict_proba(batch), repeats)) / len(batch) * 1e6
+
+    return {
+        "diskBytes": sum(os.path.getsize(path) for path in files),
+        "arrayBytes": int(engine.terms.nbytes + engine.weights.nbytes + engine.intercept.nbytes),
+        "loadMs": sorted(load_seconds)[len(load_seconds) // 2] * 1000,
+        "singleTextUs": single_us,
+        "batchUsPerText": batch_us
+    }
+
+def _timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def read_texts(path, text_column="text", limit=None):
+    """Reads held-out texts from a CSV, JSONL or Parquet file (same readers as backfill.py)"""
+    from backfill import READERS, detect_format
+
+    texts = []
+    for rows in READERS[detect_format(path)](path, 2000):
+        texts.extend(row.get(text_column) for row in rows if isinstance(row.get(text_column), str))
+        if limit and len(texts) >= limit:
+            return texts[:limit]
+    return texts
+
+def synthetic_texts(engine, count, seed=0):
+    """Held-out stand-in: random mixes of vocabulary terms and unknown words, 3-30 words each"""
+    rng = np.random.default_rng(seed)
+    vocabulary = [term.decode("utf-8") for term in np.asarray(engine.terms).tolist()]
+    filler = ["xqzv", "lorem", "ipsum", "blorft", "zzyzx"]
+    texts = []
+    for _ in range(count):
+        words = rng.integers(3, 31)
+        picks = rng.integers(0, len(vocabulary), words)
+        texts.append(" ".join(
+            vocabulary[pick] if rng.random() < 0.85 else filler[pick % len(filler)] for pick in picks
+        ))
+    return texts
+
+def _source_engine(artifact_dir):
+    if artifact_dir and os.path.isdir(artifact_dir):
+        return load_artifact(artifact_dir, mmap=False)
+    return load_pickled_engine()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a compressed model artifact and report its parity and savings")
+    parser.add_argument("--source", default=ARTIFACT_PATH,
+                        help="Full artifact to compress (falls back to the pickled model when missing)")
+    parser.add_argument("--out", help="Compressed artifact directory (default: models/<compressed version>.moodmodel)")
+    parser.add_argument("--dtype", choices=WEIGHT_DTYPES, default="float32", help="Weight storage type")
+    parser.add_argument("--prune", type=float, default=0.0,
+                        help="Drop terms whose weight spread across classes is at or below this")
+    parser.add_argument("--hash-vocabulary", action="store_true", help="Store CRC-32 term hashes instead of terms")
+    parser.add_argument("--holdout", help="CSV/JSONL/Parquet file of held-out texts (default: synthetic texts)")
+    parser.add_argument("--text-column", default="text", help="Text column of the held-out file")
+    parser.add_argument("--limit", type=int, default=20000, help="Held-out texts used")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="Exit with an error when argmax agreement is below this")
+    parser.add_argument("--report", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("MODEL COMPRESSION")
+    print("=" * 72)
+
+    source = _source_engine(args.source)
+    compressed, info = compress_engine(source, args.dtype, args.prune, args.hash_vocabulary)
+    out_dir = args.out or os.path.join("models", compressed.version + ".moodmodel")
+    export_engine(compressed, out_dir, extra={"compression": info})
+    print(f"Wrote {out_dir} (model {compressed.version})")
+    print(f"Terms kept: {info['keptTerms']} of {info['sourceTerms']} "
+          f"({info['prunedTerms']} pruned, {info['hashCollisionsDropped']} hash collisions dropped)")
+
+    if args.holdout:
+        texts = read_texts(args.holdout, args.text_column, args.limit)
+        print(f"Held-out set: {len(texts)} texts from {args.holdout}")
+    else:
+        texts = synthetic_texts(source, args.limit)
+        print(f"Held-out set: {len(texts)} synthetic texts (pass --holdout for real data)")
+
+    parity = parity_report(source, compressed, texts)
+
+    # Measure the source as an artifact too, so both go through the same loader
+    source_dir = args.source if os.path.isdir(args.source) else out_dir + ".source.tmp"
+    if source_dir != args.source:
+        export_engine(source, source_dir)
+    try:
+        sizes = {"source": measure_artifact(source_dir, texts), "compressed": measure_artifact(out_dir, texts)}
+    finally:
+        if source_dir != args.source:
+            shutil.rmtree(source_dir, ignore_errors=True)
+
+    print("-" * 72)
+    print(f"{'':<22} {'source':>14} {'compressed':>14} {'change':>10}")
+    for key, label, scale, unit in (
+        ("diskBytes", "on disk", 1 / 1024, "KB"),
+        ("arrayBytes", "arrays in memory", 1 / 1024, "KB"),
+        ("loadMs", "load (verified)", 1, "ms"),
+        ("singleTextUs", "1 text", 1, "us"),
+        ("batchUsPerText", "batch, per text", 1, "us")
+    ):
+        before, after = sizes["source"][key], sizes["compressed"][key]
+        change = f"{(after / before - 1) * 100:+.1f}%" if before else ""
+        print(f"{label:<22} {before * scale:>11.1f} {unit:<2} {after * scale:>11.1f} {unit:<2} {change:>10}")
+    print("-" * 72)
+    print(f"Argmax agreement:      {parity['argmaxAgreement'] * 100:.3f}% ({parity['disagreements']} of {parity['texts']} differ)")
+    print(f"Probability error:     max {parity['maxProbabilityError']:.2e}, "
+          f"mean {parity['meanProbabilityError']:.2e}, p99 {parity['p99ProbabilityError']:.2e}")
+    print("=" * 72)
+    print(f"Serve it with MOOD_MODEL_ARTIFACT={out_dir}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"compression": info, "parity": parity, "measurements": sizes}, f, indent=2)
+        print(f"Wrote {args.report}")
+
+    if parity["argmaxAgreement"] < args.min_agreement:
+        raise SystemExit(f"Argmax agreement {parity['argmaxAgreement']:.4f} is below {args.min_agreement}")
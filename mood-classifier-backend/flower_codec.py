@@ -0,0 +1,423 @@
+import numpy as np
+
+from model_registry import registry
+from param_mapper import BEE_RANGES, EMOTION_MAPPING, TRADING_COLORS, ParameterMapper
+
+# Bump whenever the packed layout below changes; it is the first byte of every record
+CODEC_VERSION = 1
+
+# Flower emotions by on-chain code, as ShapeL2FlowerMoodJournal.getEmotionCode numbers them
+EMOTION_CODES = ("happy", "joy", "sad", "fear", "anger", "disgust", "shame", "surprise", "neutral")
+
+# Fixed-point fields are unsigned 16-bit: value = low + q * (high - low) / FIXED_POINT_STEPS
+FIXED_POINT_STEPS = 65535
+
+# Upper bound of the stored complexity entropy (ln of the class count, for up to 54 classes)
+ENTROPY_MAX = 4.0
+
+# Quantized fields: name -> (compact path, low, high). The ranges are the clamps
+# (or the reachable range) of the formulas in ParameterMapper._formulas.
+FIXED_POINT_FIELDS = {
+    "baseLayerRadius": ("petalParams.baseLayerRadius", 12.0, 20.0),
+    "layerRadiusDecrease": ("petalParams.layerRadiusDecrease", 2.0, 5.0),
+    "petalRotation": ("petalParams.petalRotation", 0.0, 0.5),
+    "openCloseSpeed": ("petalOpenCloseParams.openCloseSpeed", 0.1, 1.0),
+    "heartbeatIntensity": ("heartbeatSettings.intensity", 0.0, 1.0),
+    "rotationIntensity": ("moodSettings.intensity", 0.0, 1.0),
+    "stalkLength": ("stalkParams.currentLength", 8.8, 33.0),
+    "communityMood": ("communityParams.averageMood", 0.0, 1.0),
+    "tradingActivity": ("tradingParams.tradingActivityScore", 0.0, 1.0),
+    "complexityEntropy": ("mlParams.complexityEntropy", 0.0, ENTROPY_MAX),
+    "confidenceGap": ("mlParams.confidenceGap", 0.0, 1.0),
+    "intensityMultiplier": ("mlParams.intensityMultiplier", 0.1, 1.0)
+}
+
+# Whole-number fields stored exactly: name -> (compact path, numpy type)
+INTEGER_FIELDS = {
+    "layerCount": ("petalParams.layerCount", "u1"),
+    "petalCount": ("petalParams.petalCount", "u1"),
+    "geometrySegments": ("petalParams.geometrySegments", "u1"),
+    "bpm": ("heartbeatSettings.bpm", "u1"),
+    "wingSpeed": ("beeParams.wingSpeed", "u1"),
+    "streakDays": ("streakParams.currentStreakDays", ">u2")
+}
+
+# Bits of the flags byte: clockwise rotation, bee shown, connector color (2 bits), bee range (3 bits)
+FLAG_CLOCKWISE = 0x01
+FLAG_BEE = 0x02
+TRADING_COLOR_SHIFT = 2
+BEE_RANGE_SHIFT = 4
+
+class FlowerCodec:
+    """
+    Packs the dynamic flower parameters into fixed-width binary records.
+
+    One record per flower, big-endian (as Solidity reads bytes), with no
+    padding: a version byte, the class count, the flower emotion as its
+    on-chain code, the second class as an index into the model's classes,
+    the whole-number fields and a flags byte exactly, and every other value
+    as 16-bit fixed point over its known range. The class probabilities
+    follow as 16-bit fixed point in [0, 1], in the model's class order.
+    With 8 classes a record is 52 bytes; the compact JSON form is about 1300.
+
+    The values left out are rebuilt from the others on decode:
+    confidence is the highest decoded probability, secondConfidence the
+    second class's probability, confidencePercentage is confidence * 100
+    and beeStreakRanges is the bee range's table entry.
+
+    Rounding to the nearest step gives a maximum absolute error of half a
+    step per fixed-point field (see max_errors()); everything else decodes
+    exactly. Decoded probabilities need not sum to exactly 1.
+    """
+
+    def __init__(self, classes):
+        """
+        Args:
+            classes (list[str]): Model classes, in the order of the probability columns
+        """
+        self.classes = [str(label) for label in classes]
+        if not 2 <= len(self.classes) <= 255:
+            raise ValueError("A flower record holds between 2 and 255 classes")
+        self.mapper = ParameterMapper(self.classes)
+        # On-chain emotion code of each model class (via its flower emotion)
+        self.emotion_codes = np.array([EMOTION_CODES.index(EMOTION_MAPPING.get(label, "neutral"))
+                                       for label in self.classes], dtype=np.uint8)
+
+        fields = [("version", "u1"), ("classCount", "u1"), ("emotion", "u1"), ("secondClass", "u1")]
+        fields += [(name, dtype) for name, (_, dtype) in INTEGER_FIELDS.items()]
+        fields += [("flags", "u1")]
+        fields += [(name, ">u2") for name in FIXED_POINT_FIELDS]
+        fields += [("probabilities", ">u2", (len(self.classes),))]
+        self.dtype = np.dtype(fields)
+        self.size = self.dtype.itemsize
+        self._integer_limits = np.array([np.iinfo(np.dtype(dtype)).max for _, dtype in INTEGER_FIELDS.values()],
+                                        dtype=np.float64)
+        self._low = np.array([low for _, low, _ in FIXED_POINT_FIELDS.values()])
+        self._high = np.array([high for _, _, high in FIXED_POINT_FIELDS.values()])
+
+    def max_errors(self):
+        """Largest absolute decoding error of every quantized value, by compact path"""
+        errors = {path: (high - low) / FIXED_POINT_STEPS / 2 for path, low, high in FIXED_POINT_FIELDS.values()}
+        errors["mlParams.emotionProbabilities"] = 1 / FIXED_POINT_STEPS / 2
+        errors["mlParams.secondConfidence"] = errors["confidence"] = 1 / FIXED_POINT_STEPS / 2
+        errors["confidencePercentage"] = 100 / FIXED_POINT_STEPS / 2
+        return errors
+
+    def encode(self, params):
+        """
+        Packs one flower.
+
+        Args:
+            params (dict): Full or compact flower parameters (the JSON form)
+
+        Raises:
+            ValueError: If a value is outside its field's range or has no code
+
+        Returns:
+            bytes: One record of self.size bytes
+        """
+        ml = params["mlParams"]
+        probabilities = np.array([[ml["emotionProbabilities"][label] for label in self.classes]], dtype=np.float64)
+        emotion = _code(EMOTION_CODES, params["currentEmotion"], "currentEmotion")
+        second = _code(self.classes, ml["secondEmotion"], "mlParams.secondEmotion")
+        trading_color = _code(TRADING_COLORS, params["connectorParams"]["currentColor"], "connectorParams.currentColor")
+        bee_range = _code(BEE_RANGES, params["beeStreakRanges"], "beeStreakRanges")
+
+        columns = {name: [_get(params, path)] for name, (path, _, _) in FIXED_POINT_FIELDS.items()}
+        columns.update({name: [_get(params, path)] for name, (path, _) in INTEGER_FIELDS.items()})
+        columns.update({
+            "emotion": [emotion],
+            "secondClass": [second],
+            "probabilities": probabilities,
+            "clockwise": [params["moodSettings"]["direction"] == 1],
+            "beeAppears": [params["beeParams"]["shouldAppear"]],
+            "tradingColor": [trading_color],
+            "beeRange": [bee_range]
+        })
+        return self._pack(columns).tobytes()
+
+    def encode_batch(self, probabilities, streak_days=None, community_mood=None, trading_activity=None):
+        """
+        Packs many flowers straight from a probability matrix, with whole-column
+        arithmetic (no parameter dicts). Same bytes as encode() on the
+        flower_params_batch() output for the same rows.
+
+        Args:
+            probabilities (numpy.ndarray): (N x classes) probabilities, ordered as `classes`
+            streak_days, community_mood, trading_activity: Per-row numbers (defaults 0, 0.5, 0.5)
+
+        Raises:
+            ValueError: If a value is outside its field's range
+
+        Returns:
+            bytes: N records of self.size bytes, back to back
+        """
+        p = np.atleast_2d(np.asarray(probabilities, dtype=np.float64))
+        n = len(p)
+        streak_days = np.broadcast_to(np.asarray(0 if streak_days is None else streak_days, dtype=np.float64), n)
+        community_mood = np.broadcast_to(np.asarray(0.5 if community_mood is None else community_mood, dtype=np.float64), n)
+        trading_activity = np.broadcast_to(np.asarray(0.5 if trading_activity is None else trading_activity, dtype=np.float64), n)
+        derived = self.mapper.derive(p, streak_days, community_mood, trading_activity)
+
+        columns = {
+            "emotion": self.emotion_codes[derived["top"]],
+            "secondClass": derived["second"],
+            "probabilities": p,
+            "layerCount": derived["layerCount"],
+            "petalCount": derived["petalCount"],
+            "geometrySegments": derived["geometrySegments"],
+            "bpm": derived["bpm"],
+            "wingSpeed": derived["wingSpeed"],
+            "streakDays": streak_days,
+            "clockwise": derived["rotationDirection"] == 1,
+            "beeAppears": derived["beeAppears"],
+            "tradingColor": derived["tradingColor"],
+            "beeRange": derived["beeRange"],
+            "baseLayerRadius": derived["baseLayerRadius"],
+            "layerRadiusDecrease": derived["layerRadiusDecrease"],
+            "petalRotation": derived["petalRotation"],
+            "openCloseSpeed": derived["openCloseSpeed"],
+            "heartbeatIntensity": derived["heartbeatIntensity"],
+            "rotationIntensity": derived["rotationIntensity"],
+            "stalkLength": derived["stalkLength"],
+            "communityMood": community_mood,
+            "tradingActivity": trading_activity,
+            "complexityEntropy": derived["entropy"],
+            "confidenceGap": derived["confidenceGap"],
+            "intensityMultiplier": derived["intensityMultiplier"]
+        }
+        return self._pack(columns).tobytes()
+
+    def decode(self, data):
+        """
+        Unpacks one record into compact flower parameters.
+
+        Args:
+            data (bytes | str): One record, or its hex form ("0x..." as read from a contract)
+
+        Returns:
+            dict: Compact parameters (flower_schema.compact_params form; expand
+            them with flower_schema.expand_params)
+        """
+        rows = self.decode_batch(data)
+        if len(rows) != 1:
+            raise ValueError(f"Expected one {self.size}-byte record, got {len(rows)}")
+        return rows[0]
+
+    def decode_batch(self, data):
+        """
+        Unpacks back-to-back records.
+
+        Raises:
+            ValueError: On a length that is not a whole number of records, an
+                unknown version or a different class count
+
+        Returns:
+            list[dict]: Compact parameters, one dict per record
+        """
+        records = self._records(data)
+        classes = self.classes
+        steps = FIXED_POINT_STEPS
+
+        flags = records["flags"].tolist()
+        fixed = {name: (low + records[name] * ((high - low) / steps)).tolist()
+                 for name, (_, low, high) in FIXED_POINT_FIELDS.items()}
+        quantized = {name: records[name].tolist() for name in ("petalRotation", "stalkLength")}
+        probabilities = (records["probabilities"] / steps).tolist()
+        whole = {name: records[name].tolist() for name in INTEGER_FIELDS}
+
+        rows = []
+        for i, (emotion, second, row) in enumerate(zip(records["emotion"].tolist(), records["secondClass"].tolist(),
+                                                        probabilities)):
+            confidence = max(row)
+            bee_range = BEE_RANGES[flags[i] >> BEE_RANGE_SHIFT & 0x07]
+            rows.append({
+                "currentEmotion": EMOTION_CODES[emotion],
+                "confidence": confidence,
+                "confidencePercentage": confidence * 100,
+                "petalParams": {
+                    "layerCount": whole["layerCount"][i],
+                    "petalCount": whole["petalCount"][i],
+                    "baseLayerRadius": fixed["baseLayerRadius"][i],
+                    "layerRadiusDecrease": fixed["layerRadiusDecrease"][i],
+                    # The mapper emits these bounds as ints
+                    "petalRotation": 0 if quantized["petalRotation"][i] == 0 else fixed["petalRotation"][i],
+                    "geometrySegments": whole["geometrySegments"][i]
+                },
+                "petalOpenCloseParams": {"openCloseSpeed": fixed["openCloseSpeed"][i]},
+                "heartbeatSettings": {"bpm": whole["bpm"][i], "intensity": fixed["heartbeatIntensity"][i]},
+                "moodSettings": {
+                    "intensity": fixed["rotationIntensity"][i],
+                    "direction": 1 if flags[i] & FLAG_CLOCKWISE else -1
+                },
+                "stalkParams": {
+                    "currentLength": 33 if quantized["stalkLength"][i] == steps else fixed["stalkLength"][i]
+                },
+                "connectorParams": {"currentColor": TRADING_COLORS[flags[i] >> TRADING_COLOR_SHIFT & 0x03]},
+                "beeParams": {"wingSpeed": whole["wingSpeed"][i], "shouldAppear": bool(flags[i] & FLAG_BEE)},
+                "beeStreakRanges": None if bee_range is None else {
+                    axis: dict(bounds) for axis, bounds in bee_range.items()
+                },
+                "streakParams": {"currentStreakDays": whole["streakDays"][i]},
+                "communityParams": {"averageMood": fixed["communityMood"][i]},
+                "tradingParams": {"tradingActivityScore": fixed["tradingActivity"][i]},
+                "mlParams": {
+                    "complexityEntropy": fixed["complexityEntropy"][i],
+                    "confidenceGap": fixed["confidenceGap"][i],
+                    "secondEmotion": classes[second],
+                    "secondConfidence": row[second],
+                    "emotionProbabilities": dict(zip(classes, row)),
+                    "intensityMultiplier": fixed["intensityMultiplier"][i]
+                }
+            })
+        return rows
+
+    def _pack(self, columns):
+        # Checks and quantizes whole columns into a structured array of records
+        n = len(columns["emotion"])
+        records = np.zeros(n, dtype=self.dtype)
+        records["version"] = CODEC_VERSION
+        records["classCount"] = len(self.classes)
+        records["emotion"] = columns["emotion"]
+        records["secondClass"] = columns["secondClass"]
+
+        # One matrix per kind of field, so a single flower costs as few numpy calls as a batch
+        whole = np.array([columns[name] for name in INTEGER_FIELDS], dtype=np.float64).reshape(len(INTEGER_FIELDS), n)
+        bad = ~np.all((whole >= 0) & (whole <= self._integer_limits[:, None]) & (whole == np.floor(whole)), axis=1)
+        if bad.any():
+            name = list(INTEGER_FIELDS)[bad.argmax()]
+            raise ValueError(f"{INTEGER_FIELDS[name][0]} must be a whole number "
+                             f"between 0 and {self._integer_limits[bad.argmax()]:g}")
+        for name, values in zip(INTEGER_FIELDS, whole):
+            records[name] = values
+
+        records["flags"] = (np.where(columns["clockwise"], FLAG_CLOCKWISE, 0)
+                            | np.where(columns["beeAppears"], FLAG_BEE, 0)
+                            | np.asarray(columns["tradingColor"]) << TRADING_COLOR_SHIFT
+                            | np.asarray(columns["beeRange"]) << BEE_RANGE_SHIFT)
+
+        fixed = np.array([columns[name] for name in FIXED_POINT_FIELDS], dtype=np.float64).reshape(len(FIXED_POINT_FIELDS), n)
+        for name, values in zip(FIXED_POINT_FIELDS, _quantize(fixed.T, self._low, self._high, list(FIXED_POINT_FIELDS)).T):
+            records[name] = values
+        records["probabilities"] = _quantize(columns["probabilities"], 0.0, 1.0, ["mlParams.emotionProbabilities"])
+        return records
+
+    def _records(self, data):
+        if isinstance(data, str):
+            data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+        if len(data) % self.size:
+            raise ValueError(f"Packed flowers are {self.size}-byte records; got {len(data)} bytes")
+        records = np.frombuffer(data, dtype=self.dtype)
+        if len(records) and not np.all(records["version"] == CODEC_VERSION):
+            raise ValueError(f"Unknown flower record version (this codec reads version {CODEC_VERSION})")
+        if len(records) and not np.all(records["classCount"] == len(self.classes)):
+            raise ValueError(f"Flower records were packed for a model with a different number of classes "
+                             f"(this model has {len(self.classes)})")
+        return records
+
+def _get(params, path):
+    section, _, key = path.partition(".")
+    return params[section][key] if key else params[section]
+
+def _code(table, value, path):
+    # Index of value in a lookup table (its code in the record)
+    try:
+        return table.index(value)
+    except ValueError:
+        raise ValueError(f"{path} has no code: {value!r}") from None
+
+def _quantize(values, low, high, names):
+    # Rounds to the nearest fixed-point step; low/high may be per-column vectors
+    values = np.asarray(values, dtype=np.float64)
+    # NaN fails both comparisons, so it is rejected too
+    valid = (values >= low) & (values <= high)
+    if not valid.all():
+        column = np.argmin(valid.all(axis=0)) if len(names) > 1 else 0
+        path, bounds_low, bounds_high = FIXED_POINT_FIELDS.get(names[column], (names[column], 0.0, 1.0))
+        raise ValueError(f"{path} must be between {bounds_low:g} and {bounds_high:g}")
+    return np.rint((values - low) * (FIXED_POINT_STEPS / (high - low)))
+
+def get_codec():
+    """Codec for the model serving this call (built once per model version)"""
+    return registry.current().derived("codec", lambda engine: FlowerCodec(engine.class_list))
+
+if __name__ == "__main__":
+    import json
+    import random
+    import time
+
+    import flower_integration_bridge as bridge
+    from flower_schema import compact_params, expand_params, get_schema
+
+    print("=" * 60)
+    print("PACKED FLOWER RECORDS")
+    print("=" * 60)
+
+    codec = get_codec()
+    engine = bridge.engine
+    schema = get_schema(bridge)["schema"]
+    rng = random.Random(0)
+    words = "i am so happy today wow this makes me angry and scared about the future feel sad lonely ashamed gross".split()
+    texts = ["I'm feeling really happy today!", "This makes me so angry and frustrated", "the", ""]
+    texts += [" ".join(rng.choice(words) for _ in range(rng.randint(1, 12))) for _ in range(1996)]
+    streak_days = [rng.choice([0, 2, 3, 7, 13, 14, 21, 30, 400]) for _ in texts]
+    community_mood = [rng.choice([0.0, 0.5, 1.0, rng.random()]) for _ in texts]
+    trading_activity = [rng.choice([0.0, 0.3, 0.6, 0.8, 1.0, rng.random()]) for _ in texts]
+
+    probabilities = engine.predict_proba(texts)
+    full = json.loads(json.dumps(bridge.flower_params_batch(probabilities, streak_days, community_mood, trading_activity)))
+    packed = codec.encode_batch(probabilities, streak_days, community_mood, trading_activity)
+    same_bytes = packed == b"".join(codec.encode(params) for params in full)
+
+    # Round trip against the JSON form: exact fields equal, quantized ones within their bound
+    bounds = codec.max_errors()
+    worst = dict.fromkeys(bounds, 0.0)
+    mismatches = 0
+    for params, decoded in zip(full, codec.decode_batch(packed)):
+        expected = compact_params(params)
+        expanded = expand_params(json.loads(json.dumps(decoded)), schema)
+        for section, value in expected.items():
+            items = value.items() if isinstance(value, dict) and section != "beeStreakRanges" else [(None, value)]
+            for key, original in items:
+                path = section if key is None else f"{section}.{key}"
+                got = decoded[section] if key is None else decoded[section][key]
+                if path in bounds and path != "mlParams.emotionProbabilities":
+                    worst[path] = max(worst[path], abs(got - original))
+                elif path == "mlParams.emotionProbabilities":
+                    error = max(abs(got[label] - original[label]) for label in original)
+                    worst[path] = max(worst[path], error)
+                elif got != original:
+                    mismatches += 1
+        mismatches += set(expanded) != set(params)
+
+    print(f"Records: {len(full)} x {codec.size} bytes (version {CODEC_VERSION}, {len(codec.classes)} classes)")
+    compact_json = len(json.dumps(compact_params(full[0]), separators=(",", ":")))
+    full_json = len(json.dumps(full[0], separators=(",", ":")))
+    print(f"Size of one flower: packed {codec.size} B, compact JSON {compact_json} B, full JSON {full_json} B")
+    print(f"encode_batch bytes equal per-dict encode(): {same_bytes}")
+    print(f"Exact fields that differ after decoding: {mismatches}")
+    print("-" * 60)
+    print(f"{'field':<40} {'max error':>10} {'bound':>10}")
+    for path, bound in bounds.items():
+        print(f"{path:<40} {worst[path]:>10.2e} {bound:>10.2e}")
+
+    print("-" * 60)
+    batch = np.repeat(probabilities, 25, axis=0)
+    started = time.perf_counter()
+    encoded = codec.encode_batch(batch, np.repeat(streak_days, 25), np.repeat(community_mood, 25),
+                                 np.repeat(trading_activity, 25))
+    encode_us = (time.perf_counter() - started) / len(batch) * 1e6
+    started = time.perf_counter()
+    codec.decode_batch(encoded)
+    decode_us = (time.perf_counter() - started) / len(batch) * 1e6
+    started = time.perf_counter()
+    for params in full[:500]:
+        codec.encode(params)
+    single_us = (time.perf_counter() - started) / 500 * 1e6
+    print(f"encode_batch {encode_us:.2f} us/flower, decode_batch {decode_us:.2f} us/flower "
+          f"({len(batch)} rows); encode() {single_us:.1f} us/flower")
+
+    print("=" * 60)
+    if not same_bytes or mismatches or any(worst[path] > bound * (1 + 1e-9) for path, bound in bounds.items()):
+        raise SystemExit("Packed flower records did not round trip")
+    print("Packed records round trip within the documented error")
@@ -1,12 +1,44 @@
+import bisect
+import numbers
 import numpy as np
-import joblib
-import pandas as pd
-import json
+from community_mood import MAX_COMMUNITY_ID_LENGTH, community_moods, valence_vector
+from model_registry import registry
+from param_mapper import (
+    BEE_RANGE_THRESHOLDS, BEE_RANGES, BEE_WING_SPEED, CLOCKWISE_EMOTIONS, HEARTBEAT_BPM, HEARTBEAT_INTENSITY,
+    ROTATION_INTENSITY, TRADING_COLOR_THRESHOLDS, TRADING_COLORS, ParameterMapper, copy_range
+)
+from result_cache import probability_cache
+from streak_store import GOOD_MOOD_EMOTIONS, GOOD_MOOD_THRESHOLD, MAX_USER_ID_LENGTH, streak_store
 
-# Load the model
-pipe_lr = joblib.load(open('models/emotion_classifier_pipe_lr_03_jan_2022.pkl', 'rb'))
+class ModelState:
+    """What the bridge derives from one model version (built once per model)"""
+    __slots__ = ("engine", "mapper", "mood_valence", "good_mood_classes")
+    
+    def __init__(self, engine):
+        self.engine = engine
+        
+        # Derives the flower parameters for whole probability matrices at once
+        self.mapper = ParameterMapper(engine.class_list)
+        
+        # Per-class valence, for folding submissions into their community's mood
+        self.mood_valence = valence_vector(engine.class_list)
+        
+        # Classes whose confident predictions extend a user's streak
+        self.good_mood_classes = np.array([label in GOOD_MOOD_EMOTIONS for label in engine.class_list])
 
-def get_flower_art_parameters(text, streak_days=0, community_mood=0.5, trading_activity=0.5):
+def model_state():
+    """Bridge state of the model serving this call (the request's pinned model, else the active one)"""
+    return registry.current().derived("bridge", ModelState)
+
+def __getattr__(name):
+    # engine, mapper, mood_valence and good_mood_classes follow the model registry,
+    # so they change with a hot reload instead of being fixed at import
+    if name in ModelState.__slots__:
+        return getattr(model_state(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_flower_art_parameters(text, streak_days=0, community_mood=0.5, trading_activity=0.5, community_id=None,
+                              user_id=None):
     """
     Returns parameters optimized for your existing flower art system.
     
@@ -15,266 +47,330 @@ def get_flower_art_parameters(text, streak_days=0, community_mood=0.5, trading_a
         streak_days (int): Number of consecutive good mood days (0-30)
         community_mood (float): Community mood score (0-1)
         trading_activity (float): Trading activity score (0-1)
+        community_id (str): Community the submission belongs to. When given, the
+            text is folded into that community's mood and the server-side
+            community mood replaces `community_mood`.
+        user_id (str): User the submission belongs to. When given, the submission
+            updates that user's stored streak and the stored streak replaces `streak_days`.
         
     Returns:
         dict: Parameters mapped to your flower art system
     """
-    # Get ML model predictions
-    prediction = pipe_lr.predict([text])
-    probability = pipe_lr.predict_proba([text])
+    if community_id is not None and not is_community_id(community_id):
+        raise ValueError(f"community_id must be a non-empty string of at most {MAX_COMMUNITY_ID_LENGTH} characters")
+    if user_id is not None and not is_user_id(user_id):
+        raise ValueError(f"user_id must be a non-empty string of at most {MAX_USER_ID_LENGTH} characters")
     
-    # Create probability dictionary
-    proba_df = pd.DataFrame(probability, columns=pipe_lr.classes_)
-    proba_dict = proba_df.iloc[0].to_dict()
+    with registry.pinned():
+        probabilities = predict_probabilities([text])[0]
+        return submission_params(probabilities, streak_days, community_mood, trading_activity, community_id, user_id)
+
+def submission_inputs(data):
+    """
+    Validates the JSON body of one analysis request, as both servers accept it.
     
-    # Calculate key metrics
-    max_prob = np.max(probability)
-    min_prob = np.min(probability)
-    entropy = -np.sum(probability[0] * np.log(probability[0] + 1e-10))
+    Args:
+        data (dict): {"text", "streakDays", "communityMood", "tradingActivity", "communityId", "userId"}
+        
+    Returns:
+        dict: text, streak_days, community_mood, trading_activity, community_id and user_id
+        
+    Raises:
+        ValueError: With the message of the 400 response
+    """
+    inputs = {
+        "text": data.get("text", ""),
+        "streak_days": data.get("streakDays", 0),
+        "community_mood": data.get("communityMood", 0.5),
+        "trading_activity": data.get("tradingActivity", 0.5),
+        "community_id": data.get("communityId"),
+        "user_id": data.get("userId")
+    }
+    if not isinstance(inputs["text"], str):
+        raise ValueError("text must be a string")
+    if not inputs["text"]:
+        raise ValueError("Text is required")
+    for name, key in (("streakDays", "streak_days"), ("communityMood", "community_mood"), ("tradingActivity", "trading_activity")):
+        if not is_number(inputs[key]):
+            raise ValueError(f"{name} must be a number")
+    if inputs["community_id"] is not None and not is_community_id(inputs["community_id"]):
+        raise ValueError(f"communityId must be a non-empty string of at most {MAX_COMMUNITY_ID_LENGTH} characters")
+    if inputs["user_id"] is not None and not is_user_id(inputs["user_id"]):
+        raise ValueError(f"userId must be a non-empty string of at most {MAX_USER_ID_LENGTH} characters")
+    return inputs
+
+def submission_params(probabilities, streak_days=0, community_mood=0.5, trading_activity=0.5, community_id=None,
+                      user_id=None, mark=None):
+    """
+    Flower parameters of one scored submission, after recording it in its community's mood and its user's streak.
     
-    # Sort emotions by probability
-    sorted_emotions = sorted(proba_dict.items(), key=lambda x: x[1], reverse=True)
-    second_emotion = sorted_emotions[1][0]
-    second_confidence = sorted_emotions[1][1]
-    confidence_gap = max_prob - second_confidence
+    Args:
+        probabilities (numpy.ndarray): Class probabilities, ordered as engine.classes
+        streak_days, community_mood, trading_activity: Client-supplied inputs
+        community_id (str): Community to fold the submission into (its mood replaces `community_mood`)
+        user_id (str): User whose streak the submission updates (the stored streak replaces `streak_days`)
+        mark (callable): Called with "community" and "streak" once those steps ran (request stage timing)
+        
+    Returns:
+        dict: Parameters mapped to your flower art system
+    """
+    if community_id is not None:
+        community_mood = record_community_moods(probabilities[None, :], [community_id], [community_mood])[0]
+        if mark is not None:
+            mark("community")
+    if user_id is not None:
+        streak_days = record_streaks(probabilities[None, :], [user_id], [streak_days])[0]
+        if mark is not None:
+            mark("streak")
+    return flower_params_from_probabilities(probabilities, streak_days, community_mood, trading_activity)
+
+def get_flower_art_parameters_batch(texts, streak_days=None, community_mood=None, trading_activity=None,
+                                    community_ids=None, user_ids=None):
+    """
+    Returns flower art parameters for many texts using a single model pass.
     
-    dominant_emotion = prediction[0]
+    The vectorizer and classifier run once over every valid text in the batch,
+    and the parameters are derived for all of them with array operations.
     
-    # Map ML emotions to your flower art emotions
-    emotion_mapping = {
-        "joy": "joy",
-        "happy": "happy", 
-        "sadness": "sad",
-        "fear": "fear",
-        "anger": "anger",
-        "disgust": "disgust",
-        "shame": "shame",
-        "surprise": "surprise",
-        "neutral": "neutral"
+    Args:
+        texts (list[str]): Input texts to analyze
+        streak_days (list[int]): Per-item streak days (defaults to 0)
+        community_mood (list[float]): Per-item community mood (defaults to 0.5)
+        trading_activity (list[float]): Per-item trading activity (defaults to 0.5)
+        community_ids (list[str]): Per-item community (defaults to None). Items with a
+            community are folded into its mood in input order and use the
+            server-side community mood instead of `community_mood`.
+        user_ids (list[str]): Per-item user (defaults to None). Items with a user
+            update that user's stored streak in input order and use it instead
+            of `streak_days`.
+        
+    Returns:
+        list[dict]: One entry per input text, in input order. Successful items
+        look like {"index": i, "success": True, "data": params}, failed items
+        look like {"index": i, "success": False, "error": message}.
+    """
+    count = len(texts)
+    inputs = {
+        "streak_days": _per_item(streak_days, count, 0, "streak_days"),
+        "community_mood": _per_item(community_mood, count, 0.5, "community_mood"),
+        "trading_activity": _per_item(trading_activity, count, 0.5, "trading_activity")
     }
+    community_ids = _per_item(community_ids, count, None, "community_ids")
+    user_ids = _per_item(user_ids, count, None, "user_ids")
     
-    mapped_emotion = emotion_mapping.get(dominant_emotion, "neutral")
+    results = [None] * count
+    valid_indices = []
+    for index, text in enumerate(texts):
+        invalid = [name for name, values in inputs.items() if not is_number(values[index])]
+        if not isinstance(text, str) or not text:
+            results[index] = {"index": index, "success": False, "error": "Text is required"}
+        elif invalid:
+            results[index] = {"index": index, "success": False, "error": f"{invalid[0]} must be a number"}
+        elif community_ids[index] is not None and not is_community_id(community_ids[index]):
+            results[index] = {"index": index, "success": False, "error": (
+                f"community_id must be a non-empty string of at most {MAX_COMMUNITY_ID_LENGTH} characters")}
+        elif user_ids[index] is not None and not is_user_id(user_ids[index]):
+            results[index] = {"index": index, "success": False, "error": (
+                f"user_id must be a non-empty string of at most {MAX_USER_ID_LENGTH} characters")}
+        else:
+            valid_indices.append(index)
     
-    # Calculate intensity multiplier from confidence
-    intensity_multiplier = max(0.1, min(1.0, max_prob * 1.5))
+    if valid_indices:
+        # One model for every item, even if a reload swaps models meanwhile
+        with registry.pinned():
+            probabilities = predict_probabilities([texts[i] for i in valid_indices])
+            valid_inputs = {name: [values[i] for i in valid_indices] for name, values in inputs.items()}
+            valid_inputs["community_mood"] = record_community_moods(
+                probabilities, [community_ids[i] for i in valid_indices], valid_inputs["community_mood"]
+            )
+            valid_inputs["streak_days"] = record_streaks(
+                probabilities, [user_ids[i] for i in valid_indices], valid_inputs["streak_days"]
+            )
+            params = flower_params_batch(probabilities, **valid_inputs)
+        for index, item in zip(valid_indices, params):
+            results[index] = {"index": index, "success": True, "data": item}
     
-    # Map to your flower art parameters
-    flower_params = {
-        # ========================================
-        # 1. EMOTION-BASED COLOR SYSTEM
-        # ========================================
-        "currentEmotion": mapped_emotion,
-        "confidence": float(max_prob),
-        "confidencePercentage": float(max_prob * 100),
-        
-        # ========================================
-        # 2. PETAL SYSTEM PARAMETERS
-        # ========================================
-        "petalParams": {
-            "layerCount": max(1, min(10, int(entropy * 3) + 1)),  # 1-10 layers
-            "petalCount": max(3, min(20, int(entropy * 8) + 6)),  # 3-20 petals
-            "baseLayerRadius": 12 + (max_prob * 8),  # 12-20 radius
-            "layerRadiusDecrease": 2 + (confidence_gap * 3),  # 2-5 decrease
-            "petalRotation": max(0, min(0.5, entropy * 0.3)),  # 0-0.5 radians
-            "layerRotations": [0, 0],  # Will be calculated dynamically
-            "layerOffsets": [0, 0],    # Will be calculated dynamically
-            "geometrySegments": max(10, min(30, int(entropy * 15) + 10)),  # 10-30 segments
-            "geometryPhiStart": np.pi / 3,
-            "geometryPhiLength": np.pi / 3,
-            "geometryThetaStart": 0,
-            "geometryThetaLength": np.pi
-        },
-        
-        # ========================================
-        # 3. PETAL OPEN/CLOSE RANGE PARAMETERS
-        # ========================================
-        "petalOpenCloseParams": {
-            "minOpenAngle": 0,
-            "maxOpenAngle": 90,
-            "openCloseSpeed": max(0.1, min(1.0, 1.0 - confidence_gap)),  # 0.1-1.0
-            "individualLayerControl": True,
-            "layerOpenCloseRanges": [
-                {"min": 0, "max": 90},
-                {"min": 0, "max": 90}
-            ]
-        },
-        
-        # ========================================
-        # 4. HEARTBEAT SYSTEM (BPM CONTROLLED)
-        # ========================================
-        "heartbeatSettings": {
-            "bpm": get_heartbeat_bpm(mapped_emotion, max_prob),
-            "intensity": get_heartbeat_intensity(mapped_emotion, max_prob)
-        },
-        
-        "heartbeatParams": {
-            "pulseUpdateRate": 0.02,
-            "dualPulseEnabled": True,
-            "secondaryPulseIntensity": 0.3,
-            "glowIntensityRange": {"min": 0.2, "max": 0.9},
-            "bpmRange": {"min": 55, "max": 110}
-        },
-        
-        # ========================================
-        # 5. PETAL ROTATION SYSTEM
-        # ========================================
-        "moodSettings": {
-            "intensity": get_rotation_intensity(mapped_emotion, max_prob),
-            "direction": get_rotation_direction(mapped_emotion)
-        },
-        
-        "rotationParams": {
-            "rotationUpdateRate": 0.02,
-            "alternatingEnabled": True,
-            "individualLayerRotation": True,
-            "rotationIntensityRange": {"min": 0.01, "max": 1.0},
-            "directionOptions": {"clockwise": 1, "counterclockwise": -1}
-        },
-        
-        # ========================================
-        # 6. STALK SYSTEM (COMMUNITY FEATURE)
-        # ========================================
-        "stalkParams": {
-            "baseLength": 10,
-            "minLength": 8.8,
-            "maxLength": 33,
-            "communityMoodThreshold": 0.7,
-            "communityMoodMultiplier": 2.0,
-            "growthSpeed": 0.1,
-            "decaySpeed": 0.05,
-            "currentLength": calculate_stalk_length(max_prob, community_mood, streak_days)
-        },
-        
-        # ========================================
-        # 7. CONNECTOR/CORE SYSTEM (TRADING ACTIVITY)
-        # ========================================
-        "connectorParams": {
-            "baseColor": "#C0C0C0",
-            "tradingActivityColors": {
-                "low": "#FF0000",
-                "medium": "#FFA500", 
-                "high": "#00FF00",
-                "veryHigh": "#00FFFF"
-            },
-            "tradingActivityThresholds": {
-                "low": 0.3,
-                "medium": 0.6,
-                "high": 0.8
-            },
-            "colorTransitionSpeed": 0.1,
-            "currentColor": get_trading_color(trading_activity)
-        },
+    return results
+
+def _per_item(values, count, default, name):
+    """Expand an optional per-item argument to a list of length `count`"""
+    if values is None:
+        return [default] * count
+    if len(values) != count:
+        raise ValueError(f"{name} must have one value per text ({len(values)} given for {count} texts)")
+    return [default if value is None else value for value in values]
+
+def record_community_moods(probabilities, community_ids, community_mood):
+    """
+    Folds scored submissions into their communities' moods.
+    
+    Args:
+        probabilities (numpy.ndarray): (rows x classes) probabilities, ordered as engine.classes
+        community_ids (list[str]): Per-row community, or None for rows outside any community
+        community_mood (list[float]): Per-row client-supplied community mood
         
-        # ========================================
-        # 8. BEE SYSTEM (STREAK-BASED)
-        # ========================================
-        "beeParams": {
-            "baseScale": 1.11,
-            "basePosition": {"x": 0, "y": 2.1, "z": 0},
-            "wingSpeed": get_bee_wing_speed(mapped_emotion, max_prob),
-            "wingFlapRange": 0.9,
-            "wingFlapIntensity": 0.6,
-            "appearanceThreshold": 3,
-            "flightBobSpeed": 1.2,
-            "flightBobAmplitude": 0.08,
-            "rotationSpeed": 0.3,
-            "rotationAmplitude": 0.08,
-            "shouldAppear": streak_days >= 3
-        },
+    Returns:
+        list[float]: The community mood each row should use (the server-side value
+        right after the row was recorded, or the client value for rows without a community)
+    """
+    tracked = [i for i, community_id in enumerate(community_ids) if community_id is not None]
+    if not tracked:
+        return community_mood
+    
+    moods = (probabilities[tracked] @ model_state().mood_valence).tolist()
+    community_mood = list(community_mood)
+    for i, value in zip(tracked, community_moods.record_many([community_ids[i] for i in tracked], moods)):
+        community_mood[i] = value
+    return community_mood
+
+def record_streaks(probabilities, user_ids, streak_days):
+    """
+    Updates the stored streaks of the users behind scored submissions.
+    
+    A submission extends its user's streak when the predicted emotion is a
+    good mood (GOOD_MOOD_EMOTIONS) with confidence of at least GOOD_MOOD_THRESHOLD.
+    
+    Args:
+        probabilities (numpy.ndarray): (rows x classes) probabilities, ordered as engine.classes
+        user_ids (list[str]): Per-row user, or None for anonymous rows
+        streak_days (list[int]): Per-row client-supplied streak days
         
-        "beeStreakRanges": get_bee_range(streak_days),
+    Returns:
+        list[int]: The streak days each row should use (the stored streak right
+        after the row was recorded, or the client value for anonymous rows)
+    """
+    tracked = [i for i, user_id in enumerate(user_ids) if user_id is not None]
+    if not tracked:
+        return streak_days
+    
+    rows = probabilities[tracked]
+    good = (model_state().good_mood_classes[rows.argmax(axis=1)] & (rows.max(axis=1) >= GOOD_MOOD_THRESHOLD)).tolist()
+    streak_days = list(streak_days)
+    for i, value in zip(tracked, streak_store.record_many([user_ids[i] for i in tracked], good)):
+        streak_days[i] = value
+    return streak_days
+
+def is_community_id(value):
+    """Whether `value` is an acceptable community id"""
+    return isinstance(value, str) and 0 < len(value) <= MAX_COMMUNITY_ID_LENGTH
+
+def is_user_id(value):
+    """Whether `value` is an acceptable user id"""
+    return isinstance(value, str) and 0 < len(value) <= MAX_USER_ID_LENGTH
+
+def is_number(value):
+    """Whether `value` is acceptable as streak days, community mood or trading activity"""
+    # Exact type check first: the numbers.Real ABC check is comparatively slow
+    return type(value) in (int, float) or isinstance(value, numbers.Real)
+
+def predict_probabilities(texts):
+    """
+    Runs the classifier once over a list of texts.
+    
+    Args:
+        texts (list[str]): Input texts to analyze
         
-        # ========================================
-        # 9. STREAK SYSTEM PARAMETERS
-        # ========================================
-        "streakParams": {
-            "goodMoodThreshold": 0.7,
-            "streakDecayRate": 0.1,
-            "maxStreakDays": 30,
-            "streakMultiplier": 1.5,
-            "currentStreakDays": streak_days,
-            "streakFeatures": {
-                "beeAppearance": True,
-                "beeRangeControl": True,
-                "stalkGrowth": True,
-                "glowIntensity": True,
-                "rotationSpeed": True
-            }
-        },
+    Returns:
+        numpy.ndarray: (len(texts) x classes) probability matrix, columns ordered as engine.classes
+    """
+    return probability_cache.predict_proba(registry.current().engine, list(texts))
+
+def score_texts(texts):
+    """
+    Classifies texts, reusing cached probabilities for texts seen before.
+    
+    Args:
+        texts (list[str]): Input texts to analyze
         
-        # ========================================
-        # 10. COMMUNITY & TRADING INTEGRATION
-        # ========================================
-        "communityParams": {
-            "memberCount": 0,  # Will be set by your system
-            "averageMood": community_mood,
-            "positiveMoodThreshold": 0.7,
-            "moodUpdateFrequency": 3600000,
-            "stalkGrowthFactor": 0.1
-        },
+    Returns:
+        list[EmotionScore]: One score per text, in input order
+    """
+    with registry.pinned() as model:
+        return model.engine.describe(predict_probabilities(texts))
+
+def flower_params_batch(probabilities, streak_days=None, community_mood=None, trading_activity=None):
+    """
+    Maps a probability matrix to flower art parameters, one dict per row.
+    
+    Args:
+        probabilities (numpy.ndarray): (rows x classes) probabilities, ordered as engine.classes
+        streak_days (list[int]): Per-row streak days (defaults to 0)
+        community_mood (list[float]): Per-row community mood (defaults to 0.5)
+        trading_activity (list[float]): Per-row trading activity (defaults to 0.5)
         
-        "tradingParams": {
-            "tradingVolume": 0,  # Will be set by your system
-            "tradingVolumeThreshold": 100,
-            "tradingActivityScore": trading_activity,
-            "activityUpdateFrequency": 300000,
-            "colorTransitionSpeed": 0.1
-        },
+    Returns:
+        list[dict]: Parameters mapped to your flower art system
+    """
+    probabilities = np.atleast_2d(probabilities)
+    count = len(probabilities)
+    streak_days = _per_item(streak_days, count, 0, "streak_days")
+    community_mood = _per_item(community_mood, count, 0.5, "community_mood")
+    trading_activity = _per_item(trading_activity, count, 0.5, "trading_activity")
+    
+    for name, values in (("streak_days", streak_days), ("community_mood", community_mood),
+                         ("trading_activity", trading_activity)):
+        if not all(is_number(value) for value in values):
+            raise TypeError(f"{name} must be a number")
+    
+    return model_state().mapper.flower_art_rows(probabilities, streak_days, community_mood, trading_activity)
+
+def flower_params_from_probabilities(probabilities, streak_days=0, community_mood=0.5, trading_activity=0.5):
+    """
+    Maps one row of class probabilities to flower art parameters.
+    
+    Args:
+        probabilities (numpy.ndarray): Class probabilities, ordered as engine.classes
+        streak_days (int): Number of consecutive good mood days (0-30)
+        community_mood (float): Community mood score (0-1)
+        trading_activity (float): Trading activity score (0-1)
         
-        # ========================================
-        # 11. ADDITIONAL ML-BASED PARAMETERS
-        # ========================================
-        "mlParams": {
-            "complexityEntropy": float(entropy),
-            "confidenceGap": float(confidence_gap),
-            "secondEmotion": second_emotion,
-            "secondConfidence": float(second_confidence),
-            "emotionProbabilities": proba_dict,
-            "sortedEmotions": sorted_emotions,
-            "intensityMultiplier": float(intensity_multiplier)
-        }
-    }
+    Returns:
+        dict: Parameters mapped to your flower art system
+    """
+    return flower_params_batch(
+        probabilities,
+        streak_days=[streak_days],
+        community_mood=[community_mood],
+        trading_activity=[trading_activity]
+    )[0]
+
+def flower_params_from_score(score, streak_days=0, community_mood=0.5, trading_activity=0.5):
+    """
+    Maps a classified text to flower art parameters.
     
-    return flower_params
+    Args:
+        score (EmotionScore): Output of engine.score / engine.describe
+        streak_days (int): Number of consecutive good mood days (0-30)
+        community_mood (float): Community mood score (0-1)
+        trading_activity (float): Trading activity score (0-1)
+        
+    Returns:
+        dict: Parameters mapped to your flower art system
+    """
+    return flower_params_from_probabilities(score.row, streak_days, community_mood, trading_activity)
 
 def get_heartbeat_bpm(emotion, confidence):
     """Calculate BPM based on emotion and confidence"""
-    base_bpm = {
-        "happy": 85, "joy": 95, "sad": 55, "fear": 110,
-        "anger": 100, "disgust": 70, "shame": 65, "surprise": 90, "neutral": 72
-    }
-    
-    base = base_bpm.get(emotion, 72)
+    base = HEARTBEAT_BPM.get(emotion, 72)
     # Adjust based on confidence (higher confidence = more extreme BPM)
     confidence_factor = 1.0 + (confidence - 0.5) * 0.4  # ±20% variation
     return int(base * confidence_factor)
 
 def get_heartbeat_intensity(emotion, confidence):
     """Calculate heartbeat intensity based on emotion and confidence"""
-    base_intensity = {
-        "happy": 0.6, "joy": 0.8, "sad": 0.2, "fear": 0.9,
-        "anger": 0.7, "disgust": 0.4, "shame": 0.3, "surprise": 0.7, "neutral": 0.4
-    }
-    
-    base = base_intensity.get(emotion, 0.4)
+    base = HEARTBEAT_INTENSITY.get(emotion, 0.4)
     # Boost intensity with confidence
     return min(0.9, base * (1.0 + confidence * 0.5))
 
 def get_rotation_intensity(emotion, confidence):
     """Calculate rotation intensity based on emotion and confidence"""
-    base_intensity = {
-        "happy": 0.8, "joy": 1.0, "sad": 0.01, "fear": 0.6,
-        "anger": 0.9, "disgust": 0.4, "shame": 0.3, "surprise": 0.7, "neutral": 0.2
-    }
-    
-    base = base_intensity.get(emotion, 0.2)
+    base = ROTATION_INTENSITY.get(emotion, 0.2)
     # Apply confidence multiplier
     return min(1.0, base * (1.0 + confidence * 0.5))
 
 def get_rotation_direction(emotion):
     """Get rotation direction based on emotion"""
-    clockwise_emotions = ["happy", "joy", "surprise", "neutral"]
-    return 1 if emotion in clockwise_emotions else -1
+    return 1 if emotion in CLOCKWISE_EMOTIONS else -1
 
 def calculate_stalk_length(confidence, community_mood, streak_days):
     """Calculate stalk length based on confidence, community mood, and streak"""
@@ -287,39 +383,20 @@ def calculate_stalk_length(confidence, community_mood, streak_days):
 
 def get_trading_color(trading_activity):
     """Get connector color based on trading activity"""
-    if trading_activity < 0.3:
-        return "#FF0000"  # Red
-    elif trading_activity < 0.6:
-        return "#FFA500"  # Orange
-    elif trading_activity < 0.8:
-        return "#00FF00"  # Green
-    else:
-        return "#00FFFF"  # Cyan
+    return TRADING_COLORS[bisect.bisect_right(TRADING_COLOR_THRESHOLDS, trading_activity)]
 
 def get_bee_wing_speed(emotion, confidence):
     """Calculate bee wing speed based on emotion and confidence"""
-    base_speed = {
-        "happy": 18, "joy": 22, "sad": 8, "fear": 25,
-        "anger": 20, "disgust": 12, "shame": 10, "surprise": 19, "neutral": 15
-    }
-    
-    base = base_speed.get(emotion, 15)
+    base = BEE_WING_SPEED.get(emotion, 15)
     # Adjust based on confidence
     confidence_factor = 1.0 + (confidence - 0.5) * 0.6  # ±30% variation
     return max(5, min(30, int(base * confidence_factor)))
 
 def get_bee_range(streak_days):
     """Get bee range based on streak days"""
-    if streak_days >= 21:
-        return {"xRange": {"min": -1.5, "max": 1.5}, "zRange": {"min": -1.5, "max": 1.5}, "yRange": {"min": 2.2, "max": 5}}
-    elif streak_days >= 14:
-        return {"xRange": {"min": -5, "max": 5}, "zRange": {"min": -5, "max": 5}, "yRange": {"min": 2.2, "max": 10}}
-    elif streak_days >= 7:
-        return {"xRange": {"min": -10, "max": 10}, "zRange": {"min": -10, "max": 10}, "yRange": {"min": 2.2, "max": 15}}
-    elif streak_days >= 3:
-        return {"xRange": {"min": -18, "max": 18}, "zRange": {"min": -18, "max": 18}, "yRange": {"min": 2.2, "max": 20}}
-    else:
+    if not streak_days >= BEE_RANGE_THRESHOLDS[0]:
         return None
+    return copy_range(BEE_RANGES[bisect.bisect_right(BEE_RANGE_THRESHOLDS, streak_days)])
 
 def get_js_integration_code():
     """Returns JavaScript code to integrate with your flower art system"""
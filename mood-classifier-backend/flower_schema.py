@@ -0,0 +1,261 @@
+import hashlib
+import json
+import threading
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
+
+# Bump whenever DYNAMIC_FIELDS or the layout of the constant sections changes
+SCHEMA_VERSION = 1
+
+# Values that depend on the text or the request; everything else in the
+# flower parameters is the same on every call and lives in the schema
+DYNAMIC_FIELDS = (
+    "currentEmotion",
+    "confidence",
+    "confidencePercentage",
+    "petalParams.layerCount",
+    "petalParams.petalCount",
+    "petalParams.baseLayerRadius",
+    "petalParams.layerRadiusDecrease",
+    "petalParams.petalRotation",
+    "petalParams.geometrySegments",
+    "petalOpenCloseParams.openCloseSpeed",
+    "heartbeatSettings.bpm",
+    "heartbeatSettings.intensity",
+    "moodSettings.intensity",
+    "moodSettings.direction",
+    "stalkParams.currentLength",
+    "connectorParams.currentColor",
+    "beeParams.wingSpeed",
+    "beeParams.shouldAppear",
+    "beeStreakRanges",
+    "streakParams.currentStreakDays",
+    "communityParams.averageMood",
+    "tradingParams.tradingActivityScore",
+    "mlParams.complexityEntropy",
+    "mlParams.confidenceGap",
+    "mlParams.secondEmotion",
+    "mlParams.secondConfidence",
+    "mlParams.emotionProbabilities",
+    "mlParams.intensityMultiplier"
+)
+
+# Dynamic values left out of the compact view because the client can rebuild them
+DERIVED_FIELDS = {
+    "mlParams.sortedEmotions": "mlParams.emotionProbabilities as [emotion, probability] pairs, "
+                               "highest first, ties in key order"
+}
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+def get_schema(bridge):
+    """
+    Returns the flower parameter schema for the bridge's current model.
+
+    The constant sections are taken from the parameters of a reference
+    (uniform probability) score with every dynamic field removed. The
+    result is built once per model version.
+
+    Args:
+        bridge: The flower_integration_bridge module
+
+    Returns:
+        dict: {"schema": {...}, "etag": str, "paths": set of valid field paths}
+    """
+    engine = bridge.engine
+    cached = _schemas.get(engine.version)
+    if cached is not None:
+        return cached
+
+    # Deferred: api_server imports this module before the model (and numpy) is loaded
+    import numpy as np
+
+    with _schemas_lock:
+        if engine.version not in _schemas:
+            classes = len(engine.class_list)
+            reference = bridge.flower_params_from_probabilities(np.full(classes, 1.0 / classes))
+
+            constants = json.loads(json.dumps(reference))
+            for field in DYNAMIC_FIELDS + tuple(DERIVED_FIELDS):
+                _remove(constants, field.split("."))
+
+            schema = {
+                "version": SCHEMA_VERSION,
+                "modelVersion": engine.version,
+                "dynamicFields": list(DYNAMIC_FIELDS),
+                "derivedFields": DERIVED_FIELDS,
+                "constants": constants
+            }
+            digest = hashlib.sha256(json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+            _schemas[engine.version] = {
+                "schema": schema,
+                "etag": digest.hexdigest()[:32],
+                "paths": _paths(reference)
+            }
+    return _schemas[engine.version]
+
+def compact_params(params):
+    """
+    Keeps only the dynamic values of a flower parameter dict.
+
+    Args:
+        params (dict): Output of get_flower_art_parameters
+
+    Returns:
+        dict: Nested dict with the DYNAMIC_FIELDS only
+    """
+    compact = {}
+    for field in DYNAMIC_FIELDS:
+        section, _, key = field.partition(".")
+        if key:
+            compact.setdefault(section, {})[key] = params[section][key]
+        else:
+            compact[section] = params[section]
+    return compact
+
+def expand_params(compact, schema):
+    """
+    Rebuilds the full flower parameters from a compact response and the schema.
+
+    Args:
+        compact (dict): Compact "data" object
+        schema (dict): The "schema" part of get_schema() (or /api/flower-schema)
+
+    Returns:
+        dict: Same content as the full response (JSON types: lists, not tuples)
+    """
+    params = _merge(json.loads(json.dumps(schema["constants"])), compact)
+    probabilities = params["mlParams"]["emotionProbabilities"]
+    params["mlParams"]["sortedEmotions"] = [
+        [emotion, probability]
+        for emotion, probability in sorted(probabilities.items(), key=lambda item: -item[1])
+    ]
+    return params
+
+def parse_fields(value, valid_paths):
+    """
+    Parses a ?fields= value ("currentEmotion,heartbeatSettings.bpm").
+
+    Raises:
+        ValueError: If a field is not part of the flower parameters
+
+    Returns:
+        list[list[str]] | None: Split field paths, or None for "all fields"
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in valid_paths]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return [field.split(".") for field in fields]
+
+def project(params, fields):
+    """
+    Keeps only the requested fields of a (full or compact) parameter dict.
+
+    Args:
+        params (dict): Flower parameters
+        fields (list[list[str]]): Output of parse_fields
+
+    Returns:
+        dict: Nested dict with the requested paths that are present
+    """
+    if fields is None:
+        return params
+
+    projected = {}
+    for path in fields:
+        value = params
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return projected
+
+def packb(payload):
+    """Encodes a response payload as MessagePack"""
+    if msgpack is None:
+        raise RuntimeError("MessagePack responses need the msgpack package (pip install msgpack)")
+    return msgpack.packb(payload, use_bin_type=True)
+
+def _remove(tree, path):
+    if len(path) == 1:
+        tree.pop(path[0], None)
+        return
+    section = tree.get(path[0])
+    if isinstance(section, dict):
+        _remove(section, path[1:])
+        if not section:
+            del tree[path[0]]
+
+def _merge(base, overlay):
+    for key, value in overlay.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+def _paths(tree, prefix=""):
+    paths = set()
+    for key, value in tree.items():
+        path = prefix + key
+        paths.add(path)
+        if isinstance(value, dict):
+            paths |= _paths(value, path + ".")
+    return paths
+
+if __name__ == "__main__":
+    import timeit
+    import flower_integration_bridge as bridge
+
+    print("=" * 60)
+    print("FLOWER PARAMETER SCHEMA")
+    print("=" * 60)
+
+    schema = get_schema(bridge)
+    schema_bytes = len(json.dumps(schema["schema"], sort_keys=True, separators=(",", ":")))
+    print(f"Schema v{SCHEMA_VERSION} (model {schema['schema']['modelVersion']}), "
+          f"{schema_bytes} bytes, ETag {schema['etag']}")
+
+    test_cases = [
+        ("I'm feeling really happy today!", 5, 0.8, 0.7),
+        ("This makes me so angry and frustrated", 0, 0.2, 0.1),
+        ("I'm scared and worried about the future", 25, 0.5, 0.95),
+        ("I feel sad and lonely", 10, 0.4, 0.4),
+        ("the", 2, 0.5, 0.5)
+    ]
+
+    failures = 0
+    for text, streak_days, community_mood, trading_activity in test_cases:
+        params = json.loads(json.dumps(bridge.get_flower_art_parameters(text, streak_days, community_mood, trading_activity)))
+        compact = json.loads(json.dumps(compact_params(params)))
+        roundtrip_ok = expand_params(compact, schema["schema"]) == params
+
+        full_json = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        compact_json = json.dumps(compact, sort_keys=True, separators=(",", ":"))
+        full_us = timeit.timeit(lambda: json.dumps(params, sort_keys=True, separators=(",", ":")), number=2000) / 2000 * 1e6
+        compact_us = timeit.timeit(
+            lambda: json.dumps(compact_params(params), sort_keys=True, separators=(",", ":")), number=2000
+        ) / 2000 * 1e6
+
+        failures += not roundtrip_ok
+        print(f"{text[:36]:<38} full {len(full_json):>5} B {full_us:>6.1f} us | "
+              f"compact {len(compact_json):>5} B {compact_us:>6.1f} us | round trip {'OK' if roundtrip_ok else 'FAILED'}")
+
+    print("=" * 60)
+    if failures:
+        raise SystemExit(f"{failures} round trip(s) failed")
+    print("Compact responses expand back to the full parameters")
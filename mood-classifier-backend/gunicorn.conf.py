@@ -0,0 +1,62 @@
+# Production server configuration for the mood classifier API:
+#
+#     gunicorn -c gunicorn.conf.py api_server:app
+#
+# The master imports api_server, which loads and warms up the model
+# (preload_app), then forks the workers so they share the model pages
+# copy-on-write. The master and every worker watch the model files and
+# hot-reload a new version (MOOD_MODEL_WATCH_INTERVAL), so workers forked
+# after a reload start on the new model. Settings come from environment variables; run
+# tune_workers.py to pick values for a host.
+import gc
+import multiprocessing
+import os
+
+# Workers must get an already-loaded model: never defer loading to a thread that fork would drop
+os.environ['MOOD_LAZY_START'] = '0'
+
+# BLAS/OpenMP threads per worker. Set before numpy is imported by the preloaded app,
+# so N workers x T threads never oversubscribe the cores.
+BLAS_THREADS = int(os.environ.get('MOOD_BLAS_THREADS', '1'))
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+    os.environ.setdefault(variable, str(BLAS_THREADS))
+
+bind = os.environ.get('MOOD_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('MOOD_WORKERS', str(multiprocessing.cpu_count())))
+
+# Request threads per worker; more than one switches to the threaded worker
+threads = int(os.environ.get('MOOD_THREADS', '1'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+
+# Graceful recycling: each worker is replaced after a jittered number of requests,
+# finishing its in-flight requests first
+max_requests = int(os.environ.get('MOOD_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.environ.get('MOOD_MAX_REQUESTS_JITTER', str(max(1, max_requests // 10))))
+graceful_timeout = int(os.environ.get('MOOD_GRACEFUL_TIMEOUT', '30'))
+timeout = int(os.environ.get('MOOD_WORKER_TIMEOUT', '30'))
+keepalive = 5
+
+accesslog = os.environ.get('MOOD_ACCESS_LOG') or None
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so the
+    # cyclic GC in the workers does not write to (and un-share) those pages
+    gc.freeze()
+    server.log.info(
+        "Model preloaded; starting %d %s workers x %d threads (BLAS threads per worker: %d)",
+        workers, worker_class, threads, BLAS_THREADS
+    )
+
+def post_fork(server, worker):
+    # The model watcher thread stays behind in the master: each worker polls the model files itself
+    import api_server
+    api_server.start_model_watcher()
+
+    # Native thread pools may have been sized before the environment was read
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    worker.blas_limits = threadpool_limits(limits=BLAS_THREADS)
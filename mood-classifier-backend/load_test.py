@@ -0,0 +1,503 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import queue
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Words the generated journal entries are made of
+WORDS = (
+    "i me my we you they it the a and but so because today yesterday work home friends family "
+    "happy glad excited love grateful calm fine okay tired sad lonely miss cry angry furious annoyed "
+    "hate scared worried anxious nervous afraid surprised shocked wow ashamed embarrassed sorry gross "
+    "disgusting really very so much little feel feeling felt was is am were been again never always "
+    "morning night week weekend dinner coffee walk rain sun exam meeting boss team game music"
+).split()
+
+# Words per generated text: log-normal, so most entries are a short sentence or two
+# with a long tail of multi-paragraph ones (median ~14 words, ~1% above 150)
+TEXT_WORDS_MEDIAN = 14
+TEXT_WORDS_SIGMA = 0.95
+TEXT_WORDS_MAX = 600
+
+# A step counts as saturated when it completes less than this share of the offered rate
+SATURATION_THROUGHPUT_RATIO = 0.95
+
+# Open-loop requests sent this much later than scheduled mean the load generator fell behind
+LATE_SEND_SECONDS = 0.010
+
+def free_port():
+    """Returns a TCP port that is currently free on localhost"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port, workers=1, threads=1, blas_threads=1, server="gunicorn", env=None):
+    """
+    Launches the API locally.
+
+    Args:
+        port (int): Port to listen on (127.0.0.1)
+        workers (int): gunicorn workers, or uvicorn processes for the ASGI app
+        threads (int): Request threads per gunicorn worker
+        blas_threads (int): BLAS/OpenMP threads per worker
+        server (str): "gunicorn" (api_server.py with gunicorn.conf.py) or "asgi" (asgi_app.py under uvicorn)
+        env (dict): Extra environment variables, e.g. {"MOOD_MICROBATCH": "1"}
+
+    Returns:
+        subprocess.Popen
+    """
+    environment = dict(os.environ)
+    environment.update({
+        "MOOD_BIND": f"127.0.0.1:{port}",
+        "MOOD_WORKERS": str(workers),
+        "MOOD_THREADS": str(threads),
+        "MOOD_BLAS_THREADS": str(blas_threads)
+    })
+    environment.update(env or {})
+
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api_server:app"]
+    elif server == "asgi":
+        command = [sys.executable, "-m", "uvicorn", "asgi_app:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", str(workers), "--no-access-log"]
+    else:
+        raise ValueError("server must be 'gunicorn' or 'asgi'")
+    return subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def wait_ready(port, timeout=120, host="127.0.0.1"):
+    """Polls /api/ready until it returns 200"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=2)
+            connection.request("GET", "/api/ready")
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def generate_texts(count, seed=0):
+    """
+    Journal-like texts with a realistic length mix (log-normal word counts).
+
+    Returns:
+        list[str]
+    """
+    rng = random.Random(seed)
+    mu = math.log(TEXT_WORDS_MEDIAN)
+    texts = []
+    for _ in range(count):
+        words = min(TEXT_WORDS_MAX, max(1, int(round(rng.lognormvariate(mu, TEXT_WORDS_SIGMA)))))
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(words)))
+    return texts
+
+def load_texts(path, text_column="text", limit=None):
+    """
+    Texts to replay: one per line from a .txt file, or the text column of a
+    CSV, JSONL or Parquet file (same readers as backfill.py).
+    """
+    if path.endswith(".txt"):
+        with open(path, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts[:limit] if limit else texts
+
+    from compress_model import read_texts
+    return read_texts(path, text_column, limit)
+
+def request_bodies(texts, count, seed=0):
+    """Encoded /api/mood-analysis bodies drawn from `texts` (built before timing starts)"""
+    rng = random.Random(seed)
+    return [
+        json.dumps({
+            "text": rng.choice(texts),
+            "streakDays": rng.randint(0, 30),
+            "communityMood": round(rng.random(), 2),
+            "tradingActivity": round(rng.random(), 2)
+        }).encode("utf-8")
+        for _ in range(count)
+    ]
+
+class Target:
+    """Where requests go: host, port and path of the analysis endpoint"""
+
+    def __init__(self, host, port, path="/api/mood-analysis"):
+        self.host = host
+        self.port = port
+        self.path = path
+
+    @classmethod
+    def from_url(cls, url):
+        parts = urlsplit(url)
+        return cls(parts.hostname or "127.0.0.1", parts.port or 80, parts.path or "/api/mood-analysis")
+
+    def connect(self, timeout):
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+def _send(connection, target, body):
+    """
+    Sends one request on a kept-alive connection (reopened by http.client when the server closed it).
+
+    Returns:
+        int: HTTP status, or 0 for a connection error or timeout
+    """
+    try:
+        connection.request("POST", target.path, body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except (OSError, http.client.HTTPException):
+        connection.close()
+        return 0
+
+def _summary(latencies, statuses, elapsed, **extra):
+    """Throughput, error counts and latency percentiles (ms) of one measured step"""
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    total = sum(statuses.values())
+    result = {
+        "requests": total,
+        "ok": ok,
+        "errors": total - ok,
+        "errorRate": (total - ok) / total if total else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughputRps": ok / elapsed if elapsed > 0 else 0.0,
+        "p50Ms": percentile(latencies, 0.50) * 1000,
+        "p90Ms": percentile(latencies, 0.90) * 1000,
+        "p95Ms": percentile(latencies, 0.95) * 1000,
+        "p99Ms": percentile(latencies, 0.99) * 1000,
+        "p999Ms": percentile(latencies, 0.999) * 1000,
+        "maxMs": latencies[-1] * 1000 if latencies else 0.0
+    }
+    result.update(extra)
+    return result
+
+def run_open_loop(target, rate, duration, bodies, connections=256, timeout=10.0, arrivals="poisson", seed=0):
+    """
+    Sends requests at a fixed arrival rate, whether or not earlier ones have returned.
+
+    Arrival times are drawn up front (exponential gaps for "poisson", even
+    gaps for "uniform"). Latency is measured from each request's scheduled
+    time, not from when a connection got round to sending it, so a server
+    that falls behind shows up as growing latency instead of as a quietly
+    lower send rate (no coordinated omission).
+
+    Args:
+        target (Target): Server to load
+        rate (float): Offered requests per second
+        duration (float): Seconds of arrivals
+        bodies (list[bytes]): Request bodies, used round-robin
+        connections (int): Concurrent connections (the most requests in flight at once)
+        timeout (float): Seconds before a request counts as failed
+        arrivals (str): "poisson" or "uniform"
+
+    Returns:
+        dict: Offered and achieved rate, status counts, latency percentiles (ms)
+            and how many requests the generator itself sent late
+    """
+    rng = random.Random(seed)
+    schedule = queue.Queue()
+    offset = 0.0
+    index = 0
+    while True:
+        offset += rng.expovariate(rate) if arrivals == "poisson" else 1.0 / rate
+        if offset >= duration:
+            break
+        schedule.put((offset, bodies[index % len(bodies)]))
+        index += 1
+    scheduled = index
+
+    latencies = []
+    statuses = {}
+    late = [0]
+    lock = threading.Lock()
+    start = time.perf_counter() + 0.05
+
+    def sender():
+        connection = target.connect(timeout)
+        local_latencies = []
+        local_statuses = {}
+        local_late = 0
+        while True:
+            try:
+                offset, body = schedule.get_nowait()
+            except queue.Empty:
+                break
+            due = start + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > LATE_SEND_SECONDS:
+                local_late += 1
+            status = _send(connection, target, body)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if status == 200:
+                local_latencies.append(time.perf_counter() - due)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            late[0] += local_late
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(min(connections, scheduled) or 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(duration, time.perf_counter() - start)
+
+    return _summary(latencies, statuses, elapsed, mode="open", offeredRps=scheduled / duration,
+                    lateSends=late[0])
+
+def run_closed_loop(target, concurrency, duration, bodies, timeout=30.0):
+    """
+    Drives the server with `concurrency` clients that each send the next
+    request as soon as the previous one returns.
+
+    Returns:
+        dict: Status counts, throughput and latency percentiles (ms)
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        connection = target.connect(timeout)
+        local_latencies = []
+        local_statuses = {}
+        index = offset
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            status = _send(connection, target, bodies[index % len(bodies)])
+            index += concurrency
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if status == 200:
+                local_latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(offset,), daemon=True) for offset in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return _summary(latencies, statuses, time.perf_counter() - started, mode="closed", concurrency=concurrency)
+
+def meets_slo(step, p99_target_ms, max_error_rate):
+    """Whether a step kept its p99 and error rate within target (and, open-loop, kept up with the offered rate)"""
+    if not step["ok"] or step["p99Ms"] > p99_target_ms or step["errorRate"] > max_error_rate:
+        return False
+    if step["mode"] == "open":
+        return step["throughputRps"] >= SATURATION_THROUGHPUT_RATIO * step["offeredRps"]
+    return True
+
+def find_saturation(steps, p99_target_ms, max_error_rate):
+    """
+    Reads the capacity curve.
+
+    Returns:
+        dict: "capacity" is the highest-throughput step within target (None if
+        there is none) and "saturation" the first step past it: the first step
+        that missed the target, or (closed loop) whose extra clients added
+        less than 5% throughput
+    """
+    capacity = None
+    saturation = None
+    for index, step in enumerate(steps):
+        if not meets_slo(step, p99_target_ms, max_error_rate):
+            saturation = step
+            break
+        if step["mode"] == "closed" and capacity is not None and \
+                step["throughputRps"] < capacity["throughputRps"] * 1.05:
+            saturation = step
+            break
+        capacity = step
+    return {"capacity": capacity, "saturation": saturation}
+
+def sweep(target, mode, levels, duration, warmup, bodies, p99_target_ms, max_error_rate, stop_after=1,
+          connections=256, arrivals="poisson", timeout=10.0, report=None):
+    """
+    Steps the load up (rates for open loop, client counts for closed loop),
+    stopping `stop_after` steps past the first one that misses the target.
+
+    Args:
+        report (callable): Called with each finished step (progress output)
+
+    Returns:
+        list[dict]: One measurement per step, in order
+    """
+    steps = []
+    missed = 0
+    for level in levels:
+        if mode == "open":
+            if warmup > 0:
+                run_open_loop(target, level, warmup, bodies, connections, timeout, arrivals, seed=-1)
+            step = run_open_loop(target, level, duration, bodies, connections, timeout, arrivals)
+        else:
+            if warmup > 0:
+                run_closed_loop(target, level, warmup, bodies, timeout)
+            step = run_closed_loop(target, level, duration, bodies, timeout)
+        steps.append(step)
+        if report is not None:
+            report(step)
+
+        if not meets_slo(step, p99_target_ms, max_error_rate):
+            missed += 1
+            if missed > stop_after:
+                break
+    return steps
+
+def geometric_levels(start, factor, maximum):
+    """start, start*factor, ... up to maximum (rounded, without repeats)"""
+    levels = []
+    level = float(start)
+    while level <= maximum:
+        rounded = int(round(level))
+        if not levels or rounded != levels[-1]:
+            levels.append(rounded)
+        level *= factor
+    return levels
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+def _format_step(step):
+    load = f"{step['offeredRps']:>9.1f}" if step["mode"] == "open" else f"{step['concurrency']:>9d}"
+    late = f"{step['lateSends']:>6d}" if step["mode"] == "open" else f"{'':>6}"
+    return (f"{load} {step['throughputRps']:>9.1f} {step['p50Ms']:>8.1f} {step['p95Ms']:>8.1f} "
+            f"{step['p99Ms']:>8.1f} {step['maxMs']:>8.1f} {step['errorRate'] * 100:>6.2f}% {late}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Step up load on /api/mood-analysis and report the capacity curve")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open",
+                        help="open: fixed arrival rates; closed: fixed numbers of back-to-back clients")
+    parser.add_argument("--rates", type=parse_list, help="Open-loop request rates, e.g. 50,100,200 "
+                        "(default: --start-rate x --factor up to --max-rate)")
+    parser.add_argument("--start-rate", type=float, default=25.0)
+    parser.add_argument("--factor", type=float, default=1.5, help="Growth between steps")
+    parser.add_argument("--max-rate", type=float, default=5000.0)
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 2, 4, 8, 16, 32, 64],
+                        help="Closed-loop client counts")
+    parser.add_argument("--arrivals", choices=("poisson", "uniform"), default="poisson")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per step")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured load before each step")
+    parser.add_argument("--connections", type=int, default=256, help="Open-loop connections (max in flight)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a request counts as failed")
+    parser.add_argument("--p99-target-ms", type=float, default=100.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.001)
+    parser.add_argument("--stop-after", type=int, default=1, help="Steps run past the first one that misses the target")
+    parser.add_argument("--texts", help="Texts to replay (.txt one per line, or CSV/JSONL/Parquet; default: generated)")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--url", help="Load an already running server (e.g. http://127.0.0.1:5001/api/mood-analysis) "
+                        "instead of starting one")
+    parser.add_argument("--server", choices=("gunicorn", "asgi"), default="gunicorn", help="Server started locally")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--blas-threads", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra server environment, e.g. --env MOOD_MICROBATCH=1 (repeatable)")
+    parser.add_argument("--label", help="Name of this configuration in the report")
+    parser.add_argument("--out", help="Write the steps, capacity and saturation point as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.text_column, 50000) if args.texts else generate_texts(5000)
+    bodies = request_bodies(texts, 20000)
+    levels = (args.rates or geometric_levels(args.start_rate, args.factor, args.max_rate)) \
+        if args.mode == "open" else args.concurrency
+    env = dict(item.split("=", 1) for item in args.env)
+    label = args.label or (args.url or f"{args.server} workers={args.workers} threads={args.threads}"
+                           + "".join(f" {item}" for item in args.env))
+
+    print("=" * 80)
+    print(f"LOAD TEST ({args.mode} loop): {label}")
+    print("=" * 80)
+    words = sorted(len(text.split()) for text in texts)
+    print(f"Texts: {len(texts)} ({'from ' + args.texts if args.texts else 'generated'}), words per text "
+          f"p50 {percentile(words, 0.5)}, p90 {percentile(words, 0.9)}, p99 {percentile(words, 0.99)}")
+
+    process = None
+    if args.url:
+        target = Target.from_url(args.url)
+    else:
+        port = free_port()
+        process = start_server(port, args.workers, args.threads, args.blas_threads, args.server, env)
+        target = Target("127.0.0.1", port)
+    try:
+        if not wait_ready(target.port, host=target.host):
+            raise SystemExit("Server did not become ready")
+        print(f"{'offered' if args.mode == 'open' else 'clients':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'max ms':>8} {'errors':>7} {'late':>6}")
+        steps = sweep(target, args.mode, levels, args.duration, args.warmup, bodies, args.p99_target_ms,
+                      args.max_error_rate, args.stop_after, args.connections, args.arrivals, args.timeout,
+                      report=lambda step: print(_format_step(step)))
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    found = find_saturation(steps, args.p99_target_ms, args.max_error_rate)
+    capacity, saturation = found["capacity"], found["saturation"]
+    print("=" * 80)
+    if capacity is None:
+        print(f"No step met p99 <= {args.p99_target_ms:g} ms with error rate <= {args.max_error_rate:.2%}")
+    else:
+        print(f"Capacity: {capacity['throughputRps']:.1f} req/s at p99 {capacity['p99Ms']:.1f} ms "
+              f"(target {args.p99_target_ms:g} ms)")
+    if saturation is not None:
+        load = f"{saturation['offeredRps']:.1f} req/s offered" if saturation["mode"] == "open" \
+            else f"{saturation['concurrency']} clients"
+        print(f"Saturation: {load} -> {saturation['throughputRps']:.1f} req/s, p99 {saturation['p99Ms']:.1f} ms, "
+              f"errors {saturation['errorRate']:.2%}")
+    else:
+        print("Not saturated within the tested range")
+    # Late sends past saturation are expected (every connection is waiting on the server);
+    # within target they mean the generator itself was short of CPU or connections
+    if any(step.get("lateSends", 0) > 0.01 * step["requests"] for step in steps
+           if meets_slo(step, args.p99_target_ms, args.max_error_rate)):
+        print("Note: the load generator fell behind at rates within target; run it on another host "
+              "or raise --connections before trusting the capacity figure")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "label": label,
+                "mode": args.mode,
+                "server": None if args.url else {"kind": args.server, "workers": args.workers,
+                                                 "threads": args.threads, "blasThreads": args.blas_threads,
+                                                 "env": env},
+                "p99TargetMs": args.p99_target_ms,
+                "maxErrorRate": args.max_error_rate,
+                "steps": steps,
+                "capacity": capacity,
+                "saturation": saturation
+            }, f, indent=2)
+        print(f"Wrote {args.out}")
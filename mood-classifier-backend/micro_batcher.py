@@ -0,0 +1,294 @@
+import contextlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from admission import Overloaded
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class MicroBatcher:
+    """
+    Groups concurrent single-text predictions into one batched model call.
+
+    Request threads call predict(text) and block. A background thread takes
+    the first waiting request, keeps collecting until either `max_batch_size`
+    requests are waiting or `max_wait_ms` has passed since that first request
+    arrived, runs `predict_fn` once on the whole batch and hands every caller
+    its own row. If that call fails, each text is scored on its own, so only
+    the requests whose text fails get the error.
+
+    With an admission controller, the batcher takes one inference slot per
+    batch, once the batch is formed. Requests do not hold a slot while they
+    wait to be batched, since that would cap every batch at the slot count.
+    The batcher bounds its own queue instead. Requests whose deadline passes
+    while queued are dropped before the model call.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0, max_queue=0, admission=None):
+        """
+        Args:
+            predict_fn (callable): Maps a list of texts to a (texts x classes) matrix
+            max_batch_size (int): Largest batch handed to `predict_fn`
+            max_wait_ms (float): Longest a request waits for others to join its batch
+            max_queue (int): Requests allowed to wait for a batch (0 = no limit)
+            admission (AdmissionController): Controller granting each batch its inference slot
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max_queue
+        self.admission = admission
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._reset_stats()
+
+    @classmethod
+    def from_env(cls, predict_fn, admission=None):
+        """Builds a batcher configured by MOOD_MICROBATCH_MAX_SIZE, MOOD_MICROBATCH_WAIT_MS and MOOD_MICROBATCH_MAX_QUEUE"""
+        max_batch_size = int(os.environ.get('MOOD_MICROBATCH_MAX_SIZE', '32'))
+        return cls(
+            predict_fn,
+            max_batch_size=max_batch_size,
+            max_wait_ms=float(os.environ.get('MOOD_MICROBATCH_WAIT_MS', '2')),
+            max_queue=int(os.environ.get('MOOD_MICROBATCH_MAX_QUEUE', str(4 * max_batch_size))),
+            admission=admission
+        )
+
+    def _reset_stats(self):
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.errors = 0
+        self.fallbacks = 0
+        self.shed = 0
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so each process starts its own
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._queue = queue.Queue()
+            self._reset_stats()
+            worker = threading.Thread(target=self._run, args=(self._queue,), name="micro-batcher", daemon=True)
+            worker.start()
+            self._pid = pid
+
+    def submit(self, text, deadline=None):
+        """
+        Queues one text for the next batch.
+
+        Args:
+            text: Item handed to `predict_fn` in a batch
+            deadline (float): Time on the admission controller's clock after which
+                the text is dropped instead of scored (None = no deadline)
+
+        Raises:
+            Overloaded: When max_queue requests are already waiting
+
+        Returns:
+            concurrent.futures.Future: Resolves to the text's probability row
+        """
+        self._ensure_worker()
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            with self._lock:
+                self.shed += 1
+            raise Overloaded("Server is overloaded", "queue_full", self._retry_after())
+        future = Future()
+        self._queue.put((text, future, time.perf_counter(), deadline))
+        return future
+
+    def predict(self, text, timeout=None, deadline=None):
+        """Returns the probability row for one text, batched with concurrent callers"""
+        return self.submit(text, deadline).result(timeout)
+
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+            close_at = batch[0][2] + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = close_at - time.perf_counter()
+                try:
+                    # Past the batching window, still take whatever is already queued
+                    if remaining > 0:
+                        batch.append(pending.get(timeout=remaining))
+                    else:
+                        batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        waits = [started - submitted for _, _, submitted, _ in batch]
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.batch_size_counts[_bucket(len(batch))] += 1
+            self.queue_wait_total += sum(waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(waits))
+
+        # Their clients have stopped waiting: drop them before the model call
+        now = self.admission.clock() if self.admission is not None else time.monotonic()
+        expired = [item for item in batch if item[3] is not None and item[3] <= now]
+        if expired:
+            with self._lock:
+                self.shed += len(expired)
+            for _, future, _, _ in expired:
+                future.set_exception(Overloaded("Request deadline passed while queued", "deadline", self._retry_after()))
+            batch = [item for item in batch if item[3] is None or item[3] > now]
+            if not batch:
+                return
+
+        try:
+            with self._slot(batch):
+                self._run_batch(batch)
+        except Overloaded as e:
+            with self._lock:
+                self.shed += len(batch)
+            for _, future, _, _ in batch:
+                future.set_exception(e)
+
+    def _slot(self, batch):
+        # One inference slot for the whole batch, kept until the latest deadline in it
+        if self.admission is None:
+            return contextlib.nullcontext()
+        default = self.admission.deadline()
+        return self.admission.admit(max(default if deadline is None else deadline for _, _, _, deadline in batch))
+
+    def _retry_after(self):
+        return self.admission.retry_after() if self.admission is not None else 1
+
+    def _run_batch(self, batch):
+        try:
+            probabilities = self.predict_fn([text for text, _, _, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0][1], e)
+            else:
+                # One bad text fails the whole call: score each text on its own,
+                # so only the request that caused it gets the error
+                with self._lock:
+                    self.fallbacks += 1
+                for text, future, _, _ in batch:
+                    try:
+                        row = self.predict_fn([text])[0]
+                    except Exception as item_error:
+                        self._fail(future, item_error)
+                    else:
+                        future.set_result(row)
+        else:
+            for row, (_, future, _, _) in zip(probabilities, batch):
+                future.set_result(row)
+
+    def _fail(self, future, error):
+        with self._lock:
+            self.errors += 1
+        future.set_exception(error)
+
+    def stats(self):
+        """Returns configuration plus achieved batch size and queue wait metrics"""
+        with self._lock:
+            labels = [str(bound) for bound in BATCH_SIZE_BUCKETS] + ["+Inf"]
+            return {
+                "enabled": True,
+                "maxBatchSize": self.max_batch_size,
+                "maxWaitMs": self.max_wait * 1000.0,
+                "maxQueue": self.max_queue,
+                "shed": self.shed,
+                "queueDepth": self._queue.qsize() if self._queue is not None else 0,
+                "batches": self.batches,
+                "items": self.items,
+                "errors": self.errors,
+                "fallbacks": self.fallbacks,
+                "averageBatchSize": self.items / self.batches if self.batches else 0.0,
+                "maxBatchSizeSeen": self.max_batch_seen,
+                "batchSizeHistogram": dict(zip(labels, self.batch_size_counts)),
+                "averageQueueWaitMs": self.queue_wait_total / self.items * 1000.0 if self.items else 0.0,
+                "maxQueueWaitMs": self.queue_wait_max * 1000.0
+            }
+
+def _bucket(size):
+    """Index of the first histogram bucket whose upper bound holds `size`"""
+    for index, bound in enumerate(BATCH_SIZE_BUCKETS):
+        if size <= bound:
+            return index
+    return len(BATCH_SIZE_BUCKETS)
+
+if __name__ == "__main__":
+    from admission import AdmissionController
+
+    print("=" * 60)
+    print("MICRO-BATCHING UNDER ADMISSION CONTROL")
+    print("=" * 60)
+
+    # One inference slot, as MOOD_MAX_CONCURRENCY defaults to on a 1-core host
+    controller = AdmissionController(max_concurrency=1, max_queue=2, default_timeout=5.0)
+
+    def score(texts):
+        time.sleep(0.005)
+        return [[len(text)] for text in texts]
+
+    batcher = MicroBatcher(score, max_batch_size=32, max_wait_ms=20, max_queue=64, admission=controller)
+    outcomes = {"ok": 0}
+    lock = threading.Lock()
+
+    def request(text):
+        try:
+            # As the single-text route does: checked at the door, slot taken by the batch
+            deadline = controller.deadline()
+            controller.check(deadline)
+            row = batcher.predict(text, deadline=deadline)
+            outcome = "ok" if row == [len(text)] else "wrong row"
+        except Overloaded as e:
+            outcome = e.reason
+        with lock:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    threads = [threading.Thread(target=request, args=("x" * index,)) for index in range(21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = batcher.stats()
+    print(f"21 concurrent requests on 1 slot: {outcomes}")
+    print(f"Batches: {stats['batches']}, largest: {stats['maxBatchSizeSeen']}, slots granted: {controller.stats()['admitted']}")
+
+    # A request whose deadline passes while it waits for its batch is dropped, not scored
+    try:
+        batcher.predict("late", deadline=controller.clock() - 1)
+        dropped = False
+    except Overloaded as e:
+        dropped = e.reason == "deadline"
+    print(f"Expired request dropped before the model call: {dropped}")
+
+    # A full batcher queue sheds new requests instead of growing
+    stalled = MicroBatcher(lambda texts: time.sleep(0.2) or [[0]] * len(texts), max_batch_size=1, max_wait_ms=0, max_queue=2)
+    futures = []
+    full = False
+    for _ in range(5):
+        try:
+            futures.append(stalled.submit("x"))
+        except Overloaded:
+            full = True
+            break
+    print(f"Full queue shed: {full}")
+
+    print("=" * 60)
+    if outcomes != {"ok": 21} or stats["maxBatchSizeSeen"] < 2 or not dropped or not full:
+        raise SystemExit("Admission control limits micro-batching")
+    print("Batches formed beyond the slot count with no request shed")
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from sparse_engine import SparseEmotionEngine
+
+# Pickled sklearn pipeline shipped with the repo
+MODEL_PATH = 'models/emotion_classifier_pipe_lr_03_jan_2022.pkl'
+
+# Array artifact exported from MODEL_PATH (see export_pipeline)
+ARTIFACT_PATH = 'models/emotion_classifier_pipe_lr_03_jan_2022.moodmodel'
+
+ARTIFACT_FORMAT = "mood-linear-model"
+ARTIFACT_FORMAT_VERSION = 2
+
+# Version 1 predates the "vocabulary" field (always a term vocabulary)
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+MANIFEST_FILE = "manifest.json"
+
+# Arrays stored in an artifact, one .npy file each
+ARRAY_NAMES = ("terms", "weights", "intercept")
+
+class ArtifactError(Exception):
+    """Raised when an artifact is missing, malformed or fails its checksum"""
+
+def export_pipeline(pipeline, out_dir, model_version):
+    """
+    Writes a fitted pipeline as a versioned directory of raw arrays.
+
+    The layout is a manifest.json plus one .npy file per array: the sorted
+    UTF-8 vocabulary (terms), the (terms x classes) weight matrix and the
+    intercepts. Class labels, tokenizer settings and the vocabulary kind
+    live in the manifest.
+    No pickle is involved, so loading does not depend on the scikit-learn
+    version, and the arrays can be memory-mapped.
+
+    Args:
+        pipeline: Fitted CountVectorizer + LogisticRegression pipeline
+        out_dir (str): Artifact directory to create (replaced if it exists)
+        model_version (str): Version recorded in the manifest
+
+    Returns:
+        dict: The written manifest
+    """
+    engine = SparseEmotionEngine.from_pipeline(pipeline, version=model_version)
+    return export_engine(engine, out_dir)
+
+def export_engine(engine, out_dir, extra=None):
+    """
+    Writes an engine's arrays and settings as an artifact directory.
+
+    Args:
+        engine (SparseEmotionEngine): Engine to export
+        out_dir (str): Artifact directory to create (replaced if it exists)
+        extra (dict): Additional manifest fields
+
+    Returns:
+        dict: The written manifest
+    """
+    out_dir = out_dir.rstrip("/")
+    staging_dir = out_dir + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        array = np.ascontiguousarray(getattr(engine, name))
+        file_name = name + ".npy"
+        np.save(os.path.join(staging_dir, file_name), array, allow_pickle=False)
+        arrays[name] = {
+            "file": file_name,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "sha256": _sha256(os.path.join(staging_dir, file_name))
+        }
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "formatVersion": ARTIFACT_FORMAT_VERSION,
+        "modelVersion": engine.version,
+        "classes": engine.class_list,
+        "lowercase": engine.lowercase,
+        "tokenPattern": engine.token_pattern,
+        "vocabulary": engine.vocabulary,
+        "arrays": arrays
+    }
+    manifest.update(extra or {})
+
+    with open(os.path.join(staging_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory into place so readers never see a partial artifact
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging_dir, out_dir)
+    return manifest
+
+def read_manifest(artifact_dir):
+    """Reads and validates an artifact's manifest"""
+    try:
+        with open(os.path.join(artifact_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"Cannot read manifest in {artifact_dir}: {e}")
+
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{artifact_dir} is not a {ARTIFACT_FORMAT} artifact")
+    if manifest.get("formatVersion") not in SUPPORTED_FORMAT_VERSIONS:
+        raise ArtifactError(
+            f"Unsupported artifact format version {manifest.get('formatVersion')} "
+            f"(expected one of {SUPPORTED_FORMAT_VERSIONS})"
+        )
+    return manifest
+
+def load_artifact(artifact_dir, verify=True, mmap=True):
+    """
+    Loads an artifact directory into an engine.
+
+    Both full and compressed artifacts (compress_model.py) load here; the
+    manifest records the vocabulary kind and the weights carry their dtype.
+
+    With `mmap` the arrays are memory-mapped read-only, so every process
+    loading the same artifact shares one copy of the pages through the OS
+    page cache.
+
+    Args:
+        artifact_dir (str): Directory written by export_pipeline
+        verify (bool): Check every array file against its manifest checksum
+        mmap (bool): Memory-map the arrays instead of reading them into memory
+
+    Returns:
+        SparseEmotionEngine: Engine backed by the artifact's arrays
+    """
+    manifest = read_manifest(artifact_dir)
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        spec = manifest["arrays"][name]
+        path = os.path.join(artifact_dir, spec["file"])
+
+        if verify and _sha256(path) != spec["sha256"]:
+            raise ArtifactError(f"Checksum mismatch for {path}")
+
+        array = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if array.dtype.str != spec["dtype"] or list(array.shape) != spec["shape"]:
+            raise ArtifactError(f"{path} does not match its manifest entry")
+        arrays[name] = array
+
+    return SparseEmotionEngine(
+        terms=arrays["terms"],
+        weights=arrays["weights"],
+        intercept=np.array(arrays["intercept"]),
+        classes=manifest["classes"],
+        lowercase=manifest["lowercase"],
+        token_pattern=manifest["tokenPattern"],
+        version=manifest["modelVersion"],
+        vocabulary=manifest.get("vocabulary", "terms")
+    )
+
+def load_pickled_engine(model_path=MODEL_PATH):
+    """Unpickles the sklearn pipeline and extracts an engine from it"""
+    import joblib
+
+    pipeline = joblib.load(open(model_path, 'rb'))
+    return SparseEmotionEngine.from_pipeline(pipeline, version=_model_version(model_path))
+
+def load_default_engine():
+    """
+    Returns the engine of the model the process currently serves.
+
+    The model is loaded by the process-wide registry (model_registry.py) on
+    first use: the memory-mapped artifact (MOOD_MODEL_ARTIFACT, default
+    ARTIFACT_PATH), or MODEL_PATH unpickled when no artifact has been
+    exported. Every module shares it, so each model is loaded once per
+    process; after a hot reload this returns the new model's engine.
+    """
+    from model_registry import registry
+
+    return registry.current().engine
+
+def _model_version(model_path):
+    """Model version derived from the model file name"""
+    return os.path.splitext(os.path.basename(model_path))[0]
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Command line: export or verify an artifact
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the pickled model as a memory-mappable artifact")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subcommands.add_parser("export", help="Convert a pickled pipeline into an artifact")
+    export_parser.add_argument("--model", default=MODEL_PATH, help="Pickled pipeline to convert")
+    export_parser.add_argument("--out", default=ARTIFACT_PATH, help="Artifact directory to write")
+
+    verify_parser = subcommands.add_parser("verify", help="Check an artifact's checksums and parity with its pickle")
+    verify_parser.add_argument("--artifact", default=ARTIFACT_PATH, help="Artifact directory to check")
+    verify_parser.add_argument("--model", default=MODEL_PATH, help="Pickled pipeline to compare against")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import joblib
+
+        pipeline = joblib.load(open(args.model, 'rb'))
+        manifest = export_pipeline(pipeline, args.out, _model_version(args.model))
+        print(f"Wrote {args.out} (model {manifest['modelVersion']}, format v{manifest['formatVersion']})")
+        for name, spec in manifest["arrays"].items():
+            print(f"  {name:<10} {spec['dtype']:<6} {str(tuple(spec['shape'])):<14} {spec['sha256'][:16]}")
+    else:
+        import joblib
+        from sparse_engine import check_parity
+
+        engine = load_artifact(args.artifact, verify=True)
+        pipeline = joblib.load(open(args.model, 'rb'))
+        result = check_parity(engine, pipeline, [
+            "I'm feeling really happy today!",
+            "This makes me so angry and frustrated",
+            "I'm scared and worried about the future",
+            "I feel sad and lonely"
+        ])
+        print(f"Checksums OK, parity: {result}")
+        sys.exit(0 if result["passed"] else 1)
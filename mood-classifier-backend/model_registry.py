@@ -0,0 +1,566 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class ModelVersion:
+    """
+    One loaded model and whatever the modules derive from it.
+
+    Modules keep their per-model state (parameter mappers, class lookup
+    arrays) here through derived(), so it is built once per model and goes
+    away with it instead of living in module globals.
+    """
+
+    def __init__(self, engine, source, signature, load_seconds):
+        self.engine = engine
+        self.version = engine.version
+        self.source = source
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.warmup_seconds = None
+        self.loaded_at = time.time()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derived(self, name, factory):
+        """
+        Returns factory(engine), built on first use and kept for the life of this model.
+
+        Args:
+            name (str): Key of the derived value (one per module and purpose)
+            factory (callable): Builds the value from the engine
+        """
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = factory(self.engine)
+        return value
+
+    def info(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loadedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.loaded_at)),
+            "loadSeconds": self.load_seconds,
+            "warmupSeconds": self.warmup_seconds
+        }
+
+def default_source():
+    """
+    The model the process should serve: the artifact named by
+    MOOD_MODEL_ARTIFACT (default ARTIFACT_PATH), or the pickled MODEL_PATH
+    when no artifact has been exported.
+    """
+    from model_artifact import ARTIFACT_PATH, MODEL_PATH
+
+    artifact_dir = os.environ.get('MOOD_MODEL_ARTIFACT', ARTIFACT_PATH)
+    return artifact_dir if os.path.isdir(artifact_dir) else MODEL_PATH
+
+def source_signature(source):
+    """
+    Identifies the model files at `source` as they are right now.
+
+    The path is resolved, so repointing a symlink counts as a change, and the
+    manifest (or pickle) stat changes whenever an export replaces the files.
+
+    Raises:
+        OSError: If the files are missing (or being replaced)
+    """
+    from model_artifact import MANIFEST_FILE
+
+    path = os.path.realpath(source)
+    stat = os.stat(os.path.join(path, MANIFEST_FILE) if os.path.isdir(path) else path)
+    return (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def load_source(source):
+    """Loads an artifact directory (memory-mapped) or a pickled pipeline into an engine"""
+    from model_artifact import load_artifact, load_pickled_engine
+
+    if os.path.isdir(source):
+        return load_artifact(source)
+    return load_pickled_engine(source)
+
+class ModelRegistry:
+    """
+    Every model the process has loaded, and the one it currently serves.
+
+    Each model source is loaded once; the most recently used keep_versions
+    models stay loaded (the active one always does), so switching back to
+    the previous version does not load it again.
+
+    activate() loads a model, warms it up and only then swaps it in with a
+    single reference assignment, so requests never see a half-loaded model.
+    A request pins the model it started with (pinned()), and every
+    current() call on that thread returns the same model until the request
+    ends, even if a swap happens meanwhile. Pinned models stay alive after
+    being evicted until their last request finishes.
+
+    Processes serving side by side (gunicorn workers) share a selection
+    file: publish() records a model picked in one of them, and check() makes
+    the others switch to it too, so they all serve the same version.
+    """
+
+    def __init__(self, keep_versions=2, loader=load_source, selection_path=None):
+        """
+        Args:
+            keep_versions (int): Models kept loaded, including the active one
+            loader (callable): Loads a model source into an engine
+            selection_path (str): JSON file naming the model every process should
+                serve (see publish()); None keeps model choices to this process
+        """
+        self.keep_versions = max(1, keep_versions)
+        self.loader = loader
+        self.selection_path = selection_path
+        self.swaps = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.watch_interval = 0.0
+        self._models = OrderedDict()
+        self._active = None
+        self._seen = None
+        self._selection_seen = None
+        self._local = threading.local()
+        self._watcher = None
+        self._init_locks()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @classmethod
+    def from_env(cls):
+        """Builds a registry configured by MOOD_MODEL_KEEP_VERSIONS and MOOD_MODEL_SELECTION"""
+        return cls(
+            keep_versions=int(os.environ.get('MOOD_MODEL_KEEP_VERSIONS', '2')),
+            selection_path=os.environ.get('MOOD_MODEL_SELECTION', 'data/model_selection.json') or None
+        )
+
+    @property
+    def active(self):
+        """The model served to new requests, or None before the first load (never blocks)"""
+        return self._active
+
+    def current(self):
+        """
+        The model this thread should use: the one pinned by the running
+        request, else the active model (loading the default model on first use).
+
+        Returns:
+            ModelVersion
+        """
+        model = getattr(self._local, "model", None)
+        if model is not None:
+            return model
+        model = self._active
+        if model is None:
+            model = self._activate_default()
+        return model
+
+    @contextlib.contextmanager
+    def pinned(self, model=None):
+        """
+        Makes current() return `model` (default: current()) on this thread until the block exits.
+
+        Yields:
+            ModelVersion: The pinned model
+        """
+        previous = getattr(self._local, "model", None)
+        model = model or self.current()
+        self._local.model = model
+        try:
+            yield model
+        finally:
+            self._local.model = previous
+
+    def get(self, version):
+        """A loaded model by version, or None"""
+        with self._lock:
+            for model in reversed(self._models.values()):
+                if model.version == version:
+                    return model
+        return None
+
+    def load(self, source=None):
+        """
+        Returns the model at `source` (default: default_source()), loading it
+        only if these files have not been loaded yet.
+
+        Returns:
+            ModelVersion
+        """
+        source = source or default_source()
+        with self._reload_lock:
+            signature = source_signature(source)
+            with self._lock:
+                model = self._models.get(signature)
+                if model is not None:
+                    self._models.move_to_end(signature)
+                    return model
+
+            started = time.perf_counter()
+            engine = self.loader(source)
+            model = ModelVersion(engine, source, signature, time.perf_counter() - started)
+            with self._lock:
+                self._models[signature] = model
+                self._trim(model)
+            return model
+
+    def activate(self, source=None, warmup_fn=None):
+        """
+        Loads the model at `source` (default: default_source()), warms it up
+        and makes it the active model.
+
+        Args:
+            source (str): Artifact directory or pickled pipeline
+            warmup_fn (callable): Called with the new model before the swap;
+                an exception aborts the swap and the old model keeps serving
+
+        Returns:
+            dict: The previous and new versions and whether a swap happened
+        """
+        with self._reload_lock:
+            return self._swap(self.load(source), warmup_fn)
+
+    def rollback(self, version, warmup_fn=None):
+        """
+        Makes an already loaded model version the active one again.
+
+        Raises:
+            KeyError: If no loaded model has this version
+        """
+        with self._reload_lock:
+            model = self.get(version)
+            if model is None:
+                raise KeyError(f"Model version {version} is not loaded")
+            return self._swap(model, warmup_fn)
+
+    def publish(self, model):
+        """
+        Records `model` in the selection file, so every process sharing it switches to this model on its next check().
+
+        The selection holds until default_source()'s files change: from
+        then on the processes follow those files again.
+        """
+        if not self.selection_path:
+            return
+        directory = os.path.dirname(self.selection_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        selection = {
+            "source": os.path.abspath(model.source),
+            "version": model.version,
+            "defaultSignature": self._default_signature()
+        }
+        # Written aside and renamed over, so readers never see half a file
+        temporary = f"{self.selection_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(selection, f)
+        os.replace(temporary, self.selection_path)
+        self._selection_seen = self._selection_signature()
+
+    def check(self, warmup_fn=None):
+        """
+        Activates the model another process published (see publish()), or
+        default_source() if its files changed since they were last seen.
+
+        Only the default source is watched: a model activated from elsewhere
+        (say through the admin endpoint) stays active until the watched files change.
+
+        Failures are recorded (and printed) rather than raised; the active
+        model keeps serving and the same files are not retried.
+
+        Returns:
+            dict | None: activate()'s result, or None when nothing changed or the reload failed
+        """
+        if self._active is None:
+            # The first load is current()'s job (and the server's startup warmup)
+            return None
+        signature = self._selection_signature()
+        if signature != self._selection_seen:
+            self._selection_seen = signature
+            selection = self._read_selection()
+            if selection is not None:
+                # Changes of the default source from before the selection are already settled by it
+                self._seen = selection["defaultSignature"]
+                return self._follow(selection, warmup_fn)
+
+        source = default_source()
+        try:
+            signature = source_signature(source)
+        except OSError:
+            # Missing or halfway through being replaced; look again next time
+            return None
+        if signature == self._seen:
+            return None
+
+        self._seen = signature
+        try:
+            return self.activate(source, warmup_fn)
+        except Exception as e:
+            self.failed_reloads += 1
+            self.last_error = f"{source}: {type(e).__name__}: {e}"
+            print(f"Model reload failed, still serving {self._active.version if self._active else 'nothing'}: "
+                  f"{self.last_error}")
+            return None
+
+    def watch(self, interval, warmup_fn=None):
+        """
+        Polls the model files every `interval` seconds on a daemon thread and
+        activates them when they change (see check()). interval <= 0 disables it.
+
+        Call again after a fork: threads do not survive it.
+        """
+        if interval <= 0 or self._watcher is not None:
+            return
+        self.watch_interval = interval
+        self._watcher = threading.Thread(
+            target=self._run_watcher, args=(interval, warmup_fn), name="model-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def status(self):
+        with self._lock:
+            loaded = [dict(model.info(), active=model is self._active) for model in self._models.values()]
+        return {
+            "activeVersion": self._active.version if self._active else None,
+            "loaded": loaded,
+            "keepVersions": self.keep_versions,
+            "swaps": self.swaps,
+            "failedReloads": self.failed_reloads,
+            "lastError": self.last_error,
+            "watchIntervalSeconds": self.watch_interval if self._watcher is not None else 0.0
+        }
+
+    def _activate_default(self):
+        with self._reload_lock:
+            if self._active is None:
+                # A process started after a publish() serves the published model
+                self._selection_seen = self._selection_signature()
+                selection = self._read_selection()
+                model = None
+                if selection is not None:
+                    try:
+                        model = self._load_selected(selection)
+                        self._seen = selection["defaultSignature"]
+                    except Exception as e:
+                        print(f"Published model {selection['source']} failed to load, serving the default: "
+                              f"{type(e).__name__}: {e}")
+                if model is None:
+                    model = self.load()
+                    self._seen = model.signature
+                self._active = model
+        return self._active
+
+    def _follow(self, selection, warmup_fn):
+        # check()'s half for a published model; failures are recorded like theirs
+        try:
+            with self._reload_lock:
+                return self._swap(self._load_selected(selection), warmup_fn)
+        except Exception as e:
+            self.failed_reloads += 1
+            self.last_error = f"{selection['source']}: {type(e).__name__}: {e}"
+            print(f"Following the published model failed, still serving {self._active.version}: {self.last_error}")
+            return None
+
+    def _load_selected(self, selection):
+        model = self.load(selection["source"])
+        if model.version != selection["version"]:
+            # The files were replaced since: do not serve a version nobody picked
+            raise ValueError(f"{selection['source']} now holds version {model.version}, "
+                             f"not the published {selection['version']}")
+        return model
+
+    def _default_signature(self):
+        try:
+            return source_signature(default_source())
+        except OSError:
+            return None
+
+    def _selection_signature(self):
+        if not self.selection_path:
+            return None
+        try:
+            stat = os.stat(self.selection_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _read_selection(self):
+        """The published selection, or None when there is none or it no longer applies"""
+        if not self.selection_path:
+            return None
+        try:
+            with open(self.selection_path) as f:
+                selection = json.load(f)
+            selection["defaultSignature"] = tuple(selection["defaultSignature"] or ()) or None
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        if selection["defaultSignature"] != self._default_signature():
+            # The default source changed after the publish: it takes over again
+            return None
+        return selection
+
+    def _swap(self, model, warmup_fn):
+        previous = self._active
+        result = {
+            "previousVersion": previous.version if previous else None,
+            "modelVersion": model.version,
+            "source": model.source,
+            "loadSeconds": model.load_seconds
+        }
+        if model is previous:
+            return dict(result, swapped=False)
+        if previous is not None and model.version == previous.version:
+            # Caches and ETags are keyed on the version, so two models must not share one
+            self._discard(model)
+            raise ValueError(f"Model version {model.version} is already active (from {previous.source}); "
+                             f"export the new model under a new version")
+
+        if warmup_fn is not None:
+            started = time.perf_counter()
+            try:
+                warmup_fn(model)
+            except Exception:
+                self._discard(model)
+                raise
+            model.warmup_seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._active = model
+            self._models.move_to_end(model.signature)
+            self._trim(model)
+        if previous is not None:
+            self.swaps += 1
+        return dict(result, swapped=True, warmupSeconds=model.warmup_seconds)
+
+    def _trim(self, keep):
+        # Drops the least recently used models beyond keep_versions, never the active one or `keep`.
+        # Caller holds self._lock.
+        for signature, model in list(self._models.items()):
+            if len(self._models) <= self.keep_versions:
+                break
+            if model is not self._active and model is not keep:
+                del self._models[signature]
+
+    def _discard(self, model):
+        with self._lock:
+            if self._models.get(model.signature) is model:
+                del self._models[model.signature]
+
+    def _run_watcher(self, interval, warmup_fn):
+        while True:
+            time.sleep(interval)
+            self.check(warmup_fn)
+
+    def _init_locks(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.RLock()
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would stay locked forever in the child
+        self._init_locks()
+        self._watcher = None
+
+# Shared by every module in the process
+registry = ModelRegistry.from_env()
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    print("=" * 60)
+    print("MODEL REGISTRY")
+    print("=" * 60)
+
+    from compress_model import compress_engine
+    from model_artifact import export_engine
+
+    base = registry.current()
+    print(f"Serving {base.version} from {base.source} (loaded in {base.load_seconds * 1000:.1f} ms)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        candidate, _ = compress_engine(base.engine, "float32")
+        path = os.path.join(directory, "candidate.moodmodel")
+        export_engine(candidate, path)
+
+        stop = threading.Event()
+        mismatches = []
+        served = []
+
+        def request_loop():
+            # Every "request" checks that all its calls saw one model
+            while not stop.is_set():
+                with registry.pinned() as model:
+                    first = registry.current().engine
+                    time.sleep(0.0005)
+                    if registry.current().engine is not first or model.engine is not first:
+                        mismatches.append(model.version)
+                    served.append(model.version)
+
+        threads = [threading.Thread(target=request_loop) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+
+        for step in range(10):
+            time.sleep(0.02)
+            target = path if step % 2 == 0 else base.source
+            result = registry.activate(target, warmup_fn=lambda model: model.engine.predict_proba(["warm"]))
+            print(f"Swap {step}: {result['previousVersion']} -> {result['modelVersion']} (swapped: {result['swapped']})")
+        time.sleep(0.02)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        status = registry.status()
+        print(f"Requests served: {len(served)} over {len(set(served))} versions, "
+              f"{len(mismatches)} saw a model change mid-request")
+        print(f"Loaded models: {[model['version'] for model in status['loaded']]} (swaps: {status['swaps']})")
+
+        try:
+            registry.activate(path, warmup_fn=lambda model: 1 / 0)
+        except ZeroDivisionError:
+            pass
+        print(f"Failed warmup left {registry.active.version} active")
+
+        # Two workers sharing a selection file: a model picked in one is served by both,
+        # and by a worker started afterwards, until the watched default files change
+        link = os.path.join(directory, "current.moodmodel")
+        os.symlink(os.path.realpath(base.source), link)
+        os.environ['MOOD_MODEL_ARTIFACT'] = link
+        selection_path = os.path.join(directory, "selection.json")
+        workers = [ModelRegistry(selection_path=selection_path) for _ in range(2)]
+        versions = []
+        for worker in workers:
+            worker.current()
+        workers[0].activate(path)
+        workers[0].publish(workers[0].active)
+        workers[1].check()
+        versions.append([worker.active.version for worker in workers])
+        workers[0].rollback(base.version)
+        workers[0].publish(workers[0].active)
+        workers[1].check()
+        versions.append([worker.active.version for worker in workers])
+        workers[1].activate(path)
+        workers[1].publish(workers[1].active)
+        workers[0].check()
+        versions.append([worker.current().version for worker in workers + [ModelRegistry(selection_path=selection_path)]])
+        following = versions == [[candidate.version] * 2, [base.version] * 2, [candidate.version] * 3]
+        print(f"Versions served after each published reload: {versions}")
+
+        # Repointing the watched symlink overrides the earlier published choice everywhere
+        shutil.copytree(os.path.realpath(base.source), os.path.join(directory, "copy.moodmodel"))
+        os.remove(link)
+        os.symlink(os.path.join(directory, "copy.moodmodel"), link)
+        for worker in workers:
+            worker.check()
+        late = ModelRegistry(selection_path=selection_path).current()
+        following = following and [worker.active.version for worker in workers] + [late.version] == [base.version] * 3
+        print(f"After the symlink changed: {[worker.active.version for worker in workers] + [late.version]}")
+
+    print("=" * 60)
+    if mismatches or len(status["loaded"]) != 2 or not following:
+        raise SystemExit("Registry check failed")
+    print("Every request finished on the model it started with, and every worker follows a published reload")
@@ -0,0 +1,543 @@
+import bisect
+import builtins
+import operator
+
+import numpy as np
+
+# ----------------------------------------------------------------------
+# Lookup tables (flower art emotion names) shared by the vectorized mapper
+# and the scalar helpers in flower_integration_bridge
+# ----------------------------------------------------------------------
+
+# Model classes -> flower art emotions (anything else maps to "neutral")
+EMOTION_MAPPING = {
+    "joy": "joy",
+    "happy": "happy",
+    "sadness": "sad",
+    "fear": "fear",
+    "anger": "anger",
+    "disgust": "disgust",
+    "shame": "shame",
+    "surprise": "surprise",
+    "neutral": "neutral"
+}
+
+HEARTBEAT_BPM = {
+    "happy": 85, "joy": 95, "sad": 55, "fear": 110,
+    "anger": 100, "disgust": 70, "shame": 65, "surprise": 90, "neutral": 72
+}
+HEARTBEAT_INTENSITY = {
+    "happy": 0.6, "joy": 0.8, "sad": 0.2, "fear": 0.9,
+    "anger": 0.7, "disgust": 0.4, "shame": 0.3, "surprise": 0.7, "neutral": 0.4
+}
+ROTATION_INTENSITY = {
+    "happy": 0.8, "joy": 1.0, "sad": 0.01, "fear": 0.6,
+    "anger": 0.9, "disgust": 0.4, "shame": 0.3, "surprise": 0.7, "neutral": 0.2
+}
+CLOCKWISE_EMOTIONS = ("happy", "joy", "surprise", "neutral")
+BEE_WING_SPEED = {
+    "happy": 18, "joy": 22, "sad": 8, "fear": 25,
+    "anger": 20, "disgust": 12, "shame": 10, "surprise": 19, "neutral": 15
+}
+
+# Connector color by trading activity: below 0.3, below 0.6, below 0.8, the rest
+TRADING_COLOR_THRESHOLDS = (0.3, 0.6, 0.8)
+TRADING_COLORS = ("#FF0000", "#FFA500", "#00FF00", "#00FFFF")  # Red, orange, green, cyan
+
+# Bee flight range by streak days: below 3 (no bee), 3-7, 7-14, 14-21, 21+
+BEE_RANGE_THRESHOLDS = (3, 7, 14, 21)
+BEE_RANGES = (
+    None,
+    {"xRange": {"min": -18, "max": 18}, "zRange": {"min": -18, "max": 18}, "yRange": {"min": 2.2, "max": 20}},
+    {"xRange": {"min": -10, "max": 10}, "zRange": {"min": -10, "max": 10}, "yRange": {"min": 2.2, "max": 15}},
+    {"xRange": {"min": -5, "max": 5}, "zRange": {"min": -5, "max": 5}, "yRange": {"min": 2.2, "max": 10}},
+    {"xRange": {"min": -1.5, "max": 1.5}, "zRange": {"min": -1.5, "max": 1.5}, "yRange": {"min": 2.2, "max": 5}}
+)
+
+# flower_art_api colors and color temperature groups (model class names)
+EMOTION_COLORS = {
+    "joy": "#FFD700",      # Golden yellow
+    "happy": "#FF69B4",    # Hot pink
+    "sadness": "#4169E1",  # Royal blue
+    "fear": "#800080",     # Purple
+    "anger": "#FF4500",    # Orange red
+    "disgust": "#228B22",  # Forest green
+    "shame": "#FFB6C1",    # Light pink
+    "surprise": "#FF1493", # Deep pink
+    "neutral": "#C0C0C0"   # Silver
+}
+WARM_EMOTIONS = ("joy", "happy", "anger", "surprise")
+COOL_EMOTIONS = ("sadness", "fear", "shame", "neutral")
+
+# Below this many rows the formulas run on Python numbers: numpy's per-call
+# overhead would cost more than the arithmetic itself
+SMALL_BATCH_ROWS = 8
+
+class ParameterMapper:
+    """
+    Derives every flower parameter for N rows at once.
+
+    derive() turns an (N x classes) probability matrix and per-row
+    streak/community/trading values into whole columns, using per-class
+    lookup vectors and searchsorted bucketing instead of per-row Python.
+    flower_art_rows() and flower_api_rows() are the views that build the
+    dicts returned by flower_integration_bridge and flower_art_api.
+
+    The formulas are written once (_formulas) and evaluated either over
+    numpy columns or, for batches too small to amortize numpy's per-call
+    overhead, over plain Python numbers. Both follow the original scalar
+    code operation for operation, including Python's int()/min()/max()
+    semantics, so results are identical to it, not just close.
+    """
+
+    def __init__(self, classes):
+        self.classes = [str(label) for label in classes]
+        mapped = [EMOTION_MAPPING.get(label, "neutral") for label in self.classes]
+
+        self.mapped_emotions = mapped
+        self.colors = [EMOTION_COLORS.get(label, "#C0C0C0") for label in self.classes]
+
+        # Per-class lookup vectors, indexed by the predicted class
+        self.tables = {
+            "bpm": np.array([HEARTBEAT_BPM.get(e, 72) for e in mapped], dtype=np.float64),
+            "heartbeat": np.array([HEARTBEAT_INTENSITY.get(e, 0.4) for e in mapped], dtype=np.float64),
+            "rotation": np.array([ROTATION_INTENSITY.get(e, 0.2) for e in mapped], dtype=np.float64),
+            "direction": np.array([1 if e in CLOCKWISE_EMOTIONS else -1 for e in mapped], dtype=np.int64),
+            "wing": np.array([BEE_WING_SPEED.get(e, 15) for e in mapped], dtype=np.float64),
+            # 1 = warm, -1 = cool, 0 = neither
+            "temperature": np.array(
+                [1 if label in WARM_EMOTIONS else -1 if label in COOL_EMOTIONS else 0 for label in self.classes],
+                dtype=np.int64
+            )
+        }
+        self.table_lists = {name: table.tolist() for name, table in self.tables.items()}
+
+    def derive(self, probabilities, streak_days=None, community_mood=None, trading_activity=None):
+        """
+        Computes every derived value as numpy columns.
+
+        Args:
+            probabilities (numpy.ndarray): (N x classes) probabilities, columns ordered as `classes`
+            streak_days, community_mood, trading_activity: Per-row numbers (defaults 0, 0.5, 0.5)
+
+        Returns:
+            dict: Column name -> array of length N
+        """
+        p = np.atleast_2d(probabilities)
+        n = len(p)
+        rows = np.arange(n)
+
+        # Same expressions as SparseEmotionEngine.describe
+        entropy = -np.sum(p * np.log(p + 1e-10), axis=1)
+        order = np.argsort(-p, axis=1, kind="stable")
+        top, second = order[:, 0], order[:, 1]
+        confidence = p[rows, top]
+        second_confidence = p[rows, second]
+
+        columns = {
+            "probabilities": p,
+            "order": order,
+            "top": top,
+            "second": second,
+            "confidence": confidence,
+            "secondConfidence": second_confidence,
+            "minProbability": np.min(p, axis=1),
+            "entropy": entropy
+        }
+        columns.update(self._formulas(
+            _ArrayOps, self.tables, top, confidence, second_confidence, entropy,
+            _column(streak_days, n, 0), _column(community_mood, n, 0.5), _column(trading_activity, n, 0.5)
+        ))
+        return columns
+
+    def _columns(self, probabilities, streak_days=None, community_mood=None, trading_activity=None):
+        """derive() as lists of Python values, ready for the row views"""
+        p = np.atleast_2d(probabilities)
+        n = len(p)
+        if n == 0 or n >= SMALL_BATCH_ROWS:
+            columns = self.derive(p, streak_days, community_mood, trading_activity)
+            return {name: column.tolist() for name, column in columns.items()}
+
+        entropy = (-np.sum(p * np.log(p + 1e-10), axis=1)).tolist()
+        order = np.argsort(-p, axis=1, kind="stable").tolist()
+        values = p.tolist()
+        streak_days = [0] * n if streak_days is None else streak_days
+        community_mood = [0.5] * n if community_mood is None else community_mood
+        trading_activity = [0.5] * n if trading_activity is None else trading_activity
+
+        columns = {
+            "probabilities": values,
+            "order": order,
+            "top": [row_order[0] for row_order in order],
+            "second": [row_order[1] for row_order in order],
+            "confidence": [row[row_order[0]] for row, row_order in zip(values, order)],
+            "secondConfidence": [row[row_order[1]] for row, row_order in zip(values, order)],
+            "minProbability": [min(row) for row in values],
+            "entropy": entropy
+        }
+        per_row = [
+            self._formulas(_ScalarOps, self.table_lists, top, confidence, second_confidence, row_entropy,
+                           streak, community, trading)
+            for top, confidence, second_confidence, row_entropy, streak, community, trading in zip(
+                columns["top"], columns["confidence"], columns["secondConfidence"], entropy,
+                streak_days, community_mood, trading_activity)
+        ]
+        columns.update(zip(per_row[0], zip(*(row.values() for row in per_row))))
+        return columns
+
+    @staticmethod
+    def _formulas(ops, tables, top, confidence, second_confidence, entropy, streak, community, trading):
+        """
+        Every derived parameter, for whole columns (ops=_ArrayOps) or one row (ops=_ScalarOps).
+
+        Where Python's max()/min() would return an int bound (max(0, x) with x <= 0,
+        min(33, x) with x >= 33), the *Is* flag columns tell the row views to emit
+        the int, as the original code did.
+        """
+        gap = confidence - second_confidence
+        petal_rotation = ops.min(0.5, entropy * 0.3)
+        stalk = (10 + (confidence * 10)) + ((community - 0.5) * 5) + ops.min(streak * 0.5, 10)
+        temperature = tables["temperature"][top]
+
+        return {
+            "confidenceGap": gap,
+            # flower_integration_bridge
+            "layerCount": ops.max(1, ops.min(10, ops.trunc(entropy * 3) + 1)),
+            "petalCount": ops.max(3, ops.min(20, ops.trunc(entropy * 8) + 6)),
+            "baseLayerRadius": 12 + (confidence * 8),
+            "layerRadiusDecrease": 2 + (gap * 3),
+            "petalRotation": ops.max(0, petal_rotation),
+            "petalRotationIsZero": ops.not_(petal_rotation > 0),
+            "geometrySegments": ops.max(10, ops.min(30, ops.trunc(entropy * 15) + 10)),
+            "openCloseSpeed": ops.max(0.1, ops.min(1.0, 1.0 - gap)),
+            "bpm": ops.trunc(tables["bpm"][top] * (1.0 + (confidence - 0.5) * 0.4)),
+            "heartbeatIntensity": ops.min(0.9, tables["heartbeat"][top] * (1.0 + confidence * 0.5)),
+            "rotationIntensity": ops.min(1.0, tables["rotation"][top] * (1.0 + confidence * 0.5)),
+            "rotationDirection": tables["direction"][top],
+            "stalkLength": ops.max(8.8, ops.min(33, stalk)),
+            "stalkLengthIsMax": ops.not_(stalk < 33),
+            "tradingColor": ops.bucket(TRADING_COLOR_THRESHOLDS, trading),
+            "wingSpeed": ops.max(5, ops.min(30, ops.trunc(tables["wing"][top] * (1.0 + (confidence - 0.5) * 0.6)))),
+            "beeAppears": streak >= 3,
+            # NaN streaks never reach a bucket, as with the original `>=` chain
+            "beeRange": ops.where(streak >= BEE_RANGE_THRESHOLDS[0], ops.bucket(BEE_RANGE_THRESHOLDS, streak), 0),
+            "intensityMultiplier": ops.max(0.1, ops.min(1.0, confidence * 1.5)),
+            # flower_art_api
+            "flowerSize": confidence * 200 + 50,
+            "petalCountApi": ops.trunc(entropy * 10) + 5,
+            "animationSpeed": 1.0 - gap,
+            "colorTemperature": ops.where(
+                temperature > 0, 0.5 + (confidence * 0.5), ops.where(temperature < 0, -0.5 - (confidence * 0.5), 0.0)
+            ),
+            "opacity": confidence * 0.8 + 0.2,
+            "rotationSpeed": entropy * 0.5,
+            "pulseRate": confidence * 2,
+            "detailLevel": ops.trunc(entropy * 5) + 1
+        }
+
+    def flower_art_rows(self, probabilities, streak_days, community_mood, trading_activity):
+        """
+        Builds the flower_integration_bridge parameter dicts.
+
+        Args:
+            probabilities (numpy.ndarray): (N x classes) probabilities
+            streak_days, community_mood, trading_activity (list): Per-row numbers,
+                echoed back exactly as given
+
+        Returns:
+            list[dict]: One parameter dict per row
+        """
+        columns = self._columns(probabilities, streak_days, community_mood, trading_activity)
+        classes = self.classes
+        mapped = self.mapped_emotions
+        petal_rotation_zero = columns["petalRotationIsZero"]
+        stalk_max = columns["stalkLengthIsMax"]
+
+        rows = []
+        for (i, top, row, order, confidence, entropy, gap, layer_count, petal_count, base_radius, radius_decrease,
+             petal_rotation, segments, open_close, bpm, heartbeat_intensity, rotation_intensity, direction,
+             stalk_length, trading_color, wing_speed, bee_appears, bee_range, intensity_multiplier) in zip(
+                range(len(columns["top"])), columns["top"], columns["probabilities"], columns["order"],
+                columns["confidence"], columns["entropy"], columns["confidenceGap"], columns["layerCount"],
+                columns["petalCount"], columns["baseLayerRadius"], columns["layerRadiusDecrease"],
+                columns["petalRotation"], columns["geometrySegments"], columns["openCloseSpeed"], columns["bpm"],
+                columns["heartbeatIntensity"], columns["rotationIntensity"], columns["rotationDirection"],
+                columns["stalkLength"], columns["tradingColor"], columns["wingSpeed"], columns["beeAppears"],
+                columns["beeRange"], columns["intensityMultiplier"]):
+
+            streak = streak_days[i]
+            sorted_emotions = [(classes[c], row[c]) for c in order]
+            bee_ranges = BEE_RANGES[bee_range]
+
+            rows.append({
+                "currentEmotion": mapped[top],
+                "confidence": confidence,
+                "confidencePercentage": confidence * 100,
+                "petalParams": {
+                    "layerCount": layer_count,
+                    "petalCount": petal_count,
+                    "baseLayerRadius": base_radius,
+                    "layerRadiusDecrease": radius_decrease,
+                    "petalRotation": 0 if petal_rotation_zero[i] else petal_rotation,
+                    "layerRotations": [0, 0],
+                    "layerOffsets": [0, 0],
+                    "geometrySegments": segments,
+                    "geometryPhiStart": np.pi / 3,
+                    "geometryPhiLength": np.pi / 3,
+                    "geometryThetaStart": 0,
+                    "geometryThetaLength": np.pi
+                },
+                "petalOpenCloseParams": {
+                    "minOpenAngle": 0,
+                    "maxOpenAngle": 90,
+                    "openCloseSpeed": open_close,
+                    "individualLayerControl": True,
+                    "layerOpenCloseRanges": [
+                        {"min": 0, "max": 90},
+                        {"min": 0, "max": 90}
+                    ]
+                },
+                "heartbeatSettings": {
+                    "bpm": bpm,
+                    "intensity": heartbeat_intensity
+                },
+                "heartbeatParams": {
+                    "pulseUpdateRate": 0.02,
+                    "dualPulseEnabled": True,
+                    "secondaryPulseIntensity": 0.3,
+                    "glowIntensityRange": {"min": 0.2, "max": 0.9},
+                    "bpmRange": {"min": 55, "max": 110}
+                },
+                "moodSettings": {
+                    "intensity": rotation_intensity,
+                    "direction": direction
+                },
+                "rotationParams": {
+                    "rotationUpdateRate": 0.02,
+                    "alternatingEnabled": True,
+                    "individualLayerRotation": True,
+                    "rotationIntensityRange": {"min": 0.01, "max": 1.0},
+                    "directionOptions": {"clockwise": 1, "counterclockwise": -1}
+                },
+                "stalkParams": {
+                    "baseLength": 10,
+                    "minLength": 8.8,
+                    "maxLength": 33,
+                    "communityMoodThreshold": 0.7,
+                    "communityMoodMultiplier": 2.0,
+                    "growthSpeed": 0.1,
+                    "decaySpeed": 0.05,
+                    "currentLength": 33 if stalk_max[i] else stalk_length
+                },
+                "connectorParams": {
+                    "baseColor": "#C0C0C0",
+                    "tradingActivityColors": {
+                        "low": "#FF0000",
+                        "medium": "#FFA500",
+                        "high": "#00FF00",
+                        "veryHigh": "#00FFFF"
+                    },
+                    "tradingActivityThresholds": {
+                        "low": 0.3,
+                        "medium": 0.6,
+                        "high": 0.8
+                    },
+                    "colorTransitionSpeed": 0.1,
+                    "currentColor": TRADING_COLORS[trading_color]
+                },
+                "beeParams": {
+                    "baseScale": 1.11,
+                    "basePosition": {"x": 0, "y": 2.1, "z": 0},
+                    "wingSpeed": wing_speed,
+                    "wingFlapRange": 0.9,
+                    "wingFlapIntensity": 0.6,
+                    "appearanceThreshold": 3,
+                    "flightBobSpeed": 1.2,
+                    "flightBobAmplitude": 0.08,
+                    "rotationSpeed": 0.3,
+                    "rotationAmplitude": 0.08,
+                    "shouldAppear": bee_appears
+                },
+                "beeStreakRanges": None if bee_ranges is None else copy_range(bee_ranges),
+                "streakParams": {
+                    "goodMoodThreshold": 0.7,
+                    "streakDecayRate": 0.1,
+                    "maxStreakDays": 30,
+                    "streakMultiplier": 1.5,
+                    "currentStreakDays": streak,
+                    "streakFeatures": {
+                        "beeAppearance": True,
+                        "beeRangeControl": True,
+                        "stalkGrowth": True,
+                        "glowIntensity": True,
+                        "rotationSpeed": True
+                    }
+                },
+                "communityParams": {
+                    "memberCount": 0,
+                    "averageMood": community_mood[i],
+                    "positiveMoodThreshold": 0.7,
+                    "moodUpdateFrequency": 3600000,
+                    "stalkGrowthFactor": 0.1
+                },
+                "tradingParams": {
+                    "tradingVolume": 0,
+                    "tradingVolumeThreshold": 100,
+                    "tradingActivityScore": trading_activity[i],
+                    "activityUpdateFrequency": 300000,
+                    "colorTransitionSpeed": 0.1
+                },
+                "mlParams": {
+                    "complexityEntropy": entropy,
+                    "confidenceGap": gap,
+                    "secondEmotion": sorted_emotions[1][0],
+                    "secondConfidence": sorted_emotions[1][1],
+                    "emotionProbabilities": dict(zip(classes, row)),
+                    "sortedEmotions": sorted_emotions,
+                    "intensityMultiplier": intensity_multiplier
+                }
+            })
+        return rows
+
+    def flower_api_rows(self, probabilities):
+        """
+        Builds the flower_art_api parameter dicts.
+
+        Args:
+            probabilities (numpy.ndarray): (N x classes) probabilities
+
+        Returns:
+            list[dict]: One parameter dict per row
+        """
+        columns = self._columns(probabilities)
+        classes = self.classes
+        colors = self.colors
+
+        rows = []
+        for (top, second, row, order, max_prob, min_prob, second_confidence, ent, conf_gap, size, petals, animation,
+             temperature, opacity, rotation, pulse, detail) in zip(
+                columns["top"], columns["second"], columns["probabilities"], columns["order"],
+                columns["confidence"], columns["minProbability"], columns["secondConfidence"], columns["entropy"],
+                columns["confidenceGap"], columns["flowerSize"], columns["petalCountApi"], columns["animationSpeed"],
+                columns["colorTemperature"], columns["opacity"], columns["rotationSpeed"], columns["pulseRate"],
+                columns["detailLevel"]):
+
+            dominant_emotion = classes[top]
+            second_emotion = classes[second]
+            rows.append({
+                # Primary Controls
+                "dominant_emotion": dominant_emotion,
+                "confidence_score": max_prob,
+                "confidence_percentage": max_prob * 100,
+
+                # Visual Controls
+                "flower_size": size,
+                "petal_count": petals,
+                "color_intensity": max_prob,
+                "animation_speed": animation,
+
+                # Color Controls
+                "primary_color": colors[top],
+                "color_temperature": temperature,
+                "opacity": opacity,
+
+                # Secondary Controls
+                "secondary_emotion": second_emotion,
+                "secondary_confidence": second_confidence,
+                "secondary_color": colors[second],
+                "complexity_level": ent,
+                "stability_factor": conf_gap,
+
+                # Animation Controls
+                "rotation_speed": rotation,
+                "pulse_rate": pulse,
+                "tremble_intensity": animation,
+
+                # Advanced Controls
+                "emotion_blend": dict(zip(classes, row)),
+                "texture_variation": max_prob - min_prob,
+                "detail_level": detail,
+
+                # Raw Data (for advanced use)
+                "raw_prediction": [dominant_emotion],
+                "raw_probabilities": [row],
+                "sorted_emotions": [(classes[c], row[c]) for c in order]
+            })
+        return rows
+
+def copy_range(ranges):
+    """Fresh copy of a BEE_RANGES entry, so callers may modify their result"""
+    return {axis: dict(bounds) for axis, bounds in ranges.items()}
+
+def _column(values, count, default):
+    if values is None:
+        return np.full(count, default, dtype=np.float64)
+    column = np.asarray(values, dtype=np.float64)
+    if column.shape != (count,):
+        raise ValueError(f"Expected {count} values, got shape {column.shape}")
+    return column
+
+class _ArrayOps:
+    """Formula primitives over numpy columns, with Python's min()/max()/int() semantics"""
+
+    @staticmethod
+    def min(a, b):
+        # min(a, b) is b only when b < a (ties and NaN keep a)
+        return np.where(b < a, b, a)
+
+    @staticmethod
+    def max(a, b):
+        return np.where(b > a, b, a)
+
+    @staticmethod
+    def trunc(values):
+        # int(x) truncates toward zero
+        return np.trunc(values).astype(np.int64)
+
+    @staticmethod
+    def bucket(thresholds, values):
+        return np.searchsorted(thresholds, values, side="right")
+
+    where = staticmethod(np.where)
+    not_ = staticmethod(np.logical_not)
+
+class _ScalarOps:
+    """The same primitives for one row of plain Python numbers"""
+    min = staticmethod(builtins.min)
+    max = staticmethod(builtins.max)
+    trunc = staticmethod(int)
+    bucket = staticmethod(bisect.bisect_right)
+    not_ = staticmethod(operator.not_)
+
+    @staticmethod
+    def where(condition, if_true, if_false):
+        return if_true if condition else if_false
+
+if __name__ == "__main__":
+    import time
+    from model_artifact import load_default_engine
+
+    engine = load_default_engine()
+    mapper = ParameterMapper(engine.class_list)
+
+    print("=" * 60)
+    print("PARAMETER MAPPER")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    for rows in (1, 100, 10000):
+        logits = rng.normal(size=(rows, len(engine.class_list))) * 3
+        probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+        streak = rng.integers(0, 31, rows).tolist()
+        community = rng.random(rows).tolist()
+        trading = rng.random(rows).tolist()
+
+        started = time.perf_counter()
+        mapper.derive(probabilities, streak, community, trading)
+        derive_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        mapper.flower_art_rows(probabilities, streak, community, trading)
+        rows_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{rows:>6} rows: derive {derive_ms:8.2f} ms, build dicts {rows_ms:8.2f} ms")
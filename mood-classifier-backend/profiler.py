@@ -0,0 +1,257 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+class ProfilerBusy(Exception):
+    """A profile is already running in this process"""
+
+def _frame_label(code):
+    # "function (dir/file.py:first line)": one node per function in the flamegraph, ';' kept out
+    path = code.co_filename
+    parts = path.replace("\\", "/").rsplit("/", 2)
+    short = "/".join(parts[-2:]) if len(parts) > 1 else path
+    return f"{code.co_name} ({short}:{code.co_firstlineno})".replace(";", ":")
+
+class SamplingProfiler:
+    """
+    Statistical profiler over sys._current_frames().
+
+    A sampler thread reads the stack of every thread (or only the threads
+    currently serving a request) every `interval` seconds and counts
+    identical stacks. Nothing is hooked into the profiled code, so the cost
+    is the sampler's own work: roughly one stack walk per thread per sample,
+    under 1% of one core at the default 100 Hz.
+
+    Results are collapsed stacks: "root;caller;callee count" lines, as read
+    by flamegraph.pl, speedscope and most flamegraph viewers.
+    """
+
+    def __init__(self, max_seconds=30.0):
+        """
+        Args:
+            max_seconds (float): Longest profile a caller may ask for
+        """
+        self.max_seconds = max_seconds
+        self.running = False
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._request_threads = set()
+
+    @classmethod
+    def from_env(cls):
+        """Builds a profiler configured by MOOD_PROFILE_MAX_SECONDS"""
+        return cls(max_seconds=float(os.environ.get('MOOD_PROFILE_MAX_SECONDS', '30')))
+
+    def request_started(self):
+        """Marks the calling thread as serving a request (for requests_only profiles)"""
+        self._request_threads.add(threading.get_ident())
+
+    def request_finished(self):
+        self._request_threads.discard(threading.get_ident())
+
+    def start(self, seconds, interval=0.01, requests_only=True):
+        """
+        Profiles for `seconds` on a background thread; the result lands in last_result.
+
+        Raises:
+            ProfilerBusy: If a profile is already running
+            ValueError: If seconds or interval are out of range
+
+        Returns:
+            threading.Thread: The sampler thread (join it to wait for the result)
+        """
+        if not (0 < seconds <= self.max_seconds):
+            raise ValueError(f"seconds must be between 0 and {self.max_seconds:g}")
+        if not (0.001 <= interval <= 1.0):
+            raise ValueError("interval must be between 1 ms and 1 s")
+        with self._lock:
+            if self.running:
+                raise ProfilerBusy("A profile is already running")
+            self.running = True
+
+        thread = threading.Thread(target=self._run, args=(seconds, interval, requests_only),
+                                  name="mood-profiler", daemon=True)
+        thread.start()
+        return thread
+
+    def profile(self, seconds, interval=0.01, requests_only=True):
+        """Profiles for `seconds` and returns the result (see start())"""
+        self.start(seconds, interval, requests_only).join()
+        return self.last_result
+
+    def _run(self, seconds, interval, requests_only):
+        stacks = Counter()
+        samples = 0
+        me = threading.get_ident()
+        names = {}
+        started = time.time()
+        deadline = time.perf_counter() + seconds
+        sample_seconds = 0.0
+        try:
+            next_sample = time.perf_counter()
+            while next_sample < deadline:
+                sample_started = time.perf_counter()
+                wanted = self._request_threads if requests_only else None
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me or (wanted is not None and thread_id not in wanted):
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    if thread_id not in names:
+                        names.update({thread.ident: thread.name for thread in threading.enumerate()})
+                    labels.append(names.get(thread_id, f"thread-{thread_id}"))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                sample_seconds += time.perf_counter() - sample_started
+                next_sample += interval
+                time.sleep(max(0.0, next_sample - time.perf_counter()))
+        finally:
+            self.last_result = {
+                "startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+                "seconds": seconds,
+                "intervalMs": interval * 1000,
+                "requestsOnly": requests_only,
+                "samples": samples,
+                "stackSamples": sum(stacks.values()),
+                "samplerCpuShare": sample_seconds / seconds,
+                "stacks": stacks
+            }
+            self.running = False
+
+def collapsed(result):
+    """Collapsed stack text of a profile result, most frequent stack first"""
+    return "".join(f"{stack} {count}\n" for stack, count in result["stacks"].most_common())
+
+class SlowRequestLog:
+    """
+    Ring buffer of requests that took longer than a threshold, with their
+    per-stage timings and input size, for looking at outliers after the fact.
+    """
+
+    def __init__(self, threshold_ms=0.0, capacity=100):
+        """
+        Args:
+            threshold_ms (float): Requests at or above this are kept (0 = off)
+            capacity (int): Requests kept (oldest dropped first)
+        """
+        self.threshold = threshold_ms / 1000.0
+        self.capacity = capacity
+        self.captured = 0
+        self._entries = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Builds a log configured by MOOD_SLOW_REQUEST_MS and MOOD_SLOW_REQUEST_LOG_SIZE"""
+        return cls(
+            threshold_ms=float(os.environ.get('MOOD_SLOW_REQUEST_MS', '0')),
+            capacity=int(os.environ.get('MOOD_SLOW_REQUEST_LOG_SIZE', '100'))
+        )
+
+    @property
+    def enabled(self):
+        return self.threshold > 0 and self.capacity > 0
+
+    def observe(self, timer, **details):
+        """
+        Keeps the request if its timer shows it was slow.
+
+        Args:
+            timer (StageTimer): The request's stage timer
+            **details: Endpoint, status, input size and so on, stored as given
+
+        Returns:
+            bool: Whether the request was kept
+        """
+        elapsed = timer.elapsed()
+        if not self.enabled or elapsed < self.threshold:
+            return False
+        stages = {stage: seconds * 1000 for stage, seconds in timer.stages.items()}
+        # Time outside the marked stages (routing, hooks, unmarked work)
+        stages["other"] = max(0.0, elapsed * 1000 - sum(stages.values()))
+        entry = dict(details, at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                     durationMs=elapsed * 1000, stagesMs=stages)
+        with self._lock:
+            self._entries.append(entry)
+            self.captured += 1
+        return True
+
+    def entries(self):
+        """Kept requests, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "thresholdMs": self.threshold * 1000,
+                "capacity": self.capacity,
+                "captured": self.captured,
+                "kept": len(self._entries)
+            }
+
+# Shared by every request thread of the process
+profiler = SamplingProfiler.from_env()
+slow_requests = SlowRequestLog.from_env()
+
+if __name__ == "__main__":
+    from metrics import StageTimer
+    from model_registry import registry
+
+    print("=" * 60)
+    print("SAMPLING PROFILER CHECK")
+    print("=" * 60)
+
+    engine = registry.current().engine
+    texts = ["I'm feeling really happy today! " * 20] * 64
+    stop = threading.Event()
+    done = []
+
+    def busy():
+        profiler.request_started()
+        while not stop.is_set():
+            engine.predict_proba(texts)
+            done.append(1)
+        profiler.request_finished()
+
+    def throughput(seconds):
+        done.clear()
+        time.sleep(seconds)
+        return len(done) / seconds
+
+    worker = threading.Thread(target=busy, name="busy-request")
+    worker.start()
+    time.sleep(0.2)
+    baseline = throughput(1.0)
+    profile_thread = profiler.start(1.0)
+    profiled = throughput(1.0)
+    profile_thread.join()
+    stop.set()
+    worker.join()
+
+    result = profiler.last_result
+    print(f"Samples: {result['samples']} ({result['stackSamples']} stacks), "
+          f"sampler CPU share {result['samplerCpuShare'] * 100:.2f}%")
+    print(f"Throughput: {baseline:.0f} calls/s unprofiled, {profiled:.0f} calls/s profiled")
+    print("Hottest stacks (leaf frames):")
+    for stack, count in result["stacks"].most_common(3):
+        print(f"  {count:>4}  ...{';'.join(stack.split(';')[-2:])}")
+
+    log = SlowRequestLog(threshold_ms=5, capacity=2)
+    for sleep_ms in (1, 8, 9, 10):
+        timer = StageTimer()
+        time.sleep(sleep_ms / 1000)
+        timer.mark("inference")
+        log.observe(timer, endpoint="/api/mood-analysis", inputChars=sleep_ms)
+    kept = [entry["inputChars"] for entry in log.entries()]
+    print(f"Slow request log kept inputs {kept} ({log.stats()['captured']} captured)")
+
+    print("=" * 60)
+    if not any("decision_function" in stack for stack in result["stacks"]) or kept != [10, 9]:
+        raise SystemExit("Profiler check failed")
+    print("Profiler sees the busy request thread")
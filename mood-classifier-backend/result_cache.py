@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+def normalize_text(text, lowercase=True):
+    """
+    Normalizes text for use as a cache key.
+
+    Lowercasing (when the model lowercases anyway) and collapsing whitespace
+    never change the tokens the vectorizer sees, so texts that normalize to the
+    same key always get the same probabilities.
+    """
+    if lowercase:
+        text = text.lower()
+    return " ".join(text.split())
+
+class ProbabilityCache:
+    """
+    Bounded LRU + TTL cache of class probability vectors.
+
+    Entries are keyed on (model version, normalized text) and hold the
+    probability row only. Everything that depends on per-call inputs
+    (streak days, community mood, trading activity) is derived afterwards.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, enabled=True):
+        """
+        Args:
+            max_size (int): Maximum number of cached texts
+            ttl (float): Seconds an entry stays valid (0 disables expiry)
+            enabled (bool): When False every lookup is a miss and nothing is stored
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled and max_size > 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        """Builds a cache configured by MOOD_CACHE_ENABLED, MOOD_CACHE_SIZE and MOOD_CACHE_TTL"""
+        return cls(
+            max_size=int(os.environ.get('MOOD_CACHE_SIZE', '10000')),
+            ttl=float(os.environ.get('MOOD_CACHE_TTL', '3600')),
+            enabled=os.environ.get('MOOD_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+        )
+
+    def get(self, key):
+        """Returns the cached probability row for `key`, or None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            row, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return row
+
+    def put(self, key, row):
+        """Stores a probability row, evicting the least recently used entries if full"""
+        if not self.enabled:
+            return
+
+        row = np.array(row, dtype=np.float64)
+        row.flags.writeable = False
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+
+        with self._lock:
+            self._entries[key] = (row, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def predict_proba(self, engine, texts):
+        """
+        Returns engine probabilities for `texts`, scoring only the cache misses.
+
+        Misses are scored together in one engine call, and a text repeated
+        within the batch is scored once.
+
+        Args:
+            engine (SparseEmotionEngine): Engine used for misses; its version is part of the key
+            texts (list[str]): Input texts
+
+        Returns:
+            numpy.ndarray: (len(texts) x classes) probability matrix
+        """
+        if not self.enabled:
+            return engine.predict_proba(texts)
+
+        keys = [(engine.version, normalize_text(text, engine.lowercase)) for text in texts]
+        probabilities = np.empty((len(texts), len(engine.classes)), dtype=np.float64)
+
+        missing = {}
+        for index, key in enumerate(keys):
+            row = self.get(key)
+            if row is None:
+                missing.setdefault(key, []).append(index)
+            else:
+                probabilities[index] = row
+
+        if missing:
+            computed = engine.predict_proba([texts[indices[0]] for indices in missing.values()])
+            for row, (key, indices) in zip(computed, missing.items()):
+                probabilities[indices] = row
+                self.put(key, row)
+
+        return probabilities
+
+    def clear(self):
+        """Drops every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns size, configuration and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxSize": self.max_size,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hitRate": self.hits / lookups if lookups else 0.0
+            }
+
+# Process-wide cache shared by flower_art_api and flower_integration_bridge
+probability_cache = ProbabilityCache.from_env()
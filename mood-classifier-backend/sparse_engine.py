@@ -0,0 +1,326 @@
+import re
+import zlib
+import numpy as np
+from scipy import sparse
+
+# Default token pattern of scikit-learn's CountVectorizer
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+# Vocabulary encodings: sorted UTF-8 terms, or sorted CRC-32 hashes of the terms
+VOCABULARY_KINDS = ("terms", "crc32")
+
+class EmotionScore:
+    """
+    Everything the parameter mappers need from one classified text.
+
+    Attributes:
+        label (str): Most probable emotion (the classifier's prediction)
+        confidence (float): Probability of `label`
+        min_probability (float): Smallest class probability
+        entropy (float): Shannon entropy of the distribution (nats)
+        probabilities (dict): Emotion -> probability, in class order
+        sorted_emotions (list): (emotion, probability) pairs, most probable first
+        row (numpy.ndarray): Raw probability row, in class order
+    """
+    __slots__ = ("label", "confidence", "min_probability", "entropy",
+                 "probabilities", "sorted_emotions", "row")
+
+    def __init__(self, label, confidence, min_probability, entropy, probabilities, sorted_emotions, row):
+        self.label = label
+        self.confidence = confidence
+        self.min_probability = min_probability
+        self.entropy = entropy
+        self.probabilities = probabilities
+        self.sorted_emotions = sorted_emotions
+        self.row = row
+
+class SparseEmotionEngine:
+    """
+    CountVectorizer + multinomial LogisticRegression scoring on plain arrays.
+
+    The vocabulary is kept as a sorted array of UTF-8 encoded terms, so the
+    column of a token is its position in that array. This is the same column
+    order scikit-learn uses after fitting, so the weight matrix is simply the
+    transposed coefficient matrix.
+
+    Compressed models (see compress_model.py) may instead keep the vocabulary
+    as sorted CRC-32 hashes and the weights as float32/float16; their logits
+    are still accumulated in float64.
+    """
+
+    def __init__(self, terms, weights, intercept, classes, lowercase=True,
+                 token_pattern=DEFAULT_TOKEN_PATTERN, version=None, vocabulary="terms"):
+        """
+        Args:
+            terms (numpy.ndarray): Sorted bytes array of UTF-8 vocabulary terms
+                (sorted uint32 CRC-32 hashes when vocabulary="crc32")
+            weights (numpy.ndarray): (terms x classes) coefficient matrix
+            intercept (numpy.ndarray): Per-class intercepts
+            classes (list[str]): Class labels, in column order
+            lowercase (bool): Lowercase text before tokenizing
+            token_pattern (str): Regular expression selecting tokens
+            version (str): Model version identifier
+            vocabulary (str): "terms" or "crc32"
+        """
+        if vocabulary not in VOCABULARY_KINDS:
+            raise ValueError(f"Unknown vocabulary kind {vocabulary!r}")
+        self.terms = terms
+        self.weights = weights
+        self.intercept = intercept
+        self.classes = np.asarray(classes, dtype=object)
+        self.class_list = [str(label) for label in classes]
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+        self.version = version
+        self.vocabulary = vocabulary
+        self._find_tokens = re.compile(token_pattern).findall
+
+    @classmethod
+    def from_pipeline(cls, pipeline, version=None):
+        """
+        Extracts the vocabulary and coefficients from a fitted sklearn Pipeline.
+
+        Args:
+            pipeline: Pipeline of a CountVectorizer followed by a LogisticRegression
+            version (str): Model version identifier
+
+        Returns:
+            SparseEmotionEngine: Engine scoring exactly like `pipeline`
+        """
+        vectorizer = pipeline.steps[0][1]
+        classifier = pipeline.steps[-1][1]
+
+        if vectorizer.analyzer != "word" or vectorizer.ngram_range != (1, 1):
+            raise ValueError("Only word unigram vectorizers are supported")
+        if vectorizer.preprocessor is not None or vectorizer.tokenizer is not None:
+            raise ValueError("Custom preprocessors and tokenizers are not supported")
+        if vectorizer.strip_accents is not None or vectorizer.stop_words is not None:
+            raise ValueError("strip_accents and stop_words are not supported")
+        if vectorizer.binary:
+            raise ValueError("Binary vectorizers are not supported")
+        if len(classifier.classes_) <= 2:
+            raise ValueError("Only multinomial (3+ class) classifiers are supported")
+
+        vocabulary = vectorizer.vocabulary_
+        terms = np.empty(len(vocabulary), dtype=object)
+        for term, column in vocabulary.items():
+            terms[column] = term.encode("utf-8")
+        terms = np.array(terms.tolist())
+
+        if np.any(terms[1:] <= terms[:-1]):
+            raise ValueError("Vocabulary columns are not in sorted term order")
+
+        return cls(
+            terms=terms,
+            weights=np.ascontiguousarray(classifier.coef_.T, dtype=np.float64),
+            intercept=np.asarray(classifier.intercept_, dtype=np.float64),
+            classes=classifier.classes_.tolist(),
+            lowercase=vectorizer.lowercase,
+            token_pattern=vectorizer.token_pattern,
+            version=version
+        )
+
+    def tokenize(self, text):
+        """Splits text into tokens the way the fitted CountVectorizer does"""
+        if self.lowercase:
+            text = text.lower()
+        return self._find_tokens(text)
+
+    def lookup(self, tokens):
+        """
+        Maps tokens to vocabulary columns.
+
+        Args:
+            tokens (list[str]): Tokens to look up
+
+        Returns:
+            numpy.ndarray: Column per token, -1 for out-of-vocabulary tokens
+        """
+        if not tokens:
+            return np.empty(0, dtype=np.intp)
+
+        if self.vocabulary == "crc32":
+            encoded = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens),
+                                  dtype=np.uint32, count=len(tokens))
+        else:
+            encoded = np.array([token.encode("utf-8") for token in tokens])
+        positions = np.searchsorted(self.terms, encoded)
+        positions[positions == len(self.terms)] = 0
+        return np.where(self.terms[positions] == encoded, positions, -1)
+
+    def transform(self, texts):
+        """
+        Builds the (texts x vocabulary) token count matrix.
+
+        Args:
+            texts (list[str]): Input texts
+
+        Returns:
+            scipy.sparse.csr_matrix: Token counts with sorted column indices
+        """
+        token_lists = [self.tokenize(text) for text in texts]
+        row_lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.intp, count=len(token_lists))
+        columns = self.lookup([token for tokens in token_lists for token in tokens])
+        rows = np.repeat(np.arange(len(token_lists), dtype=np.intp), row_lengths)
+
+        # One sort over (row, column) keys gives counts and sorted CSR indices
+        known = columns >= 0
+        keys, counts = np.unique(rows[known] * len(self.terms) + columns[known], return_counts=True)
+        indptr = np.zeros(len(token_lists) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(keys // len(self.terms), minlength=len(token_lists)), out=indptr[1:])
+
+        return sparse.csr_matrix(
+            (counts.astype(np.int64), keys % len(self.terms), indptr),
+            shape=(len(token_lists), len(self.terms))
+        )
+
+    def count_row(self, column_counts):
+        """
+        One-row token count matrix from per-column counts, laid out exactly as
+        transform() lays out the row of a text with those counts.
+
+        Args:
+            column_counts (dict): Vocabulary column -> token count (non-zero)
+
+        Returns:
+            scipy.sparse.csr_matrix: (1 x vocabulary) token counts with sorted column indices
+        """
+        columns = sorted(column_counts)
+        return sparse.csr_matrix(
+            (np.array([column_counts[column] for column in columns], dtype=np.int64),
+             np.array(columns, dtype=np.intp), np.array([0, len(columns)], dtype=np.intp)),
+            shape=(1, len(self.terms))
+        )
+
+    def decision_function(self, texts):
+        """Returns the (texts x classes) matrix of class logits"""
+        return self.count_logits(self.transform(texts))
+
+    def count_logits(self, counts):
+        """Class logits of a token count matrix (as built by transform() or count_row())"""
+        if self.weights.dtype == np.float64:
+            return counts @ self.weights + self.intercept
+
+        # Reduced-precision weights: gather the rows and accumulate in float64
+        # (scipy's sparse products do not support float16)
+        logits = np.zeros((counts.shape[0], self.weights.shape[1]))
+        if counts.nnz:
+            gathered = self.weights[counts.indices].astype(np.float64)
+            gathered *= counts.data[:, None]
+            starts = counts.indptr[:-1]
+            nonempty = np.diff(counts.indptr) > 0
+            logits[nonempty] = np.add.reduceat(gathered, starts[nonempty], axis=0)
+        return logits + self.intercept
+
+    def predict_proba(self, texts):
+        """Returns the (texts x classes) matrix of class probabilities"""
+        return softmax(self.decision_function(texts))
+
+    def predict(self, texts):
+        """Returns the most probable emotion for each text"""
+        return self.classes[np.argmax(self.decision_function(texts), axis=1)]
+
+    def score(self, texts):
+        """
+        Classifies texts in a single pass.
+
+        Args:
+            texts (list[str]): Input texts
+
+        Returns:
+            list[EmotionScore]: One score per text, in input order
+        """
+        return self.describe(self.predict_proba(texts))
+
+    def describe(self, probabilities):
+        """
+        Derives argmax, entropy and sorted emotions from a probability matrix.
+
+        Args:
+            probabilities (numpy.ndarray): (rows x classes) probability matrix
+
+        Returns:
+            list[EmotionScore]: One score per row
+        """
+        probabilities = np.atleast_2d(probabilities)
+        entropy = -np.sum(probabilities * np.log(probabilities + 1e-10), axis=1)
+        order = np.argsort(-probabilities, axis=1, kind="stable")
+        minimum = np.min(probabilities, axis=1)
+        classes = self.class_list
+
+        scores = []
+        for row, row_order, row_entropy, row_min in zip(probabilities, order.tolist(), entropy.tolist(), minimum.tolist()):
+            values = row.tolist()
+            sorted_emotions = [(classes[i], values[i]) for i in row_order]
+            scores.append(EmotionScore(
+                label=sorted_emotions[0][0],
+                confidence=sorted_emotions[0][1],
+                min_probability=row_min,
+                entropy=row_entropy,
+                probabilities=dict(zip(classes, values)),
+                sorted_emotions=sorted_emotions,
+                row=row
+            ))
+        return scores
+
+def softmax(logits):
+    """Row-wise softmax, computed the way scikit-learn does"""
+    probabilities = logits - np.max(logits, axis=1).reshape((-1, 1))
+    np.exp(probabilities, out=probabilities)
+    probabilities /= np.sum(probabilities, axis=1).reshape((-1, 1))
+    return probabilities
+
+def check_parity(engine, pipeline, texts, tolerance=1e-12):
+    """
+    Compares the engine against the original sklearn pipeline.
+
+    Args:
+        engine (SparseEmotionEngine): Engine under test
+        pipeline: The fitted sklearn Pipeline it was extracted from
+        texts (list[str]): Texts to compare on
+        tolerance (float): Largest allowed absolute probability difference
+
+    Returns:
+        dict: Number of texts, label agreement and largest probability difference
+    """
+    expected = pipeline.predict_proba(texts)
+    actual = engine.predict_proba(texts)
+    labels_match = bool(np.all(pipeline.predict(texts) == engine.predict(texts)))
+    max_error = float(np.max(np.abs(expected - actual))) if len(texts) else 0.0
+
+    return {
+        "texts": len(texts),
+        "labels_match": labels_match,
+        "max_probability_error": max_error,
+        "passed": labels_match and max_error <= tolerance
+    }
+
+# Parity check against the pickled pipeline
+if __name__ == "__main__":
+    import joblib
+
+    pipe_lr = joblib.load(open('models/emotion_classifier_pipe_lr_03_jan_2022.pkl', 'rb'))
+    engine = SparseEmotionEngine.from_pipeline(pipe_lr, version="emotion_classifier_pipe_lr_03_jan_2022")
+
+    test_texts = [
+        "I'm feeling really happy today!",
+        "This makes me so angry and frustrated",
+        "I'm scared and worried about the future",
+        "I feel sad and lonely",
+        "",
+        "🙂🙂🙂",
+        "WOW what a Surprise, wow!!",
+        "ΣΟΦΟΣ σοφος naïve café",
+        "the the the the the quick brown fox " * 50
+    ]
+
+    print("=" * 60)
+    print("SPARSE ENGINE PARITY CHECK")
+    print("=" * 60)
+
+    result = check_parity(engine, pipe_lr, test_texts)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    print("=" * 60)
+    raise SystemExit(0 if result["passed"] else 1)
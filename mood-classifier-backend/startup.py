@@ -0,0 +1,133 @@
+import importlib
+import os
+import threading
+import time
+
+# Inputs run through the full request path before the server reports ready
+DEFAULT_WARMUP_TEXTS = [
+    "I'm feeling really happy today!",
+    "This makes me so angry and frustrated",
+    "I'm scared and worried about the future",
+    "I feel sad and lonely"
+]
+
+# Heavy modules imported before the model is loaded
+HEAVY_MODULES = ("numpy", "scipy.sparse", "sparse_engine", "model_artifact", "model_registry", "result_cache")
+
+class StartupPending(Exception):
+    """Raised when the model is needed before it has finished loading"""
+
+def load_warmup_texts():
+    """
+    Returns the warmup inference set.
+
+    MOOD_WARMUP_FILE names a file with one text per line. Without it the
+    built-in DEFAULT_WARMUP_TEXTS are used.
+    """
+    path = os.environ.get('MOOD_WARMUP_FILE')
+    if not path:
+        return list(DEFAULT_WARMUP_TEXTS)
+
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+class ModelStartup:
+    """
+    Imports the heavy modules, loads the model and runs the warmup set.
+
+    run() does this inline. start() does it on a background thread so the
+    server can accept connections (and answer health checks) straight away.
+    The model counts as loaded once the model registry has an active model
+    and flower_integration_bridge is imported, and ready once warmup has
+    finished. Later hot reloads warm up their model before swapping it in,
+    so readiness is not affected by them.
+    """
+
+    def __init__(self, warmup_fn=None, warmup_texts=None):
+        """
+        Args:
+            warmup_fn (callable): Called with the warmup texts once the model is loaded
+            warmup_texts (list[str]): Warmup inference set (defaults to load_warmup_texts())
+        """
+        self.warmup_fn = warmup_fn
+        self.warmup_texts = warmup_texts if warmup_texts is not None else load_warmup_texts()
+        self.bridge = None
+        self.error = None
+        self.timings = {}
+        self._created = time.perf_counter()
+        self._loaded = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Runs startup on a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="model-startup", daemon=True)
+            self._thread.start()
+
+    def run(self):
+        """Imports, loads and warms up the model on the calling thread"""
+        try:
+            started = time.perf_counter()
+            for module in HEAVY_MODULES:
+                importlib.import_module(module)
+            self.timings["importSeconds"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            from model_registry import registry
+            registry.current()
+            self.bridge = importlib.import_module("flower_integration_bridge")
+            self.timings["loadSeconds"] = time.perf_counter() - started
+            self._loaded.set()
+
+            started = time.perf_counter()
+            if self.warmup_fn is not None and self.warmup_texts:
+                self.warmup_fn(self.warmup_texts)
+            self.timings["warmupSeconds"] = time.perf_counter() - started
+            self.timings["warmupTexts"] = len(self.warmup_texts)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.timings["totalSeconds"] = time.perf_counter() - self._created
+            self._loaded.set()
+            self._ready.set()
+
+    @property
+    def model_version(self):
+        """Version of the model currently served (None until it is loaded)"""
+        if not self._loaded.is_set():
+            return None
+        from model_registry import registry
+        return registry.active.version if registry.active is not None else None
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set() and self.error is None
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.error is None
+
+    def require(self, timeout=None):
+        """
+        Returns the flower_integration_bridge module, waiting for the model to load.
+
+        Raises:
+            StartupPending: If the model is not loaded within `timeout` seconds
+            RuntimeError: If startup failed
+        """
+        if not self._loaded.wait(timeout):
+            raise StartupPending("Model is still loading")
+        if self.error is not None:
+            raise RuntimeError(f"Model failed to load: {self.error}")
+        return self.bridge
+
+    def status(self):
+        """Returns readiness, startup timings and any startup error"""
+        return {
+            "ready": self.ready,
+            "loaded": self.loaded,
+            "error": self.error,
+            "modelVersion": self.model_version,
+            "timings": dict(self.timings)
+        }
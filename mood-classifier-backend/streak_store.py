@@ -0,0 +1,448 @@
+import atexit
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+# Mirrors streakParams in the flower parameters. streakDecayRate is not
+# applied: a whole day without a good submission ends the streak outright.
+GOOD_MOOD_THRESHOLD = 0.7
+MAX_STREAK_DAYS = 30
+
+# Predicted emotions that count towards a streak (when confident enough)
+GOOD_MOOD_EMOTIONS = ("joy", "surprise")
+
+# Longest accepted user id
+MAX_USER_ID_LENGTH = 128
+
+SECONDS_PER_DAY = 86400
+
+# Ids per SELECT ... IN (...) (below SQLite's default bound parameter limit)
+_MAX_QUERY_IDS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS streaks (
+    user_id TEXT PRIMARY KEY,
+    streak INTEGER NOT NULL,
+    last_good_day INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Applies one good-mood day to a user's record. Same rule as advance_streak(),
+# evaluated by SQLite so processes sharing the database never overwrite each
+# other's updates with a stale copy.
+_UPSERT = """
+INSERT INTO streaks (user_id, streak, last_good_day) VALUES (:user_id, 1, :day)
+ON CONFLICT (user_id) DO UPDATE SET
+    streak = CASE
+        WHEN streaks.last_good_day >= excluded.last_good_day THEN streaks.streak
+        WHEN streaks.last_good_day = excluded.last_good_day - 1 THEN MIN(streaks.streak + 1, :max_days)
+        ELSE 1
+    END,
+    last_good_day = MAX(streaks.last_good_day, excluded.last_good_day)
+"""
+
+def advance_streak(streak, last_good_day, day, max_days=MAX_STREAK_DAYS):
+    """
+    Applies one good-mood submission on `day` to a streak record.
+
+    A second good submission on the same day changes nothing, one on the
+    day after the last good day extends the streak (up to max_days), and
+    anything later starts a new streak.
+
+    Returns:
+        tuple: (streak, last_good_day)
+    """
+    if last_good_day is not None and last_good_day >= day:
+        return streak, last_good_day
+    if last_good_day == day - 1:
+        return min(streak + 1, max_days), day
+    return 1, day
+
+def current_streak(streak, last_good_day, today):
+    """Streak days as of `today`: a streak is broken once a whole day passes without a good submission"""
+    if last_good_day is None or last_good_day < today - 1:
+        return 0
+    return streak
+
+class StreakStore:
+    """
+    Per-user good-mood streaks in an embedded SQLite database.
+
+    Each user is one small row (id, streak, last good day) looked up by
+    primary key. Submissions are not written one by one: good-mood days are
+    queued in memory and a background thread writes them in a single
+    transaction every flush_interval seconds (or sooner once flush_rows are
+    queued). Reads overlay the queued days on the stored row, so a user
+    always sees their own latest submission.
+
+    With WAL journaling and synchronous=NORMAL a commit does not fsync; a
+    crash can lose at most the last flush interval of updates.
+
+    The writer connection creates the schema once. Reads borrow one of at
+    most max_readers read-only connections, however many threads the server
+    starts.
+    """
+
+    def __init__(self, path, flush_interval=0.2, flush_rows=500, max_readers=4, max_days=MAX_STREAK_DAYS,
+                 clock=time.time):
+        """
+        Args:
+            path (str): SQLite database file (created if missing)
+            flush_interval (float): Longest a queued update waits before it is written
+            flush_rows (int): Queued users that trigger an early flush
+            max_readers (int): Read connections kept open (readers beyond that wait for one)
+            max_days (int): Streak cap
+            clock (callable): Time source in seconds since the epoch (days are UTC days)
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_readers = max(1, max_readers)
+        self.max_days = max_days
+        self.clock = clock
+        self._pending = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._readers = []
+        self._reader_count = 0
+        self._reader_available = threading.Condition(threading.Lock())
+        self._writer = None
+        self._flusher = None
+        self._wake = threading.Event()
+        self._closed = False
+        self._pid = os.getpid()
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Builds a store configured by MOOD_STREAK_DB, MOOD_STREAK_FLUSH_MS, MOOD_STREAK_FLUSH_ROWS and MOOD_STREAK_READERS"""
+        return cls(
+            path=os.environ.get('MOOD_STREAK_DB', 'data/streaks.sqlite3'),
+            flush_interval=float(os.environ.get('MOOD_STREAK_FLUSH_MS', '200')) / 1000.0,
+            flush_rows=int(os.environ.get('MOOD_STREAK_FLUSH_ROWS', '500')),
+            max_readers=int(os.environ.get('MOOD_STREAK_READERS', '4'))
+        )
+
+    def today(self):
+        return int(self.clock() // SECONDS_PER_DAY)
+
+    def record_many(self, user_ids, good):
+        """
+        Records a batch of submissions and returns each user's streak right after theirs.
+
+        Args:
+            user_ids (list[str]): User of each submission
+            good (list[bool]): Whether each submission was a good-mood submission
+
+        Returns:
+            list[int]: Current streak days per submission
+        """
+        self._check_fork()
+        day = self.today()
+        with self._lock:
+            for user_id, is_good in zip(user_ids, good):
+                if is_good:
+                    days = self._pending.setdefault(user_id, [])
+                    if not days or days[-1] != day:
+                        days.append(day)
+            pending_users = len(self._pending)
+        self._start_flusher()
+        if pending_users >= self.flush_rows:
+            self._wake.set()
+
+        records = self._read(set(user_ids))
+        return [current_streak(*records[user_id], day) for user_id in user_ids]
+
+    def streak(self, user_id):
+        """Current streak days of one user (0 for unknown users)"""
+        return current_streak(*self._read({user_id})[user_id], self.today())
+
+    def get(self, user_id):
+        """
+        Snapshot of one user's streak.
+
+        Returns:
+            dict | None: None for users without any good-mood submission
+        """
+        streak, last_good_day = self._read({user_id})[user_id]
+        if last_good_day is None:
+            return None
+        return {
+            "userId": user_id,
+            "streakDays": current_streak(streak, last_good_day, self.today()),
+            "lastGoodDay": time.strftime("%Y-%m-%d", time.gmtime(last_good_day * SECONDS_PER_DAY)),
+            "maxStreakDays": self.max_days
+        }
+
+    def flush(self):
+        """Writes every queued update in one transaction"""
+        self._check_fork()
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                batch = self._flushing
+
+            started = time.perf_counter()
+            rows = [{"user_id": user_id, "day": day, "max_days": self.max_days}
+                    for user_id, days in batch.items() for day in days]
+            connection = self._writer_connection()
+            with connection:
+                connection.executemany(_UPSERT, rows)
+
+            with self._lock:
+                self._flushing = {}
+                self.flushes += 1
+                self.rows_written += len(rows)
+                self.last_flush_seconds = time.perf_counter() - started
+            return len(rows)
+
+    def close(self):
+        """Flushes queued updates and stops the background writer"""
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "pendingUsers": len(self._pending),
+                "flushes": self.flushes,
+                "rowsWritten": self.rows_written,
+                "lastFlushMs": self.last_flush_seconds * 1000,
+                "readConnections": self._reader_count
+            }
+
+    def _read(self, user_ids):
+        """{user_id: (streak, last_good_day)} with queued days applied on top of the stored rows"""
+        self._check_fork()
+        user_ids = list(user_ids)
+        # Take the queued days before reading the rows: a flush that commits in
+        # between is then either in the rows or in the snapshot (or both, and
+        # applying a stored day again is a no-op)
+        with self._lock:
+            queued = {
+                user_id: (*self._flushing.get(user_id, ()), *self._pending.get(user_id, ()))
+                for user_id in user_ids
+            }
+
+        stored = {}
+        with self._reader_connection() as connection:
+            for start in range(0, len(user_ids), _MAX_QUERY_IDS):
+                chunk = user_ids[start:start + _MAX_QUERY_IDS]
+                rows = connection.execute(
+                    f"SELECT user_id, streak, last_good_day FROM streaks WHERE user_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                stored.update((user_id, (streak, last_good_day)) for user_id, streak, last_good_day in rows)
+
+        records = {}
+        for user_id in user_ids:
+            streak, last_good_day = stored.get(user_id, (0, None))
+            for day in queued[user_id]:
+                streak, last_good_day = advance_streak(streak, last_good_day, day, self.max_days)
+            records[user_id] = (streak, last_good_day)
+        return records
+
+    @contextlib.contextmanager
+    def _reader_connection(self):
+        """Borrows a pooled read connection, opening one while fewer than max_readers exist"""
+        with self._reader_available:
+            while not self._readers and self._reader_count >= self.max_readers:
+                self._reader_available.wait()
+            if self._readers:
+                connection = self._readers.pop()
+            else:
+                connection = None
+                self._reader_count += 1
+        if connection is None:
+            try:
+                # The schema must exist before a reader queries it
+                self._writer_connection()
+                connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+                connection.execute("PRAGMA query_only=ON")
+            except BaseException:
+                with self._reader_available:
+                    self._reader_count -= 1
+                    self._reader_available.notify()
+                raise
+        try:
+            yield connection
+        finally:
+            with self._reader_available:
+                self._readers.append(connection)
+                self._reader_available.notify()
+
+    def _writer_connection(self):
+        # Opened once, and creates the schema; WAL mode is a property of the
+        # database file, so the read connections get it too
+        if self._writer is None:
+            with self._open_lock:
+                if self._writer is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("PRAGMA synchronous=NORMAL")
+                    connection.execute(_SCHEMA)
+                    connection.commit()
+                    self._writer = connection
+        return self._writer
+
+    def _check_fork(self):
+        # A worker forked after the store was used (gunicorn preload_app) inherits the
+        # parent's SQLite connections, which must not be shared, and a flusher thread
+        # that does not exist in it: it opens its own and starts its own flusher
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._open_lock:
+            if self._pid == pid:
+                return
+            # The parent flushes what it had queued
+            self._pending = {}
+            self._flushing = {}
+            self._readers = []
+            self._reader_count = 0
+            self._reader_available = threading.Condition(threading.Lock())
+            self._writer = None
+            self._flusher = None
+            self._wake = threading.Event()
+            self._closed = False
+            self._pid = pid
+
+    def _start_flusher(self):
+        if self._flusher is not None or self._closed:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="streak-flusher", daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+
+    def _run_flusher(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # Keep the queued days; they are merged into the next flush
+                print(f"Streak store flush failed: {e}")
+                with self._lock:
+                    for user_id, days in self._flushing.items():
+                        merged = sorted(set(days) | set(self._pending.get(user_id, ())))
+                        self._pending[user_id] = merged
+                    self._flushing = {}
+
+# Shared by every module in the process; the database is opened on first use
+streak_store = StreakStore.from_env()
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    print("=" * 60)
+    print("STREAK STORE")
+    print("=" * 60)
+
+    class FakeClock:
+        now = 1_700_000_000.0
+
+        def __call__(self):
+            return self.now
+
+    with tempfile.TemporaryDirectory() as directory:
+        clock = FakeClock()
+        store = StreakStore(os.path.join(directory, "streaks.sqlite3"), flush_interval=0.01, clock=clock)
+        rng = random.Random(0)
+
+        # Compare against a plain dict replay of the same submissions
+        expected = {}
+        longest = 0
+        failures = 0
+        for step in range(3000):
+            clock.now += rng.choice((600, 3600, 2 * 3600, 3 * 3600)) if rng.random() < 0.995 else 40 * 3600
+            user_id = f"user-{rng.randrange(3)}"
+            good = rng.random() < 0.8
+            streak = store.record_many([user_id], [good])[0]
+
+            day = store.today()
+            if good:
+                expected[user_id] = advance_streak(*expected.get(user_id, (0, None)), day)
+            if streak != current_streak(*expected.get(user_id, (0, None)), day):
+                failures += 1
+            longest = max(longest, streak)
+            if step % 500 == 0:
+                store.flush()
+        store.close()
+
+        reopened = StreakStore(store.path, clock=clock)
+        for user_id, record in expected.items():
+            if reopened.streak(user_id) != current_streak(*record, reopened.today()):
+                failures += 1
+        print(f"Checked 3000 submissions and a reopen against a replay: {failures} mismatch(es)")
+        print(f"Longest streak seen: {longest} days (cap {MAX_STREAK_DAYS})")
+
+        # A thread per request (dev server, ASGI pool) must not mean a connection per thread
+        pooled = StreakStore(os.path.join(directory, "pooled.sqlite3"), max_readers=2, clock=clock)
+        threads = [threading.Thread(target=lambda: [pooled.streak(f"user-{i}") for i in range(20)]) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        connections = pooled.stats()["readConnections"]
+        failures += connections > 2
+        print(f"Read connections opened by 50 reader threads: {connections} (limit 2)")
+
+        # A forked worker (gunicorn preload_app) must write through its own connection and flusher
+        forked = StreakStore(os.path.join(directory, "forked.sqlite3"), flush_interval=0.01, clock=clock)
+        forked.record_many(["parent"], [True])
+        forked.flush()
+        child = os.fork()
+        if child == 0:
+            forked.record_many(["child"], [True])
+            time.sleep(0.2)
+            os._exit(0 if forked.stats()["pendingUsers"] == 0 and forked.stats()["flushes"] > 0 else 1)
+        _, status = os.waitpid(child, 0)
+        child_ok = os.waitstatus_to_exitcode(status) == 0 and StreakStore(forked.path, clock=clock).streak("child") == 1
+        failures += not child_ok
+        print(f"Forked worker flushed its own updates: {child_ok}")
+
+        users = [f"user-{i}" for i in range(5000)]
+        store = StreakStore(os.path.join(directory, "bench.sqlite3"), clock=clock)
+        started = time.perf_counter()
+        for user_id in users:
+            store.record_many([user_id], [True])
+        store.close()
+        batched = (time.perf_counter() - started) / len(users) * 1e6
+
+        connection = sqlite3.connect(os.path.join(directory, "per-request.sqlite3"))
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute(_SCHEMA)
+        started = time.perf_counter()
+        for user_id in users[:500]:
+            with connection:
+                connection.execute(_UPSERT, {"user_id": user_id, "day": reopened.today(), "max_days": MAX_STREAK_DAYS})
+        per_request = (time.perf_counter() - started) / 500 * 1e6
+        connection.close()
+
+        print(f"Write-behind batches:          {batched:8.1f} us per submission")
+        print(f"One fsync'd commit per request: {per_request:8.1f} us per submission")
+
+    print("=" * 60)
+    if failures:
+        raise SystemExit("Stored streaks diverged from the replay")
+    print("Stored streaks match the replay")
@@ -0,0 +1,81 @@
+import argparse
+import json
+import multiprocessing
+
+from load_test import (
+    Target, free_port, generate_texts, load_texts, request_bodies, run_closed_loop, start_server, stop_server, wait_ready
+)
+
+def recommend(results, p99_target_ms):
+    """Picks the highest-throughput setting whose p99 meets the target (or the best overall)"""
+    healthy = [r for r in results if r["requests"] and not r["errors"]]
+    within_target = [r for r in healthy if r["p99Ms"] <= p99_target_ms]
+    candidates = within_target or healthy
+    if not candidates:
+        return None
+    return max(candidates, key=lambda r: (r["throughputRps"], -r["p99Ms"]))
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+if __name__ == "__main__":
+    cores = multiprocessing.cpu_count()
+    default_workers = sorted({1, max(1, cores // 2), cores, cores * 2})
+
+    parser = argparse.ArgumentParser(description="Sweep gunicorn workers x threads and recommend a setting")
+    parser.add_argument("--workers", type=parse_list, default=default_workers, help="Worker counts, e.g. 1,2,4")
+    parser.add_argument("--threads", type=parse_list, default=[1, 2, 4], help="Request threads per worker")
+    parser.add_argument("--blas-threads", type=parse_list, default=[1], help="BLAS/OpenMP threads per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per setting")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured load per setting")
+    parser.add_argument("--clients-per-slot", type=int, default=2,
+                        help="Concurrent clients per worker thread (keeps every slot busy)")
+    parser.add_argument("--p99-target-ms", type=float, default=100.0, help="Latency target for the recommendation")
+    parser.add_argument("--texts", help="Texts to replay (.txt one per line, or CSV/JSONL/Parquet; default: generated)")
+    parser.add_argument("--out", help="Write all results and the recommendation as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, limit=50000) if args.texts else generate_texts(5000)
+    bodies = request_bodies(texts, 20000)
+
+    print("=" * 80)
+    print(f"WORKER SWEEP ({cores} cores)")
+    print("=" * 80)
+    print(f"{'workers':>8} {'threads':>8} {'blas':>5} {'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+    results = []
+    for workers in args.workers:
+        for threads in args.threads:
+            for blas_threads in args.blas_threads:
+                port = free_port()
+                process = start_server(port, workers, threads, blas_threads)
+                try:
+                    if not wait_ready(port):
+                        print(f"{workers:>8} {threads:>8} {blas_threads:>5}  server did not become ready")
+                        continue
+                    concurrency = workers * threads * args.clients_per_slot
+                    target = Target("127.0.0.1", port)
+                    run_closed_loop(target, concurrency, args.warmup, bodies)
+                    result = run_closed_loop(target, concurrency, args.duration, bodies)
+                finally:
+                    stop_server(process)
+
+                result.update({"workers": workers, "threads": threads, "blasThreads": blas_threads, "clients": concurrency})
+                results.append(result)
+                print(f"{workers:>8} {threads:>8} {blas_threads:>5} {concurrency:>8} {result['throughputRps']:>9.1f} "
+                      f"{result['p50Ms']:>8.1f} {result['p95Ms']:>8.1f} {result['p99Ms']:>8.1f} {result['errors']:>7}")
+
+    best = recommend(results, args.p99_target_ms)
+    print("=" * 80)
+    if best is None:
+        print("No setting completed without errors")
+    else:
+        print(f"Recommended: MOOD_WORKERS={best['workers']} MOOD_THREADS={best['threads']} "
+              f"MOOD_BLAS_THREADS={best['blasThreads']} "
+              f"({best['throughputRps']:.1f} req/s, p99 {best['p99Ms']:.1f} ms)")
+        if best["p99Ms"] > args.p99_target_ms:
+            print(f"Note: no setting met the p99 target of {args.p99_target_ms:.0f} ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"cores": cores, "results": results, "recommended": best}, f, indent=2)
@@ -0,0 +1,615 @@
+import contextlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# A session row holds its text as of base_revision; the edits after it are
+# rows of typing_edits until the next compaction folds them into the text
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS typing_sessions (
+        session_id TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        base_revision INTEGER NOT NULL,
+        inputs TEXT NOT NULL,
+        revision INTEGER NOT NULL,
+        last_used REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS typing_sessions_last_used ON typing_sessions (last_used)",
+    """
+    CREATE TABLE IF NOT EXISTS typing_edits (
+        session_id TEXT NOT NULL,
+        revision INTEGER NOT NULL,
+        edit_start INTEGER NOT NULL,
+        edit_end INTEGER NOT NULL,
+        edit_text TEXT NOT NULL,
+        PRIMARY KEY (session_id, revision)
+    ) WITHOUT ROWID
+    """,
+    # Number of session rows, kept by every transaction that adds or deletes one
+    "CREATE TABLE IF NOT EXISTS typing_session_count (id INTEGER PRIMARY KEY CHECK (id = 0), sessions INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO typing_session_count (id, sessions) VALUES (0, (SELECT COUNT(*) FROM typing_sessions))"
+)
+
+def _word_start(text, position):
+    # Start of the whitespace-delimited run containing text[position - 1]
+    while position > 0 and not text[position - 1].isspace():
+        position -= 1
+    return position
+
+def _word_end(text, position):
+    while position < len(text) and not text[position].isspace():
+        position += 1
+    return position
+
+class TypingSession:
+    """
+    Text being typed, with its token counts kept up to date edit by edit.
+
+    An edit replaces text[start:end] with new text (an append is start = end
+    = len(text), a deletion inserts ""). Only the whitespace-delimited words
+    the edit touches are tokenized again, before and after the edit, and
+    only the net change is applied to the per-column token counts. This
+    holds for token patterns whose matches neither contain nor look past
+    whitespace, like CountVectorizer's default.
+
+    Probabilities are computed from the counts by the engine's own code
+    (count_row, count_logits and softmax), in the same float order as
+    engine.predict_proba, so they are bit-identical to scoring the whole
+    text. Tokenizing is what grows with the text, and only the edited words
+    are tokenized; the logits cost one pass over the text's distinct
+    vocabulary terms.
+
+    Offsets count Unicode code points (not UTF-16 units).
+    """
+
+    def __init__(self, model, text=""):
+        """
+        Args:
+            model (ModelVersion): Model scoring the session
+            text (str): Initial text
+        """
+        # Per-session values the caller keeps with the text (api_server's flower inputs)
+        self.inputs = {}
+        self.revision = 0
+        self.edits = 0
+        self.text = text
+        # (start, end, text) edits applied since the owner last stored the session
+        self.unsaved = []
+        self.bind(model)
+
+    def bind(self, model):
+        """Counts the current text from scratch with `model` (used when a hot reload swaps models)"""
+        self.model = model
+        engine = model.engine
+        # Tokens longer than the longest term are never in the vocabulary
+        self.max_term_bytes = engine.terms.dtype.itemsize if engine.vocabulary == "terms" else None
+        self.counts = self._count(self.text)
+
+    def apply(self, start, end, text):
+        """
+        Replaces text[start:end] with `text` and updates the token counts.
+
+        Raises:
+            ValueError: If the span is outside the current text
+        """
+        if not (0 <= start <= end <= len(self.text)):
+            raise ValueError(f"Edit span {start}:{end} is outside the text (length {len(self.text)})")
+
+        old = self.text
+        new = old[:start] + text + old[end:]
+        window_start = _word_start(old, start)
+        old_end = _word_end(old, end)
+        new_end = old_end + len(new) - len(old)
+
+        changes = Counter(self.model.engine.tokenize(new[window_start:new_end]))
+        changes.subtract(self.model.engine.tokenize(old[window_start:old_end]))
+        self._add({token: delta for token, delta in changes.items() if delta}, self.counts)
+
+        self.text = new
+        self.revision += 1
+        self.edits += 1
+        self.unsaved.append((start, end, text))
+
+    def apply_edits(self, edits, max_chars=None):
+        """
+        Applies (start, end, text) edits in order, each against the text left by
+        the previous one. All spans are checked first, so a bad edit changes nothing.
+
+        Raises:
+            ValueError: If a span is outside the text, or the result would exceed max_chars
+        """
+        length = len(self.text)
+        for start, end, text in edits:
+            if not (0 <= start <= end <= length):
+                raise ValueError(f"Edit span {start}:{end} is outside the text (length {length})")
+            length += len(text) - (end - start)
+        if max_chars is not None and length > max_chars:
+            raise ValueError(f"Text too long (max {max_chars} characters)")
+        for start, end, text in edits:
+            self.apply(start, end, text)
+
+    def snapshot(self):
+        """Copy of the current state that later edits leave alone (to score it without holding a lock)"""
+        copy = object.__new__(TypingSession)
+        copy.__dict__.update(self.__dict__)
+        copy.counts = dict(self.counts)
+        copy.inputs = dict(self.inputs)
+        copy.unsaved = []
+        return copy
+
+    def logits(self):
+        """Class logits of the current text, as engine.decision_function computes them"""
+        engine = self.model.engine
+        return engine.count_logits(engine.count_row(self.counts))[0]
+
+    def probabilities(self):
+        """Class probabilities of the current text, ordered as engine.classes (as engine.predict_proba computes them)"""
+        # sparse_engine pulls in numpy and scipy: loaded by model startup, not when the server imports this module
+        from sparse_engine import softmax
+
+        return softmax(self.logits()[None, :])[0]
+
+    def verify(self):
+        """Whether the incrementally kept counts equal a from-scratch count of the current text"""
+        return self._count(self.text) == self.counts
+
+    def _count(self, text):
+        counts = {}
+        self._add(Counter(self.model.engine.tokenize(text)), counts)
+        return counts
+
+    def _add(self, deltas, counts):
+        # Applies token count changes to per-column counts (in place)
+        if not deltas:
+            return
+        tokens = list(deltas)
+        if self.max_term_bytes is not None:
+            # Skips the vocabulary search for words too long to be terms (a long word being typed)
+            tokens = [token for token in tokens if len(token) <= self.max_term_bytes]
+            if not tokens:
+                return
+        columns = self.model.engine.lookup(tokens).tolist()
+        for token, column in zip(tokens, columns):
+            if column < 0:
+                continue
+            count = counts.get(column, 0) + deltas[token]
+            if count:
+                counts[column] = count
+            else:
+                del counts[column]
+
+class TypingSessionStore:
+    """
+    Live typing sessions, shared by every worker process: bounded, with an idle timeout.
+
+    Sessions are stored in an SQLite database in WAL mode, so an edit can
+    reach any worker. A session row holds the text as of a base revision,
+    plus the flower inputs and the current revision. The edits made since
+    then are rows of their own. Storing an edit writes those small rows,
+    and every compact_edits edits the full text is written once and the
+    logged edits are dropped.
+
+    Workers keep the sessions they have served in memory, with their token
+    counts. A worker whose copy is behind applies the logged edits it has
+    not seen. It only rebuilds a session from the stored text (one full
+    tokenization) when it never had the session or the edits were
+    compacted away. Each edit runs in one IMMEDIATE transaction, so edits
+    of one session apply one after another whichever workers they reach.
+    """
+
+    def __init__(self, path, max_sessions=10000, ttl=600, max_chars=20000, compact_edits=64, clock=time.time):
+        """
+        Args:
+            path (str): SQLite database file (created if missing)
+            max_sessions (int): Sessions kept (least recently used dropped first)
+            ttl (float): Seconds a session survives without edits
+            max_chars (int): Longest text a session accepts
+            compact_edits (int): Logged edits after which the full text is written again
+            clock (callable): Time source in seconds since the epoch (shared by all processes)
+        """
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self.compact_edits = max(1, compact_edits)
+        self.clock = clock
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        # As of this worker's last transaction, so reading it never touches the database
+        self.sessions = 0
+        self.created = 0
+        self.edits = 0
+        self.loads = 0
+        self.replays = 0
+        self.compactions = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls):
+        """Builds a store configured by MOOD_TYPING_DB and the other MOOD_TYPING_* environment variables"""
+        return cls(
+            path=os.environ.get('MOOD_TYPING_DB', 'data/typing_sessions.sqlite3'),
+            max_sessions=int(os.environ.get('MOOD_TYPING_MAX_SESSIONS', '10000')),
+            ttl=float(os.environ.get('MOOD_TYPING_SESSION_TTL', '600')),
+            max_chars=int(os.environ.get('MOOD_TYPING_MAX_CHARS', '20000')),
+            compact_edits=int(os.environ.get('MOOD_TYPING_COMPACT_EDITS', '64'))
+        )
+
+    def create(self, model, text="", inputs=None):
+        """
+        Starts a session scored by `model`.
+
+        Args:
+            model (ModelVersion): Model scoring the session
+            text (str): Initial text
+            inputs (dict): Flower inputs kept with the session
+
+        Returns:
+            tuple: (session id, TypingSession) — score the session's snapshot(), not the session itself
+        """
+        session = TypingSession(model, text)
+        session.inputs = dict(inputs or {})
+        session.base_revision = 0
+        session.unsaved = []
+        session_id = secrets.token_urlsafe(16)
+        now = self.clock()
+        with self._lock:
+            connection = self._open()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                dropped = self._dropped(connection, now)
+                self._delete(connection, dropped)
+                connection.execute(
+                    "INSERT INTO typing_sessions (session_id, text, base_revision, inputs, revision, last_used) "
+                    "VALUES (?, ?, 0, ?, 0, ?)",
+                    (session_id, text, json.dumps(session.inputs), now)
+                )
+                self._count_sessions(connection, 1)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            for dropped_id in dropped:
+                self._cache.pop(dropped_id, None)
+            self.dropped += len(dropped)
+            self.created += 1
+            self._remember(session_id, session)
+            return session_id, session.snapshot()
+
+    @contextlib.contextmanager
+    def editing(self, session_id, model):
+        """
+        Runs the block with the session brought up to date with the shared store, then stores the edits it applied.
+
+        The block gets None when the session does not exist or has expired.
+        Keep the block short (checks and apply_edits) and score a snapshot()
+        after it: every worker waits for the transaction around it. When
+        the block raises, nothing is stored.
+        """
+        now = self.clock()
+        with self._lock:
+            connection = self._open()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                session = self._load(connection, session_id, model, now)
+                self._count_sessions(connection, 0)
+                yield session
+                if session is not None:
+                    self._store(connection, session_id, session, now)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                # The cached copy may be ahead of the stored one now
+                self._cache.pop(session_id, None)
+                raise
+            if session is not None:
+                self.edits += len(session.unsaved)
+                session.unsaved = []
+
+    def delete(self, session_id):
+        """Ends a session; returns whether it existed"""
+        with self._lock:
+            self._cache.pop(session_id, None)
+            connection = self._open()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                existed = self._delete(connection, [session_id]) > 0
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return existed
+
+    def stats(self):
+        """Configuration and counters; sessions is the count as of this worker's last transaction (no database access)"""
+        with self._lock:
+            return {
+                "path": self.path,
+                "sessions": self.sessions,
+                "cachedSessions": len(self._cache),
+                "maxSessions": self.max_sessions,
+                "ttlSeconds": self.ttl,
+                "maxChars": self.max_chars,
+                "compactEdits": self.compact_edits,
+                "created": self.created,
+                "edits": self.edits,
+                "loads": self.loads,
+                "replays": self.replays,
+                "compactions": self.compactions,
+                "dropped": self.dropped
+            }
+
+    def _load(self, connection, session_id, model, now):
+        # Caller holds self._lock and the transaction
+        row = connection.execute(
+            "SELECT base_revision, revision, inputs, last_used FROM typing_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is not None and now - row[3] > self.ttl:
+            self._delete(connection, [session_id])
+            self.dropped += 1
+            row = None
+        if row is None:
+            self._cache.pop(session_id, None)
+            return None
+
+        base_revision, revision, inputs, _ = row
+        session = self._cache.get(session_id)
+        if session is not None and base_revision <= session.revision < revision:
+            # Edited by another worker since: apply just the edits this copy has not seen
+            self._replay(connection, session_id, session, session.revision)
+            self.replays += 1
+        elif session is None or session.revision != revision:
+            # Never served here, or its edits were compacted away: count the stored text from scratch
+            text = connection.execute("SELECT text FROM typing_sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+            session = TypingSession(model, text)
+            session.revision = base_revision
+            self._replay(connection, session_id, session, base_revision)
+            self.loads += 1
+        if session.model is not model:
+            # Hot reload: continue on the new model (one full re-score)
+            session.bind(model)
+        session.inputs = json.loads(inputs)
+        session.base_revision = base_revision
+        self._remember(session_id, session)
+        return session
+
+    def _replay(self, connection, session_id, session, after):
+        edits = connection.execute(
+            "SELECT edit_start, edit_end, edit_text FROM typing_edits WHERE session_id = ? AND revision > ? "
+            "ORDER BY revision", (session_id, after)
+        )
+        for start, end, text in edits:
+            session.apply(start, end, text)
+        session.unsaved = []
+
+    def _store(self, connection, session_id, session, now):
+        # Writes the edits the block applied; every compact_edits edits, the full text instead
+        first = session.revision - len(session.unsaved) + 1
+        if session.revision - session.base_revision >= self.compact_edits:
+            connection.execute(
+                "UPDATE typing_sessions SET text = ?, base_revision = ?, inputs = ?, revision = ?, last_used = ? "
+                "WHERE session_id = ?",
+                (session.text, session.revision, json.dumps(session.inputs), session.revision, now, session_id)
+            )
+            connection.execute("DELETE FROM typing_edits WHERE session_id = ?", (session_id,))
+            session.base_revision = session.revision
+            self.compactions += 1
+            return
+        connection.executemany(
+            "INSERT INTO typing_edits (session_id, revision, edit_start, edit_end, edit_text) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, first + offset, start, end, text) for offset, (start, end, text) in enumerate(session.unsaved)]
+        )
+        connection.execute(
+            "UPDATE typing_sessions SET inputs = ?, revision = ?, last_used = ? WHERE session_id = ?",
+            (json.dumps(session.inputs), session.revision, now, session_id)
+        )
+
+    def _dropped(self, connection, now):
+        # Sessions create() drops to make room: the expired ones, then the least recently used beyond max_sessions
+        cutoff = now - self.ttl
+        dropped = [row[0] for row in connection.execute(
+            "SELECT session_id FROM typing_sessions WHERE last_used < ?", (cutoff,)
+        )]
+        sessions = connection.execute("SELECT sessions FROM typing_session_count").fetchone()[0]
+        excess = sessions - len(dropped) - (self.max_sessions - 1)
+        if excess > 0:
+            dropped += [row[0] for row in connection.execute(
+                "SELECT session_id FROM typing_sessions WHERE last_used >= ? ORDER BY last_used LIMIT ?", (cutoff, excess)
+            )]
+        return dropped
+
+    def _delete(self, connection, session_ids):
+        # Caller holds the transaction; returns how many sessions existed
+        deleted = 0
+        for session_id in session_ids:
+            connection.execute("DELETE FROM typing_edits WHERE session_id = ?", (session_id,))
+            deleted += connection.execute("DELETE FROM typing_sessions WHERE session_id = ?", (session_id,)).rowcount
+        if deleted:
+            self._count_sessions(connection, -deleted)
+        return deleted
+
+    def _count_sessions(self, connection, change):
+        # Caller holds the transaction; the stored count is shared by every worker
+        if change:
+            connection.execute("UPDATE typing_session_count SET sessions = sessions + ?", (change,))
+        self.sessions = connection.execute("SELECT sessions FROM typing_session_count").fetchone()[0]
+
+    def _remember(self, session_id, session):
+        self._cache[session_id] = session
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+
+    def _open(self):
+        # One connection per process (caller holds self._lock); a forked worker opens its own
+        pid = os.getpid()
+        if self._pid != pid:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode: the store manages its own IMMEDIATE transactions
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            self._count_sessions(connection, 0)
+            self._cache.clear()
+            self._connection = connection
+            self._pid = pid
+        return self._connection
+
+# Shared by every request thread of the process; the database is opened on first use
+typing_sessions = TypingSessionStore.from_env()
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    import numpy as np
+
+    from api_server import app
+    from model_registry import registry
+
+    print("=" * 60)
+    print("TYPING SESSION CHECK")
+    print("=" * 60)
+
+    model = registry.current()
+    engine = model.engine
+    rng = random.Random(0)
+    vocabulary = [term.decode("utf-8") for term in np.asarray(engine.terms)[::50].tolist()]
+    common = "i am so happy today wow this makes me angry and scared about the future feel sad lonely".split()
+    pieces = vocabulary + common * 10 + [" ", "  ", "\n", ",", "!", "ΣΟΦΟΣ ", "🙂", "naïve", "x", "'s"]
+
+    def random_edit(text):
+        start = len(text) if rng.random() < 0.5 else rng.randint(0, len(text))
+        end = min(len(text), start + rng.choice([0, 0, 1, 3, 12]))
+        return start, end, "".join(rng.choice(pieces) for _ in range(rng.choice([0, 1, 1, 2, 5])))
+
+    # Random appends, deletions, replacements and in-word edits, checked bit for bit after every edit
+    session = TypingSession(model)
+    differing = 0
+    for step in range(2000):
+        session.apply(*random_edit(session.text))
+        if not session.verify():
+            raise SystemExit(f"Incremental counts diverged from a full count at edit {step}")
+        differing += not np.array_equal(session.probabilities(), engine.predict_proba([session.text])[0])
+    print(f"Edits: {session.edits}, final text {len(session.text)} chars")
+    print(f"Probability rows differing from engine.predict_proba: {differing}")
+
+    # Same text through the API: the typing session and /api/mood-analysis must return the same parameters
+    client = app.test_client()
+    inputs = {"streakDays": 4, "communityMood": 0.7, "tradingActivity": 0.65}
+    created = client.post("/api/typing-sessions", json=dict(inputs, text="")).get_json()
+    url = f"/api/typing-sessions/{created['sessionId']}/edits"
+    text = ""
+    api_differing = 0
+    compared = 0
+    for step in range(300):
+        edits = []
+        for _ in range(rng.choice([1, 1, 2, 4])):
+            start, end, insert = random_edit(text)
+            text = text[:start] + insert + text[end:]
+            edits.append({"start": start, "end": end, "text": insert})
+        typed = client.post(url, json={"edits": edits}).get_json()
+        if not text:
+            continue
+        scored = client.post("/api/mood-analysis", json=dict(inputs, text=text)).get_json()
+        compared += 1
+        api_differing += json.dumps(typed["data"], sort_keys=True) != json.dumps(scored["data"], sort_keys=True)
+    print(f"Typing session responses differing from /api/mood-analysis: {api_differing} of {compared}")
+
+    # Two workers sharing the store: edits alternate between them at random, and a
+    # third worker picks the session up at the end from the stored text and edit log
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.sqlite3")
+        workers = [TypingSessionStore(path, compact_edits=16), TypingSessionStore(path, compact_edits=16)]
+        session_id, _ = workers[0].create(model, "", {"streakDays": 2})
+        text = ""
+        worker_differing = 0
+        for step in range(301):
+            start, end, insert = random_edit(text)
+            text = text[:start] + insert + text[end:]
+            with rng.choice(workers).editing(session_id, model) as shared:
+                shared.apply(start, end, insert)
+                snapshot = shared.snapshot()
+            worker_differing += snapshot.text != text or snapshot.revision != step + 1 \
+                or snapshot.inputs != {"streakDays": 2} \
+                or not np.array_equal(snapshot.probabilities(), engine.predict_proba([text])[0])
+        late = TypingSessionStore(path, compact_edits=16)
+        with late.editing(session_id, model) as shared:
+            worker_differing += shared.text != text or not shared.verify()
+        counters = {name: sum(store.stats()[name] for store in workers + [late]) for name in ("replays", "loads", "compactions")}
+    print(f"Edits alternating between two workers: {worker_differing} of 301 differing ({counters})")
+
+    # The session cap and idle timeout hold across workers, from the stored count (no COUNT(*))
+    with tempfile.TemporaryDirectory() as directory:
+        class FakeClock:
+            now = 0.0
+
+            def __call__(self):
+                return self.now
+
+        clock = FakeClock()
+        path = os.path.join(directory, "capped.sqlite3")
+        workers = [TypingSessionStore(path, max_sessions=20, ttl=100, clock=clock) for _ in range(2)]
+        created = []
+        for i in range(50):
+            clock.now += 1
+            created.append(workers[i % 2].create(model, "hi")[0])
+
+        def exists(session_id):
+            with workers[0].editing(session_id, model) as session:
+                return session is not None
+
+        kept = [exists(session_id) for session_id in created]
+        capped = kept == [False] * 30 + [True] * 20 and workers[0].stats()["sessions"] == 20
+        clock.now += 200
+        workers[1].create(model, "hi")
+        capped = capped and workers[1].stats()["sessions"] == 1
+    worker_differing += not capped
+    print(f"50 sessions over two workers capped at 20, then expired: {'ok' if capped else 'WRONG'}")
+
+    # Storing a keystroke writes the edit, not the text: its cost does not grow with the text
+    with tempfile.TemporaryDirectory() as directory:
+        store = TypingSessionStore(os.path.join(directory, "bench.sqlite3"))
+        print(f"{'text chars':>12} {'stored keystroke us':>20}")
+        for words in (20, 2000):
+            session_id, _ = store.create(model, " ".join(rng.choice(vocabulary) for _ in range(words)))
+            started = time.perf_counter()
+            for _ in range(200):
+                with store.editing(session_id, model) as shared:
+                    shared.apply(len(shared.text), len(shared.text), "x")
+            print(f"{len(shared.text):>12} {(time.perf_counter() - started) / 200 * 1e6:>20.1f}")
+
+    # Cost of one keystroke against re-scoring the whole text
+    print("-" * 60)
+    print(f"{'text chars':>12} {'keystroke us':>13} {'full re-score us':>18}")
+    typed = " ".join(rng.choice(vocabulary) for _ in range(40))
+    for words in (20, 200, 2000):
+        text = " ".join(rng.choice(vocabulary) for _ in range(words))
+        session = TypingSession(model, text)
+        started = time.perf_counter()
+        for character in typed:
+            session.apply(len(session.text), len(session.text), character)
+            session.probabilities()
+        edit_us = (time.perf_counter() - started) / len(typed) * 1e6
+        started = time.perf_counter()
+        for _ in range(50):
+            engine.predict_proba([session.text])
+        full_us = (time.perf_counter() - started) / 50 * 1e6
+        print(f"{len(text):>12} {edit_us:>13.1f} {full_us:>18.1f}")
+
+    print("=" * 60)
+    if differing or api_differing or worker_differing or not compared:
+        raise SystemExit("Typing sessions differ from a full re-score")
+    print("Typing sessions are bit-identical to a full re-score")
@@ -124,16 +124,95 @@ export interface MoodAnalysisRequest {
   streakDays?: number;
   communityMood?: number;
   tradingActivity?: number;
+  // When set, the server aggregates the community's mood and ignores communityMood
+  communityId?: string;
+  // When set, the server keeps the user's streak and ignores streakDays
+  userId?: string;
 }
 
 export interface MoodAnalysisResponse {
   success: boolean;
+  // Model that scored the text (changes when the server hot-reloads a new model)
+  modelVersion: string;
   data: FlowerArtParameters;
   error?: string;
 }
 
+// Constant part of FlowerArtParameters, served by /api/flower-schema
+export interface FlowerSchema {
+  version: number;
+  modelVersion: string;
+  dynamicFields: string[];
+  derivedFields: Record<string, string>;
+  constants: Record<string, unknown>;
+}
+
+// ?view=compact response: only the values that change per request
+export interface CompactMoodAnalysisResponse {
+  success: boolean;
+  modelVersion: string;
+  data: Record<string, unknown>;
+  schemaVersion: number;
+  error?: string;
+}
+
+// /api/typing-sessions response: the compact parameters of the session's current text
+export interface TypingSessionResponse extends CompactMoodAnalysisResponse {
+  sessionId: string;
+  revision: number;
+  length: number;
+}
+
+export interface TextEdit {
+  start: number;
+  end: number;
+  text: string;
+}
+
+// Smallest single edit turning `before` into `after`, with offsets in code points like the server's
+export function diffText(before: string, after: string): TextEdit {
+  const a = Array.from(before);
+  const b = Array.from(after);
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) {
+    start++;
+  }
+  let endA = a.length;
+  let endB = b.length;
+  while (endA > start && endB > start && a[endA - 1] === b[endB - 1]) {
+    endA--;
+    endB--;
+  }
+  return { start, end: endA, text: b.slice(start, endB).join('') };
+}
+
+function mergeDeep(base: Record<string, unknown>, overlay: Record<string, unknown>): Record<string, unknown> {
+  for (const [key, value] of Object.entries(overlay)) {
+    const current = base[key];
+    if (value && typeof value === 'object' && !Array.isArray(value) &&
+        current && typeof current === 'object' && !Array.isArray(current)) {
+      mergeDeep(current as Record<string, unknown>, value as Record<string, unknown>);
+    } else {
+      base[key] = value;
+    }
+  }
+  return base;
+}
+
+// Rebuilds the full parameters from the schema constants and a compact response
+export function expandFlowerParameters(compact: Record<string, unknown>, schema: FlowerSchema): FlowerArtParameters {
+  const params = mergeDeep(structuredClone(schema.constants), compact) as unknown as FlowerArtParameters;
+  if (params.mlParams) {
+    params.mlParams.sortedEmotions = Object.entries(params.mlParams.emotionProbabilities)
+      .sort((a, b) => b[1] - a[1]);
+  }
+  return params;
+}
+
 class MoodClassifierService {
   private baseUrl: string;
+  private schema: FlowerSchema | null = null;
+  private typing: { sessionId: string; revision: number; text: string } | null = null;
 
   constructor() {
     // Use Railway backend URL - update this with your actual Railway URL
@@ -142,7 +221,7 @@ class MoodClassifierService {
 
   async analyzeMood(request: MoodAnalysisRequest): Promise<FlowerArtParameters> {
     try {
-      const response = await fetch(`${this.baseUrl}/api/mood-analysis`, {
+      const response = await fetch(`${this.baseUrl}/api/mood-analysis?view=compact`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -152,6 +231,8 @@ class MoodClassifierService {
           streakDays: request.streakDays || 0,
           communityMood: request.communityMood || 0.5,
           tradingActivity: request.tradingActivity || 0.5,
+          communityId: request.communityId,
+          userId: request.userId,
         }),
       });
 
@@ -159,19 +240,80 @@ class MoodClassifierService {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const result: MoodAnalysisResponse = await response.json();
+      const result: CompactMoodAnalysisResponse = await response.json();
       
       if (!result.success) {
         throw new Error(result.error || 'Mood analysis failed');
       }
 
-      return result.data;
+      return await this.expand(result);
     } catch (error) {
       console.error('Mood analysis error:', error);
       throw error;
     }
   }
 
+  // Live flower while the user types: sends only what changed since the last call.
+  // Await each call before the next; the finished text still goes through analyzeMood.
+  async analyzeTyping(
+    text: string,
+    inputs: Pick<MoodAnalysisRequest, 'streakDays' | 'communityMood' | 'tradingActivity'> = {}
+  ): Promise<FlowerArtParameters> {
+    const headers = { 'Content-Type': 'application/json' };
+    let result: TypingSessionResponse | null = null;
+
+    if (this.typing) {
+      const response = await fetch(`${this.baseUrl}/api/typing-sessions/${this.typing.sessionId}/edits?view=compact`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify({ baseRevision: this.typing.revision, edits: [diffText(this.typing.text, text)], ...inputs }),
+      });
+      if (response.ok) {
+        result = await response.json();
+      } else if (response.status !== 404 && response.status !== 409) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+    }
+
+    if (!result) {
+      // No session yet, or it expired or fell out of step: start a new one with the full text
+      const response = await fetch(`${this.baseUrl}/api/typing-sessions?view=compact`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify({ text, ...inputs }),
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      result = await response.json();
+    }
+
+    const session = result as TypingSessionResponse;
+    this.typing = { sessionId: session.sessionId, revision: session.revision, text };
+    return this.expand(session);
+  }
+
+  private async expand(result: CompactMoodAnalysisResponse): Promise<FlowerArtParameters> {
+    let schema = await this.getFlowerSchema();
+    if (schema.version !== result.schemaVersion || schema.modelVersion !== result.modelVersion) {
+      schema = await this.getFlowerSchema(true);
+    }
+    return expandFlowerParameters(result.data, schema);
+  }
+
+  // Fetched once per session; the browser revalidates it with the server's ETag
+  async getFlowerSchema(refresh = false): Promise<FlowerSchema> {
+    if (this.schema && !refresh) {
+      return this.schema;
+    }
+    const response = await fetch(`${this.baseUrl}/api/flower-schema`, refresh ? { cache: 'no-cache' } : {});
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    this.schema = await response.json();
+    return this.schema as FlowerSchema;
+  }
+
   async healthCheck(): Promise<boolean> {
     try {
       const response = await fetch(`${this.baseUrl}/api/health`);
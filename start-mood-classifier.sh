@@ -37,7 +37,15 @@ if [ ! -f "models/emotion_classifier_pipe_lr_03_jan_2022.pkl" ]; then
     echo "   You may need to download it from the mood-classifier repository."
 fi
 
+# Export the memory-mappable model artifact (shared by all server processes)
+if [ -f "models/emotion_classifier_pipe_lr_03_jan_2022.pkl" ] && [ ! -d "models/emotion_classifier_pipe_lr_03_jan_2022.moodmodel" ]; then
+    echo "🧩 Exporting model artifact..."
+    python3 model_artifact.py export
+fi
+
 # Start the server
+# MOOD_SERVER_MODE=production runs gunicorn with the preloaded model (see gunicorn.conf.py);
+# the default is the Flask development server.
 echo "🚀 Starting Mood Classifier API server..."
 echo "   API will be available at: http://localhost:5001"
 echo "   Health check: http://localhost:5001/api/health"
@@ -46,4 +54,8 @@ echo ""
 echo "Press Ctrl+C to stop the server"
 echo "======================================"
 
-python3 api_server.py
+if [ "$MOOD_SERVER_MODE" = "production" ]; then
+    exec gunicorn -c gunicorn.conf.py api_server:app
+else
+    python3 api_server.py
+fi